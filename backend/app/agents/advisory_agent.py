@@ -0,0 +1,186 @@
+import json
+
+from app.agents.empathy_agent import EmpathyAgent
+from app.agents.credit_improvement_agent import CreditImprovementAgent
+from app.services.llm_gateway import llm_gateway, failure_outcome
+from app.services.llm_cache import llm_cache, prompt_fingerprint
+from app.services.streaming import JsonFieldStream
+from app.services.metrics import LLM_REQUESTS, observe_llm_usage
+
+
+class AdvisoryAgent:
+    """
+    Fused advisory mode for rejected and conditional applicants.
+
+    One structured-output LLM call returns the empathy title and
+    message together with the improvement advice, instead of one call
+    per agent. Each field is validated on its own; a missing or invalid
+    field falls back to the deterministic text of the agent it replaces.
+    """
+
+    FIELDS = ("title", "message", "advice")
+
+    # Longest accepted value per field (characters)
+    FIELD_LIMITS = {"title": 80, "message": 1200, "advice": 3000}
+
+    @staticmethod
+    def build_prompt(eligibility_result, factors, loan_input, targets=None):
+        # Same rounded figures the advice cache key is built from
+        figures = CreditImprovementAgent.rounded_figures(loan_input)
+        return f"""
+You are Tata Mitra, a warm and supportive loan advisor AI in India.
+Your client has applied for a loan but faces some challenges.
+
+Current Situation:
+- Loan Decision: {eligibility_result.decision}
+- Risk Level: {eligibility_result.risk_probability}
+- Main Factor: {eligibility_result.reason or "multiple financial factors"}
+- Monthly income: about ₹{figures["monthly_income"]}
+- Existing EMI: about ₹{figures["existing_emi"]}
+- Requested loan amount: about ₹{figures["loan_amount"]}
+- Loan tenure: {figures["tenure_months"]} months
+- Challenges identified: {", ".join(factors)}
+
+Changes that would reach a better decision under current policy (each on its own, other figures unchanged):
+{CreditImprovementAgent.describe_targets(targets)}
+
+Task:
+Generate a JSON response with three fields:
+1. "title": A short, 3-5 word encouraging header (e.g., "Application Update", "Review Status").
+2. "message": A warm, human-like paragraph (max 3 sentences) explaining the decision in a kind tone.
+3. "advice": 1-2 natural paragraphs (NOT a list) of personalized advice that reference their income or EMI figures,
+   explain why this status happened in simple terms, and offer 2-3 concrete steps, mentioning the figures above
+   as options, not promises.
+
+STRICTLY COMPLIANT: No guarantees, no illegal advice. No bullet points or tables in any field.
+Output strictly valid JSON.
+"""
+
+    @staticmethod
+    def cache_key(eligibility_result, factors, loan_input, targets=None):
+        # Shares the split-mode keys' granularity: exact empathy inputs,
+        # bucketed advice inputs, which is also how the prompt quotes them
+        return prompt_fingerprint(
+            "advisory",
+            EmpathyAgent.build_prompt(eligibility_result),
+            CreditImprovementAgent.advice_cache_key(factors, loan_input, targets)
+        )
+
+    @staticmethod
+    def fallback_response(eligibility_result):
+        return {
+            **EmpathyAgent.fallback_response(eligibility_result),
+            "advice": CreditImprovementAgent.FALLBACK_ADVICE
+        }
+
+    @staticmethod
+    def validate(text):
+        """
+        Valid fields of a fused response. Missing, empty, non-string or
+        over-long fields are left out; malformed JSON raises.
+        """
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+
+        valid = {}
+        for field, limit in AdvisoryAgent.FIELD_LIMITS.items():
+            value = data.get(field)
+            if isinstance(value, str) and value.strip() and len(value) <= limit:
+                valid[field] = value.strip()
+        if not valid:
+            raise ValueError("no valid fields")
+        return valid
+
+    @staticmethod
+    def _complete(valid, eligibility_result, cache_key):
+        """
+        Fills invalid fields from the fallback texts, records the
+        outcome and caches fully valid responses.
+        """
+        if len(valid) == len(AdvisoryAgent.FIELDS):
+            LLM_REQUESTS.inc(agent="AdvisoryAgent", outcome="success")
+            llm_cache.put(cache_key, valid)
+            return dict(valid)
+
+        missing = [f for f in AdvisoryAgent.FIELDS if f not in valid]
+        print(f"AdvisoryAgent Error: invalid fields {missing}, using fallback text")
+        LLM_REQUESTS.inc(agent="AdvisoryAgent", outcome="partial")
+        return {**AdvisoryAgent.fallback_response(eligibility_result), **valid}
+
+    @staticmethod
+    def generate(eligibility_result, factors, loan_input, targets=None):
+        prompt = AdvisoryAgent.build_prompt(eligibility_result, factors, loan_input, targets)
+        cache_key = AdvisoryAgent.cache_key(eligibility_result, factors, loan_input, targets)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="AdvisoryAgent", outcome="cache_hit")
+            return dict(cached)
+
+        try:
+            response = llm_gateway.generate(prompt, json_mode=True)
+            valid = AdvisoryAgent.validate(response.text)
+            observe_llm_usage("AdvisoryAgent", response)
+        except Exception as e:
+            print(f"AdvisoryAgent Error: {e}")
+            LLM_REQUESTS.inc(agent="AdvisoryAgent", outcome=failure_outcome(e))
+            return AdvisoryAgent.fallback_response(eligibility_result)
+        return AdvisoryAgent._complete(valid, eligibility_result, cache_key)
+
+    @staticmethod
+    async def generate_async(eligibility_result, factors, loan_input, targets=None):
+        """
+        Non-blocking variant of generate for the async orchestrator.
+        """
+        prompt = AdvisoryAgent.build_prompt(eligibility_result, factors, loan_input, targets)
+        cache_key = AdvisoryAgent.cache_key(eligibility_result, factors, loan_input, targets)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="AdvisoryAgent", outcome="cache_hit")
+            return dict(cached)
+
+        try:
+            response = await llm_gateway.generate_async(prompt, json_mode=True)
+            valid = AdvisoryAgent.validate(response.text)
+            observe_llm_usage("AdvisoryAgent", response)
+        except Exception as e:
+            print(f"AdvisoryAgent Error: {e}")
+            LLM_REQUESTS.inc(agent="AdvisoryAgent", outcome=failure_outcome(e))
+            return AdvisoryAgent.fallback_response(eligibility_result)
+        return AdvisoryAgent._complete(valid, eligibility_result, cache_key)
+
+    @staticmethod
+    async def stream_response(eligibility_result, factors, loan_input, targets=None):
+        """
+        Streaming variant of generate_async.
+        Yields {"field", "delta"} items for title, message and advice as
+        they are generated, then {"final": {...}} with the validated
+        response (fallback text for any invalid field).
+        """
+        prompt = AdvisoryAgent.build_prompt(eligibility_result, factors, loan_input, targets)
+        cache_key = AdvisoryAgent.cache_key(eligibility_result, factors, loan_input, targets)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="AdvisoryAgent", outcome="cache_hit")
+            for field in AdvisoryAgent.FIELDS:
+                yield {"field": field, "delta": cached[field]}
+            yield {"final": dict(cached)}
+            return
+
+        parser = JsonFieldStream(AdvisoryAgent.FIELDS)
+        try:
+            response = await llm_gateway.stream_async(prompt, json_mode=True)
+            async for chunk in response:
+                for field, delta in parser.feed(chunk.text):
+                    yield {"field": field, "delta": delta}
+            valid = AdvisoryAgent.validate(parser.text)
+            observe_llm_usage("AdvisoryAgent", response)
+            result = AdvisoryAgent._complete(valid, eligibility_result, cache_key)
+        except Exception as e:
+            print(f"AdvisoryAgent Error: {e}")
+            LLM_REQUESTS.inc(agent="AdvisoryAgent", outcome=failure_outcome(e))
+            result = AdvisoryAgent.fallback_response(eligibility_result)
+        yield {"final": result}
@@ -1,11 +1,12 @@
-import os
-import google.generativeai as genai
+import math
 
-# -------------------------------------------------
-# GEMINI CONFIGURATION
-# -------------------------------------------------
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+import numpy as np
+
+from app.agents.eligibility_agent import EligibilityAgent
+from app.policies.engine import policy_features, boundary_candidates
+from app.services.llm_gateway import llm_gateway, failure_outcome
+from app.services.llm_cache import llm_cache, prompt_fingerprint, bucket
+from app.services.metrics import LLM_REQUESTS, observe_llm_usage
 
 
 class CreditImprovementAgent:
@@ -26,62 +27,358 @@ class CreditImprovementAgent:
     @staticmethod
     def get_improvement_factors(loan_input, eligibility_result):
         """
-        Identifies standardized improvement factors.
+        Identifies standardized improvement factors, from the
+        improvement rules of the active eligibility policy.
         NO LLM usage here.
         """
-        factors = []
+        features = policy_features(
+            loan_input.monthly_income, loan_input.existing_emi,
+            loan_input.loan_amount, loan_input.tenure_months,
+            eligibility_result.risk_probability
+        )
+        # Factors have always been judged on the reported (rounded) DTI
+        features["dti_ratio"] = eligibility_result.dti_ratio
+        return EligibilityAgent.policy().improvement_factors(features)
+
+    # =================================================
+    # PART 1b: DETERMINISTIC ELIGIBILITY TARGETS
+    # =================================================
+    # Longest tenure the solver will suggest
+    MAX_TENURE_MONTHS = 360
+
+    @staticmethod
+    def _ranks(policy, monthly_income, existing_emi, loan_amount, tenure_months, risk_probability):
+        """
+        Decision rank (index into EligibilityAgent.DECISION_CODES) for
+        each candidate, under the same compiled policy as evaluate().
+        """
+        arrays = np.broadcast_arrays(
+            np.asarray(monthly_income, dtype=np.int64), np.asarray(existing_emi, dtype=np.int64),
+            np.asarray(loan_amount, dtype=np.int64), np.asarray(tenure_months, dtype=np.int64),
+            np.asarray(risk_probability, dtype=np.float64)
+        )
+        arrays = [np.atleast_1d(a) for a in arrays]
+        decision = EligibilityAgent.evaluate_arrays(
+            *arrays[:4], risk_probability=arrays[4], policy=policy
+        )["decision"]
+        return np.select(
+            [decision == code for code in EligibilityAgent.DECISION_CODES],
+            range(len(EligibilityAgent.DECISION_CODES))
+        )
+
+    @staticmethod
+    def _risk_crossing(model, monthly_income, lo, hi, threshold):
+        """
+        First amount in (lo, hi] on the other side of `threshold` from
+        lo, or None. Risk is monotone in the amount for a fixed income,
+        so this is a binary search.
+        """
+        def above(amount):
+            risk = model.predict_batch(np.array([monthly_income]), np.array([amount]))
+            return bool(risk[0] > threshold)
 
-        if loan_input.monthly_income < 30000:
-            factors.append("LOW_INCOME")
+        side = above(lo)
+        if above(hi) == side:
+            return None
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if above(mid) == side:
+                lo = mid
+            else:
+                hi = mid
+        return hi
 
-        if eligibility_result.dti_ratio > 0.5:
-            factors.append("HIGH_DTI")
+    @staticmethod
+    def _best(candidates, ranks, pick):
+        return {
+            rank: int(pick(candidates[ranks >= rank])) if (ranks >= rank).any() else None
+            for rank in range(1, len(EligibilityAgent.DECISION_CODES))
+        }
+
+    @staticmethod
+    def _max_amounts(loan_input, model, policy):
+        """
+        Largest loan amount per decision rank, other inputs unchanged.
 
-        if loan_input.loan_amount > loan_input.monthly_income * 10:
-            factors.append("HIGH_LOAN_AMOUNT")
+        The score only changes where the amount crosses a policy
+        boundary (solved in closed form, e.g. the DTI cap and the income
+        multiple) or a risk threshold (found by binary search). One
+        amount per piece between those boundaries decides the whole
+        piece. Amounts past the last boundary are not proposed.
+        """
+        income, emi, tenure = loan_input.monthly_income, loan_input.existing_emi, loan_input.tenure_months
+        inputs = {"monthly_income": income, "existing_emi": emi, "tenure_months": tenure}
 
-        if eligibility_result.risk_probability > 0.6:
-            factors.append("HIGH_RISK_PROFILE")
+        points = policy.breakpoints("loan_amount", inputs)
+        finite = [float(p) for p in points if np.isfinite(p)]
+        upper = max([math.floor(p) + 2 for p in finite] + [1])
 
-        if not factors:
-            factors.append("GENERAL_IMPROVEMENT")
+        starts = set(boundary_candidates(points, 1, upper).tolist())
+        for condition in policy.conditions("risk_probability"):
+            crossing = CreditImprovementAgent._risk_crossing(
+                model, income, 1, upper, condition.rhs(inputs)
+            )
+            if crossing is not None:
+                starts.add(crossing)
+        starts = np.array(sorted(starts), dtype=np.int64)
+        ends = np.append(starts[1:] - 1, upper)
 
-        return factors
+        risk = model.predict_batch(np.full(len(starts), income, dtype=np.int64), starts)
+        ranks = CreditImprovementAgent._ranks(policy, income, emi, starts, tenure, risk)
+        return CreditImprovementAgent._best(ends, ranks, np.max)
+
+    @staticmethod
+    def _min_tenures(loan_input, risk, policy):
+        """
+        Shortest tenure per decision rank. Risk does not depend on the
+        tenure, so only the policy's tenure boundaries (e.g. where DTI
+        drops to its limit) can change the decision.
+        """
+        income, emi, amount = loan_input.monthly_income, loan_input.existing_emi, loan_input.loan_amount
+        points = policy.breakpoints("tenure_months", {
+            "monthly_income": income, "existing_emi": emi, "loan_amount": amount
+        })
+
+        candidates = boundary_candidates(points, 1, CreditImprovementAgent.MAX_TENURE_MONTHS)
+        ranks = CreditImprovementAgent._ranks(policy, income, emi, amount, candidates, risk)
+        return CreditImprovementAgent._best(candidates, ranks, np.min)
+
+    @staticmethod
+    def _min_emi_reductions(loan_input, risk, policy):
+        """
+        Smallest cut to the existing EMI per decision rank, up to
+        clearing the whole EMI. Only the policy's EMI boundaries (e.g.
+        where DTI drops to its limit) can change the decision.
+        """
+        income, emi = loan_input.monthly_income, loan_input.existing_emi
+        amount, tenure = loan_input.loan_amount, loan_input.tenure_months
+        points = policy.breakpoints("existing_emi", {
+            "monthly_income": income, "loan_amount": amount, "tenure_months": tenure
+        })
+
+        cuts = boundary_candidates([emi - p for p in points], 0, emi)
+        ranks = CreditImprovementAgent._ranks(policy, income, emi - cuts, amount, tenure, risk)
+        return CreditImprovementAgent._best(cuts, ranks, np.min)
+
+    @staticmethod
+    def solve_eligibility_targets(loan_input):
+        """
+        What would change the outcome, one input at a time:
+        the largest loan amount, the shortest tenure and the smallest
+        existing-EMI reduction that reach "approved" and "conditional".
+        None means that change alone cannot reach the decision.
+        NO LLM usage here.
+        """
+        policy = EligibilityAgent.policy()
+        model = EligibilityAgent.models().active
+        risk = float(model.predict_batch(
+            np.array([loan_input.monthly_income]), np.array([loan_input.loan_amount])
+        )[0])
+
+        amounts = CreditImprovementAgent._max_amounts(loan_input, model, policy)
+        tenures = CreditImprovementAgent._min_tenures(loan_input, risk, policy)
+        cuts = CreditImprovementAgent._min_emi_reductions(loan_input, risk, policy)
+
+        targets = {"model_version": model.version, "policy_version": policy.version}
+        for rank in sorted(amounts, reverse=True):
+            targets[EligibilityAgent.DECISION_CODES[rank]] = {
+                "max_loan_amount": amounts[rank],
+                "min_tenure_months": tenures[rank],
+                "min_emi_reduction": cuts[rank]
+            }
+        return targets
 
     # =================================================
     # PART 2: LLM-BASED PERSONALIZED ADVICE (GEMINI)
     # =================================================
+    # Rupee bucket widths used to share cached advice between similar applicants
+    INCOME_BUCKET = 5000
+    EMI_BUCKET = 2500
+    AMOUNT_BUCKET = 50000
+
+    FALLBACK_ADVICE = "We recommend reducing your current debt obligations and maintaining a healthy credit score to improve future eligibility."
+
+    # Prompt figures are rounded conservatively so similar applicants share cached advice
+    TARGET_AMOUNT_ROUNDING = 10000
+    TARGET_EMI_ROUNDING = 500
+
     @staticmethod
-    def generate_personalized_advice(factors, loan_input):
+    def describe_targets(targets):
         """
-        Uses Gemini to generate personalized, empathetic,
-        RBI-compliant credit improvement advice as a simple text paragraph.
+        Plain-text summary of solve_eligibility_targets() for the prompt.
         """
+        if not targets:
+            return "None available"
 
-        prompt = f"""
+        amount_unit = CreditImprovementAgent.TARGET_AMOUNT_ROUNDING
+        emi_unit = CreditImprovementAgent.TARGET_EMI_ROUNDING
+        lines = []
+        for decision in ("approved", "conditional"):
+            target = targets.get(decision) or {}
+            options = []
+            if target.get("max_loan_amount") and target["max_loan_amount"] >= amount_unit:
+                options.append(f"a loan amount of up to ₹{target['max_loan_amount'] // amount_unit * amount_unit}")
+            if target.get("min_tenure_months"):
+                options.append(f"a tenure of at least {target['min_tenure_months']} months")
+            if target.get("min_emi_reduction") is not None:
+                cut = -(-target["min_emi_reduction"] // emi_unit) * emi_unit
+                options.append("no EMI change" if cut == 0 else f"reducing existing EMI by ₹{cut}")
+            if options:
+                lines.append(f"- {decision.capitalize()} with: " + "; or ".join(options))
+        return "\n".join(lines) or "No single change reaches approval"
+
+    @staticmethod
+    def rounded_figures(loan_input):
+        """
+        Applicant figures as the advice prompt quotes them.
+        Rounded to the cache buckets, so advice cached for one applicant
+        never quotes figures that belong to another.
+        """
+        return {
+            "monthly_income": bucket(loan_input.monthly_income, CreditImprovementAgent.INCOME_BUCKET),
+            "existing_emi": bucket(loan_input.existing_emi, CreditImprovementAgent.EMI_BUCKET),
+            "loan_amount": bucket(loan_input.loan_amount, CreditImprovementAgent.AMOUNT_BUCKET),
+            "tenure_months": loan_input.tenure_months
+        }
+
+    @staticmethod
+    def build_advice_prompt(factors, loan_input, targets=None):
+        figures = CreditImprovementAgent.rounded_figures(loan_input)
+        return f"""
 You are a caring and expert financial advisor in India.
 Your client has applied for a loan but faces some challenges.
 
-Context:
-- Monthly income: ₹{loan_input.monthly_income}
-- Existing EMI: ₹{loan_input.existing_emi}
-- Requested loan amount: ₹{loan_input.loan_amount}
-- Loan tenure: {loan_input.tenure_months} months
+Context (rupee figures are approximate):
+- Monthly income: about ₹{figures["monthly_income"]}
+- Existing EMI: about ₹{figures["existing_emi"]}
+- Requested loan amount: about ₹{figures["loan_amount"]}
+- Loan tenure: {figures["tenure_months"]} months
 - Challenges identified: {", ".join(factors)}
 
+Changes that would reach a better decision under current policy (each on its own, other figures unchanged):
+{CreditImprovementAgent.describe_targets(targets)}
+
 TASK:
 Write a warm, supportive, and personalized advice paragraph (NOT a list).
 - Directly reference their income or EMI figures to show you understand their specific situation.
 - Explain *why* the rejected/conditional status happened in simple terms.
 - Offer 2-3 concrete steps to improve their eligibility for the future.
+- Mention the specific figures above as options, not promises.
 - Tone: Highly empathetic, encouraging, human-like.
 - CONSTRAINT: Do NOT use bullet points or tables. Write as 1-2 natural paragraphs.
 - STRICTLY COMPLIANT: No guarantees, no illegal advice.
 """
 
+    @staticmethod
+    def advice_cache_key(factors, loan_input, targets=None):
+        # Keyed on every figure the prompt quotes, so a hit is only ever
+        # served to an applicant the same prompt would have been built for
+        figures = CreditImprovementAgent.rounded_figures(loan_input)
+        return prompt_fingerprint(
+            "advice",
+            ",".join(sorted(factors)),
+            figures["monthly_income"],
+            figures["existing_emi"],
+            figures["loan_amount"],
+            figures["tenure_months"],
+            CreditImprovementAgent.describe_targets(targets)
+        )
+
+    @staticmethod
+    def validate_advice(text):
+        """
+        Cleaned advice text, or ValueError if the reply is unusable.
+        Only validated advice is cached.
+        """
+        advice = (text or "").strip()
+        if not advice:
+            raise ValueError("empty response")
+        return advice
+
+    @staticmethod
+    def generate_personalized_advice(factors, loan_input, targets=None):
+        """
+        Uses Gemini to generate personalized, empathetic,
+        RBI-compliant credit improvement advice as a simple text paragraph.
+        """
+        prompt = CreditImprovementAgent.build_advice_prompt(factors, loan_input, targets)
+        cache_key = CreditImprovementAgent.advice_cache_key(factors, loan_input, targets)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome="cache_hit")
+            return cached
+
+        try:
+            response = llm_gateway.generate(prompt)
+            advice = CreditImprovementAgent.validate_advice(response.text)
+            observe_llm_usage("CreditImprovementAgent", response)
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome="success")
+            llm_cache.put(cache_key, advice)
+            return advice
+        except Exception as e:
+            print(f"CreditImprovementAgent Error: {e}")
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome=failure_outcome(e))
+            return CreditImprovementAgent.FALLBACK_ADVICE
+
+    @staticmethod
+    async def generate_personalized_advice_async(factors, loan_input, targets=None):
+        """
+        Non-blocking variant of generate_personalized_advice
+        for the async orchestrator.
+        """
+        prompt = CreditImprovementAgent.build_advice_prompt(factors, loan_input, targets)
+        cache_key = CreditImprovementAgent.advice_cache_key(factors, loan_input, targets)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome="cache_hit")
+            return cached
+
+        try:
+            response = await llm_gateway.generate_async(prompt)
+            advice = CreditImprovementAgent.validate_advice(response.text)
+            observe_llm_usage("CreditImprovementAgent", response)
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome="success")
+            llm_cache.put(cache_key, advice)
+            return advice
+        except Exception as e:
+            print(f"CreditImprovementAgent Error: {e}")
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome=failure_outcome(e))
+            return CreditImprovementAgent.FALLBACK_ADVICE
+
+    @staticmethod
+    async def stream_personalized_advice(factors, loan_input, targets=None):
+        """
+        Streaming variant of generate_personalized_advice_async.
+        Yields {"delta": text} items as the advice is generated,
+        then {"final": advice}.
+        """
+        prompt = CreditImprovementAgent.build_advice_prompt(factors, loan_input, targets)
+        cache_key = CreditImprovementAgent.advice_cache_key(factors, loan_input, targets)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome="cache_hit")
+            yield {"delta": cached}
+            yield {"final": cached}
+            return
+
+        parts = []
         try:
-            response = model.generate_content(prompt)
-            return response.text.strip()
+            response = await llm_gateway.stream_async(prompt)
+            async for chunk in response:
+                # Leading whitespace is dropped, as .strip() does for the full text
+                text = chunk.text if parts else chunk.text.lstrip()
+                if text:
+                    parts.append(text)
+                    yield {"delta": text}
+            advice = CreditImprovementAgent.validate_advice("".join(parts))
+            observe_llm_usage("CreditImprovementAgent", response)
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome="success")
+            llm_cache.put(cache_key, advice)
         except Exception as e:
             print(f"CreditImprovementAgent Error: {e}")
-            return "We recommend reducing your current debt obligations and maintaining a healthy credit score to improve future eligibility."
+            LLM_REQUESTS.inc(agent="CreditImprovementAgent", outcome=failure_outcome(e))
+            advice = CreditImprovementAgent.FALLBACK_ADVICE
+        yield {"final": advice}
@@ -1,8 +1,16 @@
 import os
-import joblib
+from typing import List
+
+import numpy as np
 from app.schemas.loan_input import LoanInput
 from app.schemas.eligibility import EligibilityResult
-from app.ml.feature_builder import build_ml_features
+from app.ml.model_registry import RiskModelRegistry
+from app.policies.engine import (
+    POLICY_DIR, CompiledPolicy, PolicyStore, policy_features, boundary_candidates
+)
+from app.services.registry import registry
+from app.services.metrics import timed
+from app.services.drift import drift_monitor
 
 MODEL_PATH = os.path.join(
     os.path.dirname(__file__),
@@ -11,65 +19,277 @@ MODEL_PATH = os.path.join(
     "risk_model.pkl"
 )
 
+registry.register(
+    "risk_models",
+    lambda: RiskModelRegistry.from_path(
+        MODEL_PATH, version=os.getenv("RISK_MODEL_VERSION", "baseline"),
+        # Shared by every worker process; empty keeps state per process
+        state_path=os.getenv("MODEL_STATE_PATH", "./model_state.json") or None,
+        sync_interval=float(os.getenv("MODEL_SYNC_INTERVAL", "5"))
+    )
+)
+
+POLICY_PATH = os.getenv(
+    "ELIGIBILITY_POLICY_PATH", os.path.join(POLICY_DIR, "eligibility_policy.json")
+)
+
+registry.register(
+    "eligibility_policy",
+    lambda: PolicyStore(
+        POLICY_PATH, check_interval=float(os.getenv("POLICY_RELOAD_INTERVAL", "5"))
+    )
+)
+
 
 class EligibilityAgent:
     """
     Hybrid Eligibility Agent:
-    - Rule-based policy checks
+    - Rule-based policy checks (app/policies/eligibility_policy.json)
     - ML-assisted risk estimation
     """
 
-    model = joblib.load(MODEL_PATH)
+    @staticmethod
+    def models() -> RiskModelRegistry:
+        models = registry.get("risk_models")
+        models.sync()
+        return models
+
+    @staticmethod
+    def get_model():
+        return EligibilityAgent.models().active.pipeline
+
+    @staticmethod
+    def policies() -> PolicyStore:
+        return registry.get("eligibility_policy")
+
+    @staticmethod
+    def policy() -> CompiledPolicy:
+        return EligibilityAgent.policies().current()
 
     @staticmethod
     def evaluate(loan_input: LoanInput) -> EligibilityResult:
+        # One reference each per evaluation, so a concurrent swap cannot mix versions
+        policy = EligibilityAgent.policy()
+        models = EligibilityAgent.models()
+        active = models.active
+
+        # -------------------------
+        # ML RISK ESTIMATION
+        # -------------------------
+        with timed("feature_build"):
+            features = active.features(loan_input)
+        with timed("predict_proba"):
+            risk_probability = active.predict(features)
+        models.maybe_shadow(loan_input, risk_probability, policy)
+        drift_monitor.observe(loan_input.monthly_income, loan_input.loan_amount, risk_probability)
+
         # -------------------------
-        # RULE-BASED CALCULATIONS
+        # POLICY RULES & FINAL DECISION
         # -------------------------
-        new_emi = loan_input.loan_amount / loan_input.tenure_months
-        total_emi = loan_input.existing_emi + new_emi
-        dti_ratio = total_emi / loan_input.monthly_income
+        with timed("rules"):
+            rule_input = policy_features(
+                loan_input.monthly_income, loan_input.existing_emi,
+                loan_input.loan_amount, loan_input.tenure_months, risk_probability
+            )
+            results = policy.evaluate_row(rule_input)
 
-        score = 100
-        reason = None
+        return EligibilityResult(
+            decision=results["decision"],
+            dti_ratio=round(rule_input["dti_ratio"], 2),
+            eligibility_score=results["eligibility_score"],
+            risk_probability=round(float(risk_probability), 2),
+            reason=results["reason"],
+            model_version=active.version,
+            triggered_rules=results["triggered_rules"],
+            policy_version=policy.version
+        )
 
-        if loan_input.monthly_income < 25000:
-            score -= 40
-            reason = "Low income"
+    @staticmethod
+    def evaluate_many(loan_inputs: List[LoanInput]) -> List[EligibilityResult]:
+        """
+        Vectorized counterpart of evaluate() for bulk scoring.
+        Runs the same compiled policy and the same model scorer over
+        the whole batch. Results match evaluate() row for row.
+        """
+        if not loan_inputs:
+            return []
 
-        if dti_ratio > 0.5:
-            score -= 40
-            reason = "High EMI burden"
+        policy = EligibilityAgent.policy()
+        active = EligibilityAgent.models().active
+        results = EligibilityAgent.evaluate_arrays(
+            monthly_income=np.array([x.monthly_income for x in loan_inputs], dtype=np.int64),
+            existing_emi=np.array([x.existing_emi for x in loan_inputs], dtype=np.int64),
+            loan_amount=np.array([x.loan_amount for x in loan_inputs], dtype=np.int64),
+            tenure_months=np.array([x.tenure_months for x in loan_inputs], dtype=np.int64),
+            model=active,
+            policy=policy
+        )
+        triggered = policy.triggered_rules(results["rule_mask"])
+        drift_monitor.observe_many(
+            [x.monthly_income for x in loan_inputs], [x.loan_amount for x in loan_inputs],
+            results["risk_probability"]
+        )
 
-        if loan_input.loan_amount > loan_input.monthly_income * 10:
-            score -= 20
-            reason = "Loan amount too high"
+        return [
+            EligibilityResult(
+                decision=str(results["decision"][i]),
+                dti_ratio=round(float(results["dti_ratio"][i]), 2),
+                eligibility_score=results["eligibility_score"][i].item(),
+                risk_probability=round(float(results["risk_probability"][i]), 2),
+                reason=results["reason"][i],
+                model_version=active.version,
+                triggered_rules=triggered[i],
+                policy_version=policy.version
+            )
+            for i in range(len(loan_inputs))
+        ]
 
+    @staticmethod
+    def evaluate_arrays(monthly_income, existing_emi, loan_amount, tenure_months, model=None,
+                        risk_probability=None, policy=None):
+        """
+        Core of evaluate_many() over aligned NumPy arrays.
+        Returns a dict of unrounded result arrays: decision, dti_ratio,
+        eligibility_score, risk_probability and reason, plus the
+        policy's rule_mask (rules x rows).
+        Uses the active model version and policy unless given, and
+        skips scoring when risk_probability is already known.
+        """
         # -------------------------
         # ML RISK ESTIMATION
         # -------------------------
-        ml_input = build_ml_features(loan_input)
-        risk_probability = EligibilityAgent.model.predict_proba(ml_input)[0][1]
-
-        if risk_probability > 0.6:
-            score -= 30
-        elif risk_probability > 0.4:
-            score -= 15
+        if risk_probability is None:
+            model = model or EligibilityAgent.models().active
+            risk_probability = model.predict_batch(monthly_income, loan_amount)
 
         # -------------------------
-        # FINAL DECISION
+        # POLICY RULES & FINAL DECISION
         # -------------------------
-        if score >= 70:
-            decision = "approved"
-        elif score >= 50:
-            decision = "conditional"
-        else:
-            decision = "rejected"
+        policy = policy or EligibilityAgent.policy()
+        features = policy_features(
+            monthly_income, existing_emi, loan_amount, tenure_months, risk_probability
+        )
+        results = policy.evaluate(features)
 
-        return EligibilityResult(
-            decision=decision,
-            dti_ratio=round(dti_ratio, 2),
-            eligibility_score=score,
-            risk_probability=round(float(risk_probability), 2),
-            reason=reason
+        return {
+            "decision": results["decision"],
+            "dti_ratio": features["dti_ratio"],
+            "eligibility_score": results["eligibility_score"],
+            "risk_probability": risk_probability,
+            "reason": results["reason"],
+            "rule_mask": results["rule_mask"]
+        }
+
+    # -------------------------
+    # WHAT-IF GRID
+    # -------------------------
+    MAX_GRID_CELLS = 20000
+    MAX_SEARCH_POINTS = 5000
+    DECISION_CODES = ["rejected", "conditional", "approved"]
+
+    @staticmethod
+    def _surface(monthly_income, existing_emi, loan_amounts, tenures, model, policy):
+        """
+        Evaluates every (tenure, amount) pair. The risk model only sees
+        income and amount, so each amount is scored once and the scores
+        are shared across tenures. Arrays are shaped (tenures, amounts).
+        """
+        risk = model.predict_batch(
+            np.full(len(loan_amounts), monthly_income, dtype=np.int64), loan_amounts
+        )
+
+        shape = (len(tenures), len(loan_amounts))
+        results = EligibilityAgent.evaluate_arrays(
+            monthly_income=np.full(shape, monthly_income, dtype=np.int64).ravel(),
+            existing_emi=np.full(shape, existing_emi, dtype=np.int64).ravel(),
+            loan_amount=np.broadcast_to(loan_amounts, shape).ravel(),
+            tenure_months=np.broadcast_to(tenures[:, None], shape).ravel(),
+            risk_probability=np.tile(risk, len(tenures)),
+            policy=policy
         )
+        results.pop("rule_mask")
+        return risk, {key: np.asarray(value).reshape(shape) for key, value in results.items()}
+
+    @staticmethod
+    def max_approvable_amounts(monthly_income, existing_emi, tenures, model, policy,
+                               search_step=1000):
+        """
+        Largest approved loan amount per tenure (None if none is).
+
+        Candidates are the amounts around every policy boundary that
+        depends on the amount (the DTI cap per tenure, the income
+        multiple), and a ladder of amounts up to the largest boundary
+        every `search_step` rupees (coarser if the ladder would exceed
+        MAX_SEARCH_POINTS). All candidates go through the same rules and
+        model as evaluate().
+        """
+        points = policy.breakpoints("loan_amount", {
+            "monthly_income": monthly_income,
+            "existing_emi": existing_emi,
+            "tenure_months": tenures
+        })
+        finite = [p[np.isfinite(p)] for p in np.broadcast_arrays(tenures, *points)[1:]]
+        upper = int(np.floor(max((p.max(initial=0) for p in finite), default=0)))
+        if upper <= 0:
+            return [None] * len(tenures), search_step
+
+        step = max(search_step, -(-upper // EligibilityAgent.MAX_SEARCH_POINTS))
+        candidates = np.unique(np.concatenate([
+            np.arange(step, upper + 1, step, dtype=np.int64),
+            boundary_candidates(points, 1, upper)
+        ]))
+
+        _, surface = EligibilityAgent._surface(
+            monthly_income, existing_emi, candidates, tenures, model, policy
+        )
+        best = np.where(surface["decision"] == "approved", candidates[None, :], -1).max(axis=1)
+        return [int(b) if b > 0 else None for b in best], int(step)
+
+    @staticmethod
+    def evaluate_grid(monthly_income, existing_emi, loan_amounts, tenures, search_step=1000):
+        """
+        Decision, score and risk surface over loan amounts x tenures
+        for one applicant, in one vectorized pass, plus the maximum
+        approvable amount per tenure. Decisions are encoded as indexes
+        into DECISION_CODES.
+        """
+        loan_amounts = np.asarray(loan_amounts, dtype=np.int64)
+        tenures = np.asarray(tenures, dtype=np.int64)
+        if len(loan_amounts) == 0 or len(tenures) == 0:
+            raise ValueError("Grid needs at least one loan amount and one tenure")
+        if (loan_amounts <= 0).any() or (tenures <= 0).any():
+            raise ValueError("Loan amounts and tenures must be positive")
+        if len(loan_amounts) * len(tenures) > EligibilityAgent.MAX_GRID_CELLS:
+            raise ValueError(f"Grid exceeds {EligibilityAgent.MAX_GRID_CELLS} cells")
+
+        policy = EligibilityAgent.policy()
+        active = EligibilityAgent.models().active
+        risk, surface = EligibilityAgent._surface(
+            monthly_income, existing_emi, loan_amounts, tenures, active, policy
+        )
+        max_amounts, step = EligibilityAgent.max_approvable_amounts(
+            monthly_income, existing_emi, tenures, active, policy, search_step
+        )
+
+        decision_index = np.select(
+            [surface["decision"] == code for code in EligibilityAgent.DECISION_CODES],
+            range(len(EligibilityAgent.DECISION_CODES))
+        )
+
+        return {
+            "monthly_income": monthly_income,
+            "existing_emi": existing_emi,
+            "model_version": active.version,
+            "policy_version": policy.version,
+            "loan_amounts": loan_amounts.tolist(),
+            "tenures": tenures.tolist(),
+            "decision_codes": EligibilityAgent.DECISION_CODES,
+            # Rows follow `tenures`, columns follow `loan_amounts`
+            "decision": decision_index.tolist(),
+            "eligibility_score": surface["eligibility_score"].astype(int).tolist(),
+            "dti_ratio": np.round(surface["dti_ratio"], 3).tolist(),
+            # Depends on the amount only: one value per column
+            "risk_probability": np.round(risk, 4).tolist(),
+            "max_approvable_amount": max_amounts,
+            "search_step": step
+        }
@@ -1,26 +1,24 @@
-import os
-import google.generativeai as genai
+import json
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-model = genai.GenerativeModel("gemini-2.0-flash")
+from app.services.llm_gateway import llm_gateway, failure_outcome
+from app.services.llm_cache import llm_cache, prompt_fingerprint
+from app.services.streaming import JsonFieldStream
+from app.services.metrics import LLM_REQUESTS, observe_llm_usage
 
 
 class EmpathyAgent:
     """
     LLM-based agent for empathetic, human-like explanations.
-    Uses Gemini API (cost-friendly).
+    Uses the configured LLM backend (Gemini by default, cost-friendly).
     """
 
     @staticmethod
-    def generate_response(eligibility_result):
+    def build_prompt(eligibility_result):
         decision = eligibility_result.decision
-        score = eligibility_result.eligibility_score
         risk = eligibility_result.risk_probability
         reason = eligibility_result.reason or "multiple financial factors"
 
-        prompt = f"""
+        return f"""
 You are Tata Mitra, a warm and supportive loan advisor AI.
 
 Current Situation:
@@ -36,13 +34,107 @@ Generate a JSON response with two fields:
 Output strictly valid JSON.
 """
 
+    @staticmethod
+    def fallback_response(eligibility_result):
+        return {
+            "title": "Application Status",
+            "message": f"Loan decision: {eligibility_result.decision}. We encourage you to review the improvement factors below."
+        }
+
+    @staticmethod
+    def validate(text):
+        """
+        Parsed response, or ValueError unless it is a JSON object with
+        a non-empty string title and message. Only validated responses
+        are cached.
+        """
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        for field in ("title", "message"):
+            value = data.get(field)
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f"missing or invalid field: {field}")
+        return {"title": data["title"].strip(), "message": data["message"].strip()}
+
+    @staticmethod
+    def generate_response(eligibility_result):
+        prompt = EmpathyAgent.build_prompt(eligibility_result)
+        cache_key = prompt_fingerprint("empathy", prompt)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome="cache_hit")
+            return dict(cached)
+
+        try:
+            response = llm_gateway.generate(prompt, json_mode=True)
+            result = EmpathyAgent.validate(response.text)
+            observe_llm_usage("EmpathyAgent", response)
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome="success")
+            llm_cache.put(cache_key, result)
+            return dict(result)
+        except Exception as e:
+            print(f"EmpathyAgent Error: {e}")
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome=failure_outcome(e))
+            return EmpathyAgent.fallback_response(eligibility_result)
+
+    @staticmethod
+    async def generate_response_async(eligibility_result):
+        """
+        Non-blocking variant of generate_response for the async orchestrator.
+        """
+        prompt = EmpathyAgent.build_prompt(eligibility_result)
+        cache_key = prompt_fingerprint("empathy", prompt)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome="cache_hit")
+            return dict(cached)
+
+        try:
+            response = await llm_gateway.generate_async(prompt, json_mode=True)
+            result = EmpathyAgent.validate(response.text)
+            observe_llm_usage("EmpathyAgent", response)
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome="success")
+            llm_cache.put(cache_key, result)
+            return dict(result)
+        except Exception as e:
+            print(f"EmpathyAgent Error: {e}")
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome=failure_outcome(e))
+            return EmpathyAgent.fallback_response(eligibility_result)
+
+    @staticmethod
+    async def stream_response(eligibility_result):
+        """
+        Streaming variant of generate_response_async.
+        Yields {"field", "delta"} items as the title and message are
+        generated, then {"final": {...}} with the parsed response.
+        """
+        prompt = EmpathyAgent.build_prompt(eligibility_result)
+        cache_key = prompt_fingerprint("empathy", prompt)
+
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome="cache_hit")
+            for field in ("title", "message"):
+                if cached.get(field):
+                    yield {"field": field, "delta": cached[field]}
+            yield {"final": dict(cached)}
+            return
+
+        parser = JsonFieldStream(("title", "message"))
         try:
-            response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-            import json
-            return json.loads(response.text)
+            response = await llm_gateway.stream_async(prompt, json_mode=True)
+            async for chunk in response:
+                for field, delta in parser.feed(chunk.text):
+                    yield {"field": field, "delta": delta}
+            result = EmpathyAgent.validate(parser.text)
+            observe_llm_usage("EmpathyAgent", response)
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome="success")
+            llm_cache.put(cache_key, result)
         except Exception as e:
             print(f"EmpathyAgent Error: {e}")
-            return {
-                "title": "Application Status",
-                "message": f"Loan decision: {decision}. We encourage you to review the improvement factors below."
-            }
+            LLM_REQUESTS.inc(agent="EmpathyAgent", outcome=failure_outcome(e))
+            result = EmpathyAgent.fallback_response(eligibility_result)
+        yield {"final": result}
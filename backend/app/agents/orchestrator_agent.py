@@ -1,10 +1,35 @@
+import asyncio
+import os
 import uuid
+from datetime import datetime, timezone
 
 from app.schemas.loan_input import LoanInput
+from app.schemas.eligibility import EligibilityResult
 from app.agents.eligibility_agent import EligibilityAgent
 from app.agents.empathy_agent import EmpathyAgent
 from app.agents.credit_improvement_agent import CreditImprovementAgent
-from app.services.agent_logger import log_agent_event
+from app.agents.advisory_agent import AdvisoryAgent
+from app.services.agent_logger import log_agent_event, record_loan_application, audit_writer
+from app.services.analytics import dashboard_aggregator
+from app.services.job_queue import job_queue
+from app.services.metrics import RequestTimer, timed, LLM_REQUESTS, REQUEST_ERRORS
+
+# Per-agent deadlines for the async path (seconds)
+EMPATHY_TIMEOUT = 8.0
+ADVICE_TIMEOUT = 12.0
+ADVISORY_TIMEOUT = 12.0
+
+# "split": separate empathy and advice LLM calls; "fused": one
+# AdvisoryAgent call for rejected / conditional applicants
+ADVISORY_MODE = os.getenv("ADVISORY_MODE", "split").lower()
+
+# Free audit-queue slots required to write an application's audit rows
+# (about six) on the event loop; leaves margin for other producers
+AUDIT_ROWS_HEADROOM = 64
+
+# Audit writes scheduled by streams closed early; the event loop only
+# keeps weak references to tasks
+_PENDING_AUDITS = set()
 
 
 class OrchestratorAgent:
@@ -24,13 +49,33 @@ class OrchestratorAgent:
         try:
             return OrchestratorAgent._process(loan_input)
         except Exception as e:
-            import traceback
-            with open("error.log", "w") as f:
-                f.write(traceback.format_exc())
+            OrchestratorAgent._record_error("sync")
+            raise e
+
+    @staticmethod
+    async def process_loan_application_async(loan_input: LoanInput):
+        try:
+            return await OrchestratorAgent._process_async(loan_input)
+        except Exception as e:
+            OrchestratorAgent._record_error("async")
             raise e
 
+    @staticmethod
+    def _record_error(flow):
+        import traceback
+        REQUEST_ERRORS.inc(flow=flow)
+        # Appended, so concurrent failures do not overwrite each other
+        with open("error.log", "a") as f:
+            f.write(f"--- {datetime.now(timezone.utc).isoformat()} ({flow})\n{traceback.format_exc()}\n")
+
     @staticmethod
     def _process(loan_input: LoanInput):
+        timer = RequestTimer()
+        with timer.activate():
+            return OrchestratorAgent._process_timed(loan_input, timer)
+
+    @staticmethod
+    def _process_timed(loan_input: LoanInput, timer: RequestTimer):
         # -------------------------------------------------
         # SESSION INITIALIZATION
         # -------------------------------------------------
@@ -41,54 +86,509 @@ class OrchestratorAgent:
         # -------------------------------------------------
         eligibility_result = EligibilityAgent.evaluate(loan_input)
 
-        log_agent_event(
-            session_id=session_id,
-            agent_name="EligibilityAgent",
-            event_type="eligibility_decision",
-            input_snapshot=loan_input.dict(),
-            output_snapshot={
-                "decision": eligibility_result.decision,
-                "eligibility_score": eligibility_result.eligibility_score,
-                "risk_probability": eligibility_result.risk_probability,
-                "dti_ratio": eligibility_result.dti_ratio,
-                "reason": eligibility_result.reason
-            }
+        with timed("audit_write"):
+            OrchestratorAgent._log_eligibility(session_id, loan_input, eligibility_result)
+
+        improvement_factors, targets = OrchestratorAgent._improvement_plan(loan_input, eligibility_result)
+
+        return OrchestratorAgent._enrich(
+            session_id, loan_input, eligibility_result, improvement_factors, targets, timer
+        )
+
+    @staticmethod
+    def _improvement_plan(loan_input, eligibility_result):
+        """
+        Deterministic improvement factors and eligibility targets,
+        (None, None) for approved applicants.
+        """
+        if eligibility_result.decision not in ["rejected", "conditional"]:
+            return None, None
+        improvement_factors = CreditImprovementAgent.get_improvement_factors(
+            loan_input, eligibility_result
         )
+        with timed("improvement_targets"):
+            targets = CreditImprovementAgent.solve_eligibility_targets(loan_input)
+        return improvement_factors, targets
 
+    @staticmethod
+    def _enrich(session_id, loan_input, eligibility_result, improvement_factors, targets, timer):
+        """
+        LLM half of the synchronous flow: advice and explanation, their
+        audit events and the final response.
+        """
         # -------------------------------------------------
         # CREDIT IMPROVEMENT (ONLY IF NEEDED)
         # -------------------------------------------------
-        improvement_factors = None
         personalized_advice = None
+        empathy_data = None
+
+        if improvement_factors is not None:
+            if ADVISORY_MODE == "fused":
+                with timed("advisory_llm"):
+                    empathy_data = AdvisoryAgent.generate(
+                        eligibility_result, improvement_factors, loan_input, targets
+                    )
+                personalized_advice = empathy_data["advice"]
+            else:
+                with timed("advice_llm"):
+                    personalized_advice = CreditImprovementAgent.generate_personalized_advice(
+                        improvement_factors, loan_input, targets
+                    )
+
+            with timed("audit_write"):
+                OrchestratorAgent._log_advice(session_id, improvement_factors, targets, personalized_advice)
+
+        # -------------------------------------------------
+        # EMPATHY / EXPLANATION AGENT (GEMINI LLM)
+        # -------------------------------------------------
+        if empathy_data is None:
+            with timed("empathy_llm"):
+                empathy_data = EmpathyAgent.generate_response(eligibility_result)
+        user_title = empathy_data.get("title", "Application Update")
+        user_message = empathy_data.get("message", "Please review your application details.")
+
+        with timed("audit_write"):
+            OrchestratorAgent._log_explanation(session_id, eligibility_result, user_title, user_message)
+
+        # -------------------------------------------------
+        # FINAL ORCHESTRATOR LOG
+        # -------------------------------------------------
+        mode = OrchestratorAgent._advisory_mode(eligibility_result)
+        timer.record_application(mode)
+        with timed("audit_write"):
+            OrchestratorAgent._log_final(
+                session_id, loan_input, eligibility_result, timer.breakdown(), dict(timer.usage, mode=mode)
+            )
+
+        return OrchestratorAgent._build_response(
+            session_id, eligibility_result, user_title, user_message, personalized_advice, targets
+        )
+
+    # -------------------------------------------------
+    # JOB MODE (DEFERRED LLM ENRICHMENT)
+    # -------------------------------------------------
+    @staticmethod
+    def submit_loan_application_job(loan_input: LoanInput, lane="interactive"):
+        """
+        Decides eligibility now and queues the LLM enrichment on the
+        job queue. Returns the deterministic part of the response; the
+        full response is available from job_queue.get() once the
+        session status is "completed".
+        """
+        try:
+            session_id = str(uuid.uuid4())
+            timer = RequestTimer()
+            with timer.activate():
+                eligibility_result = EligibilityAgent.evaluate(loan_input)
+                improvement_factors, targets = OrchestratorAgent._improvement_plan(
+                    loan_input, eligibility_result
+                )
+
+            now = datetime.now(timezone.utc)
+            eligibility = OrchestratorAgent._eligibility_snapshot(eligibility_result)
+            job_queue.enqueue(session_id, {
+                "loan_input": loan_input.dict(),
+                "eligibility": eligibility,
+                "improvement_factors": improvement_factors,
+                "eligibility_targets": targets
+            }, lane=lane, created_at=now)
+
+            # The session row was committed with the job
+            with timer.activate(), timed("audit_write"):
+                OrchestratorAgent._log_eligibility(
+                    session_id, loan_input, eligibility_result, with_session=False, timestamp=now
+                )
+
+            response = OrchestratorAgent._eligibility_event(
+                session_id, eligibility_result.decision, eligibility, targets
+            )
+            response["job_status"] = "queued"
+            return response
+        except Exception as e:
+            OrchestratorAgent._record_error("job")
+            raise e
+
+    @staticmethod
+    def run_enrichment_job(session_id, payload):
+        """
+        Job queue handler: the LLM enrichment for a queued session,
+        returning the same body /chat/apply-loan returns.
+        """
+        loan_input = LoanInput(**payload["loan_input"])
+        eligibility_result = EligibilityResult(**payload["eligibility"])
+
+        timer = RequestTimer()
+        with timer.activate():
+            return OrchestratorAgent._enrich(
+                session_id, loan_input, eligibility_result,
+                payload.get("improvement_factors"), payload.get("eligibility_targets"), timer
+            )
+
+    @staticmethod
+    async def _process_async(loan_input: LoanInput):
+        """
+        Same flow as _process, but the two LLM calls run concurrently
+        once the deterministic eligibility decision is known (or run as
+        one fused call in "fused" advisory mode).
+        """
+        session_id = str(uuid.uuid4())
+        timer = RequestTimer()
+
+        with timer.activate():
+            eligibility_result = EligibilityAgent.evaluate(loan_input)
+
+        # Recorded before any LLM call, as in _process: a cancelled
+        # request or a failing agent must not lose the decision
+        await OrchestratorAgent._write_eligibility_audit(session_id, loan_input, eligibility_result, timer)
+
+        # -------------------------------------------------
+        # LLM AGENTS (CONCURRENT, WITH DEADLINES)
+        # -------------------------------------------------
+        improvement_factors = None
+        targets = None
+        advice_task = None
+        advisory_task = None
 
         if eligibility_result.decision in ["rejected", "conditional"]:
             improvement_factors = CreditImprovementAgent.get_improvement_factors(
                 loan_input, eligibility_result
             )
+            with timer.activate(), timed("improvement_targets"):
+                targets = CreditImprovementAgent.solve_eligibility_targets(loan_input)
 
-            personalized_advice = CreditImprovementAgent.generate_personalized_advice(
-                improvement_factors, loan_input
+        if improvement_factors is not None and ADVISORY_MODE == "fused":
+            advisory_task = OrchestratorAgent._with_timeout(
+                AdvisoryAgent.generate_async(eligibility_result, improvement_factors, loan_input, targets),
+                ADVISORY_TIMEOUT,
+                AdvisoryAgent.fallback_response(eligibility_result),
+                "AdvisoryAgent",
+                "advisory_llm",
+                timer
+            )
+        elif improvement_factors is not None:
+            advice_task = OrchestratorAgent._with_timeout(
+                CreditImprovementAgent.generate_personalized_advice_async(
+                    improvement_factors, loan_input, targets
+                ),
+                ADVICE_TIMEOUT,
+                CreditImprovementAgent.FALLBACK_ADVICE,
+                "CreditImprovementAgent",
+                "advice_llm",
+                timer
             )
 
-            log_agent_event(
-                session_id=session_id,
-                agent_name="CreditImprovementAgent",
-                event_type="personalized_credit_advice",
-                input_snapshot={
-                    "factors": improvement_factors
-                },
-                output_snapshot={
-                    "advice": personalized_advice
-                }
+        if advisory_task is not None:
+            empathy_data = await advisory_task
+            personalized_advice = empathy_data["advice"]
+        else:
+            empathy_task = OrchestratorAgent._with_timeout(
+                EmpathyAgent.generate_response_async(eligibility_result),
+                EMPATHY_TIMEOUT,
+                EmpathyAgent.fallback_response(eligibility_result),
+                "EmpathyAgent",
+                "empathy_llm",
+                timer
             )
+            if advice_task is not None:
+                empathy_data, personalized_advice = await asyncio.gather(empathy_task, advice_task)
+            else:
+                empathy_data, personalized_advice = await empathy_task, None
 
-        # -------------------------------------------------
-        # EMPATHY / EXPLANATION AGENT (GEMINI LLM)
-        # -------------------------------------------------
-        empathy_data = EmpathyAgent.generate_response(eligibility_result)
         user_title = empathy_data.get("title", "Application Update")
         user_message = empathy_data.get("message", "Please review your application details.")
 
+        await OrchestratorAgent._write_audit_trail(
+            session_id, loan_input, eligibility_result, improvement_factors, targets,
+            personalized_advice, user_title, user_message, timer
+        )
+
+        return OrchestratorAgent._build_response(
+            session_id, eligibility_result, user_title, user_message, personalized_advice, targets
+        )
+
+    @staticmethod
+    async def stream_loan_application(loan_input: LoanInput):
+        """
+        Streaming flow for Server-Sent Events. Yields (event, data) pairs:
+
+        - "eligibility" as soon as the deterministic decision is known
+        - "empathy_delta" {field, delta} / "advice_delta" {delta} while
+          the LLM agents generate, interleaved as they arrive
+        - "empathy" {title, message} and "advice" {advice} with each
+          agent's final text; this replaces the deltas when the agent
+          failed or timed out part-way and fell back
+          (in "fused" mode one AdvisoryAgent stream feeds all of these)
+        - "done" with the same body /chat/apply-loan returns
+
+        The eligibility decision is recorded before the first event. The
+        rest of the audit trail records the final assembled texts, or,
+        when the client disconnects, whatever the agents had produced.
+        """
+        try:
+            session_id = str(uuid.uuid4())
+            timer = RequestTimer()
+            with timer.activate():
+                eligibility_result = EligibilityAgent.evaluate(loan_input)
+
+            # Recorded before anything is sent, as in _process
+            await OrchestratorAgent._write_eligibility_audit(session_id, loan_input, eligibility_result, timer)
+
+            improvement_factors = None
+            targets = None
+            if eligibility_result.decision in ["rejected", "conditional"]:
+                improvement_factors = CreditImprovementAgent.get_improvement_factors(
+                    loan_input, eligibility_result
+                )
+                with timer.activate(), timed("improvement_targets"):
+                    targets = CreditImprovementAgent.solve_eligibility_targets(loan_input)
+
+            queue = asyncio.Queue()
+            tasks = []
+            empathy_data, personalized_advice = {}, None
+            completed = False
+            try:
+                yield "eligibility", OrchestratorAgent._eligibility_event(
+                    session_id, eligibility_result.decision,
+                    OrchestratorAgent._eligibility_snapshot(eligibility_result), targets
+                )
+
+                if improvement_factors is not None and ADVISORY_MODE == "fused":
+                    tasks.append(asyncio.create_task(OrchestratorAgent._pump(
+                        queue, "advisory",
+                        AdvisoryAgent.stream_response(
+                            eligibility_result, improvement_factors, loan_input, targets
+                        ),
+                        ADVISORY_TIMEOUT,
+                        AdvisoryAgent.fallback_response(eligibility_result),
+                        "AdvisoryAgent",
+                        "advisory_llm",
+                        timer
+                    )))
+                elif improvement_factors is not None:
+                    tasks.append(asyncio.create_task(OrchestratorAgent._pump(
+                        queue, "advice",
+                        CreditImprovementAgent.stream_personalized_advice(
+                            improvement_factors, loan_input, targets
+                        ),
+                        ADVICE_TIMEOUT,
+                        CreditImprovementAgent.FALLBACK_ADVICE,
+                        "CreditImprovementAgent",
+                        "advice_llm",
+                        timer
+                    )))
+
+                if improvement_factors is None or ADVISORY_MODE != "fused":
+                    tasks.append(asyncio.create_task(OrchestratorAgent._pump(
+                        queue, "empathy",
+                        EmpathyAgent.stream_response(eligibility_result),
+                        EMPATHY_TIMEOUT,
+                        EmpathyAgent.fallback_response(eligibility_result),
+                        "EmpathyAgent",
+                        "empathy_llm",
+                        timer
+                    )))
+
+                pending = len(tasks)
+                while pending:
+                    agent, item = await queue.get()
+                    if "final" not in item:
+                        if agent != "advisory":
+                            yield f"{agent}_delta", item
+                        elif item["field"] == "advice":
+                            yield "advice_delta", {"delta": item["delta"]}
+                        else:
+                            yield "empathy_delta", item
+                        continue
+                    pending -= 1
+                    if agent in ("empathy", "advisory"):
+                        empathy_data = item["final"]
+                        yield "empathy", {
+                            "title": empathy_data.get("title", "Application Update"),
+                            "message": empathy_data.get("message", "Please review your application details.")
+                        }
+                    if agent in ("advice", "advisory"):
+                        personalized_advice = item["final"]["advice"] if agent == "advisory" else item["final"]
+                        yield "advice", {"advice": personalized_advice}
+                # Let the pumps finish recording their stage timings
+                await asyncio.gather(*tasks)
+                completed = True
+            finally:
+                # Client disconnects close this generator early
+                for task in tasks:
+                    task.cancel()
+                if not completed:
+                    # Awaiting here could be cancelled again with the
+                    # request, so the write runs as its own task
+                    OrchestratorAgent._schedule_audit(OrchestratorAgent._write_audit_trail(
+                        session_id, loan_input, eligibility_result, improvement_factors, targets,
+                        personalized_advice,
+                        empathy_data.get("title", "Application Update"),
+                        empathy_data.get("message", "Please review your application details."),
+                        timer, client_disconnected=True
+                    ))
+
+            user_title = empathy_data.get("title", "Application Update")
+            user_message = empathy_data.get("message", "Please review your application details.")
+
+            # Shielded: a disconnect now must not drop the write
+            await asyncio.shield(OrchestratorAgent._schedule_audit(OrchestratorAgent._write_audit_trail(
+                session_id, loan_input, eligibility_result, improvement_factors, targets,
+                personalized_advice, user_title, user_message, timer
+            )))
+
+            yield "done", OrchestratorAgent._build_response(
+                session_id, eligibility_result, user_title, user_message, personalized_advice, targets
+            )
+        except Exception as e:
+            OrchestratorAgent._record_error("stream")
+            raise e
+
+    @staticmethod
+    def replay_stream(response):
+        """
+        Event sequence of stream_loan_application for an already
+        completed response (idempotent replays).
+        """
+        yield "eligibility", OrchestratorAgent._eligibility_event(
+            response["session_id"], response["status"], response["eligibility"],
+            response.get("eligibility_targets")
+        )
+        yield "empathy", {"title": response["title"], "message": response["message"]}
+        if response.get("personalized_improvement_advice"):
+            yield "advice", {"advice": response["personalized_improvement_advice"]}
+        yield "done", response
+
+    @staticmethod
+    async def _pump(queue, agent, stream, timeout, fallback, agent_name, stage, timer):
+        """
+        Forwards one agent stream onto the shared queue, always ending
+        with a {"final": ...} item (the fallback on timeout).
+        """
+        async def forward():
+            async for item in stream:
+                await queue.put((agent, item))
+                if "final" in item:
+                    return True
+            return False
+
+        try:
+            with timer.activate(), timed(stage, timer):
+                if await asyncio.wait_for(forward(), timeout):
+                    return
+            print(f"{agent_name} Error: stream ended without a result")
+            LLM_REQUESTS.inc(agent=agent_name, outcome="fallback")
+        except asyncio.TimeoutError:
+            print(f"{agent_name} Error: timed out after {timeout}s")
+            LLM_REQUESTS.inc(agent=agent_name, outcome="timeout")
+        await queue.put((agent, {"final": fallback}))
+
+    @staticmethod
+    async def _with_timeout(coro, timeout, fallback, agent_name, stage, timer):
+        try:
+            # Active, so the agent's LLM usage is added to this request
+            with timer.activate(), timed(stage, timer):
+                return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            print(f"{agent_name} Error: timed out after {timeout}s")
+            LLM_REQUESTS.inc(agent=agent_name, outcome="timeout")
+            return fallback
+
+    @staticmethod
+    def _advisory_mode(eligibility_result):
+        # Label for per-application LLM usage metrics
+        if eligibility_result.decision not in ["rejected", "conditional"]:
+            return "empathy_only"
+        return "fused" if ADVISORY_MODE == "fused" else "split"
+
+    # -------------------------------------------------
+    # AUDIT EVENTS
+    # -------------------------------------------------
+    @staticmethod
+    async def _write_audit(write):
+        if audit_writer.has_room(AUDIT_ROWS_HEADROOM):
+            write()
+        else:
+            # Durable commits, and submits that could wait on a full
+            # queue or write synchronously, must stay off the event loop
+            await asyncio.to_thread(write)
+
+    @staticmethod
+    async def _write_eligibility_audit(session_id, loan_input, eligibility_result, timer):
+        def write():
+            with timed("audit_write", timer):
+                OrchestratorAgent._log_eligibility(session_id, loan_input, eligibility_result)
+
+        await OrchestratorAgent._write_audit(write)
+
+    @staticmethod
+    async def _write_audit_trail(session_id, loan_input, eligibility_result, improvement_factors, targets,
+                                 personalized_advice, user_title, user_message, timer,
+                                 client_disconnected=False):
+        timings = timer.breakdown()
+        mode = OrchestratorAgent._advisory_mode(eligibility_result)
+        timer.record_application(mode)
+        usage = dict(timer.usage, mode=mode)
+
+        def write():
+            with timed("audit_write", timer):
+                if improvement_factors is not None:
+                    OrchestratorAgent._log_advice(session_id, improvement_factors, targets, personalized_advice)
+                OrchestratorAgent._log_explanation(session_id, eligibility_result, user_title, user_message)
+                OrchestratorAgent._log_final(
+                    session_id, loan_input, eligibility_result, timings, usage, client_disconnected
+                )
+
+        await OrchestratorAgent._write_audit(write)
+
+    @staticmethod
+    def _schedule_audit(coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        _PENDING_AUDITS.add(task)
+        task.add_done_callback(OrchestratorAgent._audit_done)
+        return task
+
+    @staticmethod
+    def _audit_done(task):
+        _PENDING_AUDITS.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"OrchestratorAgent Error: {task.exception()}")
+
+    @staticmethod
+    def _log_eligibility(session_id, loan_input, eligibility_result, with_session=True, timestamp=None):
+        # One timestamp for the audit row, the application row and the
+        # dashboard aggregates, so checkpoint replay lines up exactly
+        now = timestamp or datetime.now(timezone.utc)
+
+        record_loan_application(
+            session_id, loan_input, eligibility_result, created_at=now, with_session=with_session
+        )
+        log_agent_event(
+            session_id=session_id,
+            agent_name="EligibilityAgent",
+            event_type="eligibility_decision",
+            input_snapshot=loan_input.dict(),
+            output_snapshot=OrchestratorAgent._eligibility_snapshot(eligibility_result),
+            timestamp=now
+        )
+        dashboard_aggregator.record(eligibility_result, now)
+
+    @staticmethod
+    def _log_advice(session_id, improvement_factors, targets, personalized_advice):
+        log_agent_event(
+            session_id=session_id,
+            agent_name="CreditImprovementAgent",
+            event_type="personalized_credit_advice",
+            input_snapshot={
+                "factors": improvement_factors,
+                "eligibility_targets": targets
+            },
+            output_snapshot={
+                "advice": personalized_advice
+            }
+        )
+
+    @staticmethod
+    def _log_explanation(session_id, eligibility_result, user_title, user_message):
         log_agent_event(
             session_id=session_id,
             agent_name="EmpathyAgent",
@@ -103,37 +603,66 @@ class OrchestratorAgent:
             }
         )
 
-        # -------------------------------------------------
-        # FINAL ORCHESTRATOR LOG
-        # -------------------------------------------------
+    @staticmethod
+    def _log_final(session_id, loan_input, eligibility_result, timings_ms, llm_usage,
+                   client_disconnected=False):
+        output = {
+            "status": eligibility_result.decision,
+            # Per-stage breakdown up to the final audit write
+            "timings_ms": timings_ms,
+            # LLM calls and tokens for this application, by advisory mode
+            "llm_usage": llm_usage
+        }
+        if client_disconnected:
+            # Streamed response closed before "done"; texts are partial
+            output["client_disconnected"] = True
         log_agent_event(
             session_id=session_id,
             agent_name="OrchestratorAgent",
             event_type="final_response",
             input_snapshot=loan_input.dict(),
-            output_snapshot={
-                "status": eligibility_result.decision
-            }
+            output_snapshot=output
         )
 
-        # -------------------------------------------------
-        # FINAL USER RESPONSE
-        # -------------------------------------------------
+    # -------------------------------------------------
+    # FINAL USER RESPONSE
+    # -------------------------------------------------
+    @staticmethod
+    def _eligibility_snapshot(eligibility_result):
+        return {
+            "decision": eligibility_result.decision,
+            "eligibility_score": eligibility_result.eligibility_score,
+            "risk_probability": eligibility_result.risk_probability,
+            "dti_ratio": eligibility_result.dti_ratio,
+            "reason": eligibility_result.reason,
+            "triggered_rules": eligibility_result.triggered_rules,
+            "model_version": eligibility_result.model_version,
+            "policy_version": eligibility_result.policy_version
+        }
+
+    @staticmethod
+    def _eligibility_event(session_id, status, eligibility, targets):
+        event = {"session_id": session_id, "status": status, "eligibility": eligibility}
+        if targets:
+            event["eligibility_targets"] = targets
+        return event
+
+    @staticmethod
+    def _build_response(session_id, eligibility_result, user_title, user_message, personalized_advice,
+                        targets=None):
         response = {
             "session_id": session_id,
             "status": eligibility_result.decision,
             "title": user_title,
             "message": user_message,
-            "eligibility": {
-                "decision": eligibility_result.decision,
-                "eligibility_score": eligibility_result.eligibility_score,
-                "risk_probability": eligibility_result.risk_probability,
-                "dti_ratio": eligibility_result.dti_ratio,
-                "reason": eligibility_result.reason
-            }
+            "eligibility": OrchestratorAgent._eligibility_snapshot(eligibility_result)
         }
 
         if personalized_advice:
             response["personalized_improvement_advice"] = personalized_advice
 
+        if targets:
+            # Largest amount / shortest tenure / smallest EMI cut reaching each decision
+            response["eligibility_targets"] = targets
+
         return response
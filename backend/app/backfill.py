@@ -0,0 +1,105 @@
+"""
+Backfill the structured loan_applications table from agent_events.
+
+Usage (from backend/):
+    python -m app.backfill [--batch-size N]
+
+Reads every "eligibility_decision" event in (timestamp, event_id)
+order and writes one LoanApplication (plus its Session) per session
+that is not already present. Safe to re-run.
+"""
+import argparse
+import uuid
+
+from sqlalchemy import and_, or_
+
+from app.db import SessionLocal, engine, upgrade_schema
+from app.models.agent_event import AgentEvent
+from app.models.loan_application import LoanApplication
+from app.models.session import Session
+
+
+def backfill(batch_size=1000):
+    upgrade_schema(engine)
+
+    inserted = 0
+    last = None
+    db = SessionLocal()
+    try:
+        while True:
+            query = db.query(AgentEvent).filter(
+                AgentEvent.event_type == "eligibility_decision"
+            )
+            if last is not None:
+                query = query.filter(or_(
+                    AgentEvent.timestamp > last[0],
+                    and_(AgentEvent.timestamp == last[0], AgentEvent.event_id > last[1])
+                ))
+            events = query.order_by(
+                AgentEvent.timestamp, AgentEvent.event_id
+            ).limit(batch_size).all()
+            if not events:
+                break
+            last = (events[-1].timestamp, events[-1].event_id)
+
+            session_ids = {e.session_id for e in events}
+            done = {
+                row[0] for row in db.query(LoanApplication.session_id)
+                .filter(LoanApplication.session_id.in_(session_ids))
+            }
+            known_sessions = {
+                row[0] for row in db.query(Session.session_id)
+                .filter(Session.session_id.in_(session_ids))
+            }
+
+            sessions = []
+            applications = []
+            for e in events:
+                if e.session_id in done:
+                    continue
+                done.add(e.session_id)
+
+                loan = e.input_snapshot or {}
+                result = e.output_snapshot or {}
+                if e.session_id not in known_sessions:
+                    sessions.append({
+                        "session_id": e.session_id,
+                        "status": "completed",
+                        "created_at": e.timestamp
+                    })
+                applications.append({
+                    "application_id": str(uuid.uuid4()),
+                    "session_id": e.session_id,
+                    "monthly_income": loan.get("monthly_income"),
+                    "existing_emi": loan.get("existing_emi"),
+                    "loan_amount": loan.get("loan_amount"),
+                    "tenure_months": loan.get("tenure_months"),
+                    "dti_ratio": result.get("dti_ratio"),
+                    "eligibility_score": result.get("eligibility_score"),
+                    "risk_probability": result.get("risk_probability"),
+                    "decision": result.get("decision"),
+                    "reason": result.get("reason"),
+                    "created_at": e.timestamp
+                })
+
+            db.bulk_insert_mappings(Session, sessions)
+            db.bulk_insert_mappings(LoanApplication, applications)
+            db.commit()
+            inserted += len(applications)
+    finally:
+        db.close()
+
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill loan_applications from agent_events")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    inserted = backfill(args.batch_size)
+    print(f"Backfilled {inserted} loan applications")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Offline bulk scoring with the same rules and model as EligibilityAgent.
+
+Usage (from backend/):
+    python -m app.batch_score INPUT OUTPUT [--chunk-size N] [--workers N]
+
+INPUT is a CSV or Parquet file with either API-shaped columns
+(monthly_income, existing_emi, loan_amount, tenure_months) or
+training-shaped columns like app/ml/loan_data.csv (person_income as
+annual income, loan_amnt). Missing EMI / tenure columns are filled
+from --default-emi / --default-tenure.
+
+OUTPUT is written as CSV or Parquet (by extension or --format) with
+one row per input row: row, decision, dti_ratio, eligibility_score,
+risk_probability, reason, triggered_rules (";"-separated rule ids) and
+policy_version. Parquet input/output needs pyarrow.
+
+The input is streamed in chunks and chunks are scored on a process
+pool. At most 2 x workers chunks are in flight, so memory stays
+bounded however large the input is.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from app.agents.eligibility_agent import EligibilityAgent
+
+API_COLUMNS = ["monthly_income", "existing_emi", "loan_amount", "tenure_months"]
+TRAINING_COLUMNS = ["person_income", "loan_amnt"]
+OUTPUT_COLUMNS = [
+    "row", "decision", "dti_ratio", "eligibility_score", "risk_probability", "reason",
+    "triggered_rules", "policy_version"
+]
+
+
+# -------------------------------------------------
+# INPUT
+# -------------------------------------------------
+def _file_format(path, explicit=None):
+    if explicit:
+        return explicit
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def _input_columns(path, fmt):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).schema_arrow.names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def read_chunks(path, fmt, chunk_size):
+    """
+    Yields DataFrames of at most chunk_size rows, reading only the
+    columns the scorer needs.
+    """
+    available = _input_columns(path, fmt)
+    usecols = [c for c in API_COLUMNS + TRAINING_COLUMNS if c in available]
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=usecols):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=usecols, chunksize=chunk_size)
+
+
+def to_arrays(chunk, default_emi, default_tenure):
+    """
+    Maps an input chunk onto the four LoanInput arrays.
+    """
+    n = len(chunk)
+
+    if "monthly_income" in chunk:
+        monthly_income = chunk["monthly_income"].to_numpy(dtype=np.float64)
+    elif "person_income" in chunk:
+        monthly_income = chunk["person_income"].to_numpy(dtype=np.float64) / 12
+    else:
+        raise ValueError("Input needs a monthly_income or person_income column")
+
+    if "loan_amount" in chunk:
+        loan_amount = chunk["loan_amount"].to_numpy(dtype=np.float64)
+    elif "loan_amnt" in chunk:
+        loan_amount = chunk["loan_amnt"].to_numpy(dtype=np.float64)
+    else:
+        raise ValueError("Input needs a loan_amount or loan_amnt column")
+
+    existing_emi = (chunk["existing_emi"].to_numpy(dtype=np.float64)
+                    if "existing_emi" in chunk else np.full(n, float(default_emi)))
+    tenure_months = (chunk["tenure_months"].to_numpy(dtype=np.float64)
+                     if "tenure_months" in chunk else np.full(n, float(default_tenure)))
+
+    return monthly_income, existing_emi, loan_amount, tenure_months
+
+
+# -------------------------------------------------
+# SCORING (runs in worker processes)
+# -------------------------------------------------
+def score_chunk(start_row, monthly_income, existing_emi, loan_amount, tenure_months):
+    policy = EligibilityAgent.policy()
+    results = EligibilityAgent.evaluate_arrays(
+        monthly_income, existing_emi, loan_amount, tenure_months, policy=policy
+    )
+    return pd.DataFrame({
+        "row": np.arange(start_row, start_row + len(loan_amount)),
+        "decision": results["decision"],
+        "dti_ratio": np.round(results["dti_ratio"], 2),
+        "eligibility_score": results["eligibility_score"],
+        "risk_probability": np.round(results["risk_probability"], 2),
+        "reason": results["reason"],
+        "triggered_rules": [";".join(ids) for ids in policy.triggered_rules(results["rule_mask"])],
+        "policy_version": policy.version
+    }, columns=OUTPUT_COLUMNS)
+
+
+# -------------------------------------------------
+# OUTPUT
+# -------------------------------------------------
+class ResultWriter:
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._parquet = None
+        self._wrote_header = False
+
+    def write(self, frame):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            frame = frame.astype({
+                "reason": "string", "decision": "string",
+                "triggered_rules": "string", "policy_version": "string"
+            })
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a" if self._wrote_header else "w",
+                         header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def run(input_path, output_path, chunk_size=50000, workers=None,
+        input_format=None, output_format=None, default_emi=0, default_tenure=36):
+    """
+    Scores input_path into output_path. Returns (rows, seconds).
+    """
+    input_format = _file_format(input_path, input_format)
+    output_format = _file_format(output_path, output_format)
+    workers = workers or os.cpu_count() or 1
+
+    # Load the model before the pool forks so workers share it copy-on-write
+    EligibilityAgent.get_model()
+
+    writer = ResultWriter(output_path, output_format)
+    pending = deque()
+    rows = 0
+    start = time.perf_counter()
+
+    def drain_one():
+        nonlocal rows
+        frame = pending.popleft().result()
+        writer.write(frame)
+        rows += len(frame)
+        elapsed = time.perf_counter() - start
+        print(f"{rows:>12,} rows  {rows / elapsed:>12,.0f} rows/s", file=sys.stderr)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            next_row = 0
+            for chunk in read_chunks(input_path, input_format, chunk_size):
+                arrays = to_arrays(chunk, default_emi, default_tenure)
+                pending.append(pool.submit(score_chunk, next_row, *arrays))
+                next_row += len(chunk)
+
+                # Bound in-flight chunks; results are written in input order
+                while len(pending) >= 2 * workers:
+                    drain_one()
+
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-score loan applications offline")
+    parser.add_argument("input", help="input CSV or Parquet file")
+    parser.add_argument("output", help="output CSV or Parquet file")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--input-format", choices=["csv", "parquet"], default=None)
+    parser.add_argument("--format", dest="output_format", choices=["csv", "parquet"], default=None)
+    parser.add_argument("--default-emi", type=float, default=0, help="existing EMI when the input has none")
+    parser.add_argument("--default-tenure", type=int, default=36, help="tenure in months when the input has none")
+    args = parser.parse_args()
+
+    rows, seconds = run(
+        args.input, args.output,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        input_format=args.input_format,
+        output_format=args.output_format,
+        default_emi=args.default_emi,
+        default_tenure=args.default_tenure
+    )
+    rate = rows / seconds if seconds else 0.0
+    print(f"Scored {rows:,} rows in {seconds:.2f}s ({rate:,.0f} rows/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
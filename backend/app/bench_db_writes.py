@@ -0,0 +1,107 @@
+"""
+Concurrent-write benchmark for the database configuration.
+
+Usage (from backend/):
+    python -m app.bench_db_writes [--writers N] [--events N] [--url URL]
+
+Spawns N writer processes (standing in for uvicorn workers) that each
+commit --events AgentEvent rows one at a time, like AUDIT_MODE=durable.
+Without --url it compares two throwaway SQLite files:
+the default rollback journal and the WAL / synchronous=NORMAL /
+busy-timeout configuration from app.db. With --url it runs once
+against that database (e.g. a local PostgreSQL container).
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import OperationalError
+
+from app.db import Base, create_db_engine
+from app.models.agent_event import AgentEvent
+
+
+def _writer(url, wal, busy_timeout_ms, events):
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_db_engine(url, wal=wal, busy_timeout_ms=busy_timeout_ms)
+    Session = sessionmaker(bind=engine)
+    written = errors = 0
+
+    for _ in range(events):
+        db = Session()
+        try:
+            db.add(AgentEvent(
+                event_id=str(uuid.uuid4()),
+                session_id=str(uuid.uuid4()),
+                agent_name="BenchWriter",
+                event_type="bench",
+                input_snapshot={"n": written},
+                output_snapshot={"ok": True},
+                timestamp=datetime.now(timezone.utc)
+            ))
+            db.commit()
+            written += 1
+        except OperationalError:
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+
+    engine.dispose()
+    return written, errors
+
+
+def run(label, url, wal, busy_timeout_ms, writers, events):
+    engine = create_db_engine(url, wal=wal, busy_timeout_ms=busy_timeout_ms)
+    Base.metadata.create_all(bind=engine, tables=[AgentEvent.__table__])
+    engine.dispose()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=writers) as pool:
+        results = list(pool.map(
+            _writer,
+            [url] * writers, [wal] * writers, [busy_timeout_ms] * writers, [events] * writers
+        ))
+    seconds = time.perf_counter() - start
+
+    written = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    print(f"{label:<34} {written:>7} writes  {written / seconds:>9.0f} writes/s  "
+          f"{errors:>5} lock errors  {seconds:6.2f}s")
+    return written / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-write benchmark")
+    parser.add_argument("--writers", type=int, default=8, help="concurrent writer processes")
+    parser.add_argument("--events", type=int, default=300, help="commits per writer")
+    parser.add_argument("--url", default=None, help="benchmark this database URL only")
+    args = parser.parse_args()
+
+    if args.url:
+        run(args.url, args.url, True, 5000, args.writers, args.events)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Previous configuration: rollback journal, synchronous=FULL,
+        # sqlite3's default 5s lock wait
+        baseline = run(
+            "sqlite rollback journal",
+            f"sqlite:///{os.path.join(tmp, 'journal.db')}",
+            False, 5000, args.writers, args.events
+        )
+        tuned = run(
+            "sqlite WAL + synchronous=NORMAL",
+            f"sqlite:///{os.path.join(tmp, 'wal.db')}",
+            True, 5000, args.writers, args.events
+        )
+    print(f"Speedup: {tuned / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
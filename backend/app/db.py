@@ -1,11 +1,100 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./loan_ai.db")
+
+# Pool sizing (per process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite tuning
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def create_db_engine(url=DATABASE_URL, wal=SQLITE_WAL, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS):
+    """
+    Builds the SQLAlchemy engine for `url`.
+
+    SQLite files get WAL journaling, synchronous=NORMAL and a busy
+    timeout on every new connection, so concurrent writers wait for
+    the lock instead of failing with "database is locked". Other
+    backends (e.g. postgresql+psycopg2://...) get a pre-pinged,
+    recycled connection pool.
+    """
+    parsed = make_url(url)
+
+    if parsed.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
 
-DATABASE_URL = "sqlite:///./loan_ai.db"
+    if parsed.database in (None, "", ":memory:"):
+        # Every connection to :memory: is a separate, empty database, so
+        # all threads (requests, audit writer, job workers) must share one
+        return create_engine(
+            url, connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+    engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": busy_timeout_ms / 1000
+        },
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.close()
+
+    return engine
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False)
 Base = declarative_base()
+
+
+def upgrade_schema(bind=engine):
+    """
+    Creates missing tables, then adds columns and indexes that were
+    introduced after a table was first created. create_all alone
+    never alters an existing table.
+    """
+    Base.metadata.create_all(bind=bind)
+
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                    ))
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
@@ -0,0 +1,333 @@
+"""
+End-to-end load test for the loan application endpoint.
+
+Usage (from backend/):
+    LLM_BACKEND=stub python -m app.serve --workers 4 --preload   # in one shell
+    python -m app.loadtest [--url URL] [--concurrency N] [--requests N]
+                           [--stream] [--report out.json]
+                           [--baseline previous.json] [--max-regression 0.15]
+
+Applicants are sampled from loan_data.csv (annual income -> monthly
+income, loan amount as-is) with a seeded tenure and existing EMI, so
+the decision mix follows the training population. N closed-loop
+clients each keep one HTTP connection open and send back-to-back
+requests.
+
+Reports throughput, p50/p95/p99 latency, the decision mix, and the
+per-stage breakdown, LLM outcomes and per-application LLM calls and
+tokens by advisory mode (ADVISORY_MODE=split|fused on the server)
+taken from the server's /metrics before and after the run. /metrics is per worker process, so the stage
+breakdown is exact with one worker and a sample with several.
+With --stream the SSE endpoint is used and time to the first
+(eligibility) event is reported too.
+
+With --baseline the run is compared to a previous --report and the
+exit status is 1 if p95 / p99 latency grew, or throughput fell, by
+more than --max-regression.
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "ml", "loan_data.csv")
+TENURES = (12, 24, 36, 48, 60)
+
+
+# ---------------------------
+# Workload
+# ---------------------------
+def sample_applicants(n, seed, path=DATA_PATH):
+    df = pd.read_csv(path, usecols=["person_income", "loan_amnt"])
+    rows = df.sample(n=n, replace=n > len(df), random_state=seed)
+    rng = np.random.default_rng(seed)
+
+    monthly_income = np.maximum((rows["person_income"].to_numpy() / 12).round(), 1).astype(int)
+    existing_emi = (monthly_income * rng.uniform(0.0, 0.4, n)).round().astype(int)
+    return [
+        {
+            "monthly_income": int(income),
+            "existing_emi": int(emi),
+            "loan_amount": int(amount),
+            "tenure_months": int(tenure)
+        }
+        for income, emi, amount, tenure in zip(
+            monthly_income, existing_emi, rows["loan_amnt"].astype(int), rng.choice(TENURES, n)
+        )
+    ]
+
+
+# ---------------------------
+# Client
+# ---------------------------
+def _connect(url):
+    parsed = urlparse(url)
+    cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+    return cls(parsed.hostname, parsed.port, timeout=120)
+
+
+def _send(conn, path, payload, stream):
+    body = json.dumps(payload)
+    start = time.perf_counter()
+    conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+
+    first_event = None
+    if stream:
+        status = None
+        event = None
+        for raw in iter(response.readline, b""):
+            line = raw.decode("utf-8").rstrip("\n")
+            if line.startswith("event:"):
+                event = line[6:].strip()
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+            elif line.startswith("data:") and event == "done":
+                status = json.loads(line[5:]).get("status")
+    else:
+        data = response.read()
+        status = json.loads(data).get("status") if response.status == 200 else None
+
+    return {
+        "seconds": time.perf_counter() - start,
+        "first_event_seconds": first_event,
+        "ok": response.status == 200 and status is not None,
+        "decision": status
+    }
+
+
+def run_load(url, path, applicants, concurrency, stream):
+    work = queue.Queue()
+    for payload in applicants:
+        work.put(payload)
+    results = []
+    lock = threading.Lock()
+
+    def client():
+        conn = _connect(url)
+        while True:
+            try:
+                payload = work.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                result = _send(conn, path, payload, stream)
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                conn.close()
+                conn = _connect(url)
+                result = {"seconds": None, "first_event_seconds": None, "ok": False,
+                          "decision": None, "error": str(e)}
+            with lock:
+                results.append(result)
+        conn.close()
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - start
+
+
+# ---------------------------
+# Server-side metrics
+# ---------------------------
+_SAMPLE = re.compile(r'^(\w+)\{([^}]*)\} (\S+)$')
+_USAGE_SERIES = (
+    "loan_application_llm_calls_sum", "loan_application_llm_calls_count",
+    "loan_application_llm_tokens_sum", "loan_application_seconds_sum"
+)
+
+
+def scrape_metrics(url):
+    """
+    Returns {(name, labels): value} for the series the report uses.
+    """
+    conn = _connect(url)
+    try:
+        conn.request("GET", "/metrics")
+        text = conn.getresponse().read().decode("utf-8")
+    except (OSError, http.client.HTTPException):
+        return {}
+    finally:
+        conn.close()
+
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match and match.group(1) in ("loan_stage_seconds_sum", "loan_stage_seconds_count",
+                                        "llm_requests_total") + _USAGE_SERIES:
+            samples[(match.group(1), match.group(2))] = float(match.group(3))
+    return samples
+
+
+def metrics_delta(before, after):
+    stages, llm, usage = {}, {}, {}
+    for (name, labels), value in after.items():
+        delta = value - before.get((name, labels), 0.0)
+        label_map = dict(re.findall(r'(\w+)="([^"]*)"', labels))
+        if name in _USAGE_SERIES:
+            field = name[len("loan_application_"):]
+            if "kind" in label_map:
+                field = f"{label_map['kind']}_tokens"
+            usage.setdefault(label_map["mode"], {})[field] = delta
+        elif name == "llm_requests_total":
+            if delta:
+                llm.setdefault(label_map["agent"], {})[label_map["outcome"]] = int(delta)
+        else:
+            field = "sum" if name.endswith("_sum") else "count"
+            stages.setdefault(label_map["stage"], {})[field] = delta
+
+    breakdown = {
+        stage: {"calls": int(v.get("count", 0)),
+                "mean_ms": round(v["sum"] / v["count"] * 1000, 3)}
+        for stage, v in sorted(stages.items()) if v.get("count")
+    }
+
+    # Means per application, by advisory mode
+    per_mode = {}
+    for mode, v in sorted(usage.items()):
+        applications = v.get("llm_calls_count", 0)
+        if applications:
+            per_mode[mode] = {
+                "applications": int(applications),
+                "llm_calls": round(v.get("llm_calls_sum", 0) / applications, 3),
+                "prompt_tokens": round(v.get("prompt_tokens", 0) / applications, 1),
+                "completion_tokens": round(v.get("completion_tokens", 0) / applications, 1),
+                "mean_ms": round(v.get("seconds_sum", 0) / applications * 1000, 1)
+            }
+    return breakdown, llm, per_mode
+
+
+# ---------------------------
+# Report
+# ---------------------------
+def _percentiles(values):
+    if not values:
+        return {}
+    values = np.array(values) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "max_ms": round(float(values.max()), 1)
+    }
+
+
+def build_report(results, elapsed, stages, llm, per_mode, args):
+    ok = [r for r in results if r["ok"]]
+    decisions = {}
+    for r in ok:
+        decisions[r["decision"]] = decisions.get(r["decision"], 0) + 1
+
+    report = {
+        "endpoint": args.path,
+        "concurrency": args.concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency": _percentiles([r["seconds"] for r in ok]),
+        "decisions": decisions,
+        "stages": stages,
+        "llm": llm,
+        "llm_usage_per_application": per_mode
+    }
+    if args.stream:
+        report["first_event_latency"] = _percentiles(
+            [r["first_event_seconds"] for r in ok if r["first_event_seconds"] is not None]
+        )
+    return report
+
+
+def print_report(report):
+    latency = report["latency"]
+    print(f"{report['requests']} requests, {report['errors']} errors in {report['elapsed_seconds']}s "
+          f"-> {report['throughput_rps']} req/s at concurrency {report['concurrency']}")
+    if latency:
+        print(f"latency  p50 {latency['p50_ms']} ms  p95 {latency['p95_ms']} ms  "
+              f"p99 {latency['p99_ms']} ms  max {latency['max_ms']} ms")
+    if report.get("first_event_latency"):
+        first = report["first_event_latency"]
+        print(f"first event  p50 {first['p50_ms']} ms  p95 {first['p95_ms']} ms  p99 {first['p99_ms']} ms")
+    print(f"decisions {report['decisions']}")
+    if report["stages"]:
+        print(f"{'stage':<16} {'calls':>7} {'mean_ms':>10}")
+        for stage, row in report["stages"].items():
+            print(f"{stage:<16} {row['calls']:>7} {row['mean_ms']:>10.3f}")
+    for agent, outcomes in report["llm"].items():
+        print(f"{agent}: {outcomes}")
+    for mode, row in report.get("llm_usage_per_application", {}).items():
+        print(f"{mode}: {row['llm_calls']} LLM calls, {row['prompt_tokens']} prompt / "
+              f"{row['completion_tokens']} completion tokens, {row['mean_ms']} ms per application")
+
+
+def compare(report, baseline, max_regression):
+    """
+    Returns a list of regressions beyond the allowed fraction.
+    """
+    failures = []
+    for key in ("p95_ms", "p99_ms"):
+        old, new = baseline["latency"].get(key), report["latency"].get(key)
+        if old and new and new > old * (1 + max_regression):
+            failures.append(f"{key} {old} -> {new}")
+    old, new = baseline.get("throughput_rps"), report["throughput_rps"]
+    if old and new < old * (1 - max_regression):
+        failures.append(f"throughput_rps {old} -> {new}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the loan application endpoint")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20, help="requests sent before measuring")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data", default=DATA_PATH, help="applicant source CSV")
+    parser.add_argument("--stream", action="store_true", help="use /chat/apply-loan/stream")
+    parser.add_argument("--report", default=None, help="write the report as JSON")
+    parser.add_argument("--baseline", default=None, help="previous --report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args()
+    args.path = "/chat/apply-loan/stream" if args.stream else "/chat/apply-loan"
+
+    applicants = sample_applicants(args.warmup + args.requests, args.seed, args.data)
+
+    if args.warmup:
+        run_load(args.url, args.path, applicants[:args.warmup], args.concurrency, args.stream)
+
+    before = scrape_metrics(args.url)
+    results, elapsed = run_load(
+        args.url, args.path, applicants[args.warmup:], args.concurrency, args.stream
+    )
+    stages, llm, per_mode = metrics_delta(before, scrape_metrics(args.url))
+
+    report = build_report(results, elapsed, stages, llm, per_mode, args)
+    print_report(report)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(report, json.load(f), args.max_regression)
+        if failures:
+            print("REGRESSION: " + "; ".join(failures))
+            sys.exit(1)
+        print("No regression against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,73 @@
-from fastapi import FastAPI
+import asyncio
+import os
+import time
+_IMPORT_START = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 load_dotenv()
 
 from app.db import engine
-from app.models import session, loan_application, agent_event
-from app.db import Base
+from app.models import (
+    session, loan_application, agent_event, analytics_checkpoint, application_job, archived_session
+)
+from app.db import upgrade_schema
 from sqlalchemy import inspect
 from app.schemas.loan_input import LoanInput
+from app.schemas.model_registry import ModelLoadRequest, ShadowConfig
+from app.schemas.eligibility_grid import EligibilityGridRequest
 from app.agents.eligibility_agent import EligibilityAgent
 from app.agents.orchestrator_agent import OrchestratorAgent
+from app.policies.engine import PolicyError
 from app.db import SessionLocal
-from app.models.agent_event import AgentEvent
+from app.services.event_query import filtered_events, serialize_event, encode_cursor, stream_events
+from app.services.llm_cache import llm_cache
+from app.services.llm_gateway import llm_gateway
+from app.services.idempotency import idempotency_store, IdempotencyConflict
+from app.services.agent_logger import audit_writer
+from app.services.job_queue import job_queue
+from app.services.audit_retention import audit_retention
+from app.services.drift import drift_monitor
+from app.services.analytics import dashboard_aggregator
+from app.services.registry import registry
+from app.services.streaming import sse_event
+from app.services.metrics import metrics
 from fastapi.middleware.cors import CORSMiddleware
 
+registry.record_timing("app_import", time.perf_counter() - _IMPORT_START)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # app.serve upgrades once before forking its workers
+    if os.getenv("SCHEMA_UPGRADED") != "1":
+        start = time.perf_counter()
+        upgrade_schema(engine)
+        registry.record_timing("schema_upgrade", time.perf_counter() - start)
 
-Base.metadata.create_all(bind=engine)
+    # Warm the model and LLM client now instead of on the first request
+    if os.getenv("PRELOAD_RESOURCES", "0") == "1":
+        registry.preload()
+
+    audit_writer.start()
+    dashboard_aggregator.start()
+    job_queue.start(OrchestratorAgent.run_enrichment_job)
+    audit_retention.start()
+    yield
+    audit_retention.shutdown()
+    # Running jobs finish first; their audit events are then flushed
+    job_queue.shutdown()
+    audit_writer.shutdown()
+    dashboard_aggregator.shutdown()
 
 app = FastAPI(
     title="Multi-Agent Loan Advisor",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -44,73 +93,268 @@ def debug_tables():
 def test_eligibility(data: LoanInput):
     return EligibilityAgent.evaluate(data)
 
+@app.post("/eligibility/batch")
+def batch_eligibility(data: List[LoanInput]):
+    return EligibilityAgent.evaluate_many(data)
+
+@app.post("/eligibility/grid")
+def eligibility_grid(data: EligibilityGridRequest):
+    loan_amounts = data.loan_amounts
+    if loan_amounts is None:
+        if data.amount_max < data.amount_min:
+            raise HTTPException(status_code=422, detail="amount_max must be >= amount_min")
+        count = (data.amount_max - data.amount_min) // data.amount_step + 1
+        if count * len(data.tenures) > EligibilityAgent.MAX_GRID_CELLS:
+            raise HTTPException(status_code=422, detail="Grid is too large")
+        loan_amounts = list(range(data.amount_min, data.amount_max + 1, data.amount_step))
+
+    try:
+        return EligibilityAgent.evaluate_grid(
+            data.monthly_income, data.existing_emi, loan_amounts, data.tenures, data.search_step
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/models")
+def list_models():
+    return EligibilityAgent.models().describe()
+
+@app.post("/models", status_code=202)
+def load_model(data: ModelLoadRequest):
+    models = EligibilityAgent.models()
+    try:
+        models.load_async(data.version, data.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return models.describe()
+
+@app.post("/models/{version}/activate")
+def activate_model(version: str):
+    models = EligibilityAgent.models()
+    try:
+        models.activate(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return models.describe()
+
+@app.delete("/models/{version}")
+def unload_model(version: str):
+    models = EligibilityAgent.models()
+    try:
+        models.unload(version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return models.describe()
+
+@app.put("/models/shadow")
+def configure_shadow(data: ShadowConfig):
+    models = EligibilityAgent.models()
+    try:
+        models.set_shadow(data.version, data.fraction)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return models.describe()
+
+@app.get("/policy")
+def get_policy():
+    return EligibilityAgent.policies().describe()
+
+@app.post("/policy/reload")
+def reload_policy():
+    # Reloads this worker now; the others pick the file up on their next mtime check
+    policies = EligibilityAgent.policies()
+    try:
+        policies.reload()
+    except (PolicyError, OSError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return policies.describe()
+
+def _client_identity(request: Request):
+    # Scopes input-based deduplication to one client; there is no
+    # authenticated subject, so address plus user agent stands in
+    if request.client is None:
+        return None
+    return f"{request.client.host}|{request.headers.get('user-agent', '')}"
+
 @app.post("/chat/apply-loan")
-def apply_loan(data: LoanInput):
-    return OrchestratorAgent.process_loan_application(data)
+async def apply_loan(data: LoanInput, request: Request, response: Response,
+                     idempotency_key: Optional[str] = Header(None)):
+    key, fingerprint, ttl = idempotency_store.key_for(
+        "apply-loan", data, idempotency_key, _client_identity(request)
+    )
+    try:
+        result, replayed = await idempotency_store.run(
+            key, fingerprint, ttl,
+            lambda: OrchestratorAgent.process_loan_application_async(data)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-@app.get("/debug/agent-events")
-def get_agent_events():
-    db = SessionLocal()
-    events = db.query(AgentEvent).all()
-    return [
-        {
-            "agent": e.agent_name,
-            "event_type": e.event_type,
-            "input": e.input_snapshot,
-            "output": e.output_snapshot
-        }
-        for e in events
-    ]
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
-@app.get("/api/dashboard/stats")
-def get_dashboard_stats():
+@app.post("/chat/apply-loan/stream")
+async def apply_loan_stream(data: LoanInput, request: Request, idempotency_key: Optional[str] = Header(None)):
+    # Shares stored responses with /chat/apply-loan; a completed
+    # application is replayed as a stream without recomputation
+    key, fingerprint, ttl = idempotency_store.key_for(
+        "apply-loan", data, idempotency_key, _client_identity(request)
+    )
+    try:
+        stored = idempotency_store.lookup(key, fingerprint)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    async def events():
+        if stored is not None:
+            for event, payload in OrchestratorAgent.replay_stream(stored):
+                yield sse_event(event, payload)
+            return
+        async for event, payload in OrchestratorAgent.stream_loan_application(data):
+            if event == "done":
+                idempotency_store.store(key, fingerprint, ttl, payload)
+            yield sse_event(event, payload)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/apply-loan/jobs", status_code=202)
+async def apply_loan_job(
+    data: LoanInput,
+    request: Request,
+    response: Response,
+    lane: str = Query("interactive", pattern="^(interactive|bulk)$"),
+    idempotency_key: Optional[str] = Header(None)
+):
+    # Eligibility now, LLM enrichment later: poll GET /sessions/{session_id}
+    key, fingerprint, ttl = idempotency_store.key_for(
+        "apply-loan-job", data, idempotency_key, _client_identity(request)
+    )
+    try:
+        result, replayed = await idempotency_store.run(
+            key, fingerprint, ttl,
+            lambda: asyncio.to_thread(OrchestratorAgent.submit_loan_application_job, data, lane)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    state = job_queue.get(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return state
+
+@app.get("/debug/agent-events")
+def get_agent_events(
+    session_id: Optional[str] = None,
+    agent_name: Optional[str] = None,
+    event_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
     db = SessionLocal()
     try:
-        # Total Applications
-        total_apps = db.query(AgentEvent).filter(AgentEvent.event_type == "eligibility_decision").count()
-        
-        # Approval/Rejection Counts
-        approved = db.query(AgentEvent).filter(
-            AgentEvent.event_type == "eligibility_decision",
-            AgentEvent.output_snapshot.like('%"decision": "approved"%')
-        ).count()
-        
-        rejected = db.query(AgentEvent).filter(
-            AgentEvent.event_type == "eligibility_decision",
-            AgentEvent.output_snapshot.like('%"decision": "rejected"%')
-        ).count()
-        
-        conditional = db.query(AgentEvent).filter(
-            AgentEvent.event_type == "eligibility_decision",
-            AgentEvent.output_snapshot.like('%"decision": "conditional"%')
-        ).count()
-        
-        # Risk Distribution
-        # Note: In a real production app, we would query structured fields. 
-        # Here we scrape JSON for simplicity or just return raw events for frontend to process if dataset is small.
-        # For now, let's return the last 50 events for client-side detailed charts to keep backend simple
-        recent_events = db.query(AgentEvent).filter(
-            AgentEvent.event_type == "eligibility_decision"
-        ).order_by(AgentEvent.timestamp.desc()).limit(50).all()
-        
-        events_data = [
-            {
-                "timestamp": e.timestamp.isoformat(),
-                "decision": e.output_snapshot.get("decision"),
-                "risk_probability": e.output_snapshot.get("risk_probability"),
-                "eligibility_score": e.output_snapshot.get("eligibility_score")
-            }
-            for e in recent_events
-        ]
+        try:
+            query = filtered_events(
+                db, session_id=session_id, agent_name=agent_name,
+                event_type=event_type, since=since, until=until, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Fetch one extra row to know whether another page exists
+        events = query.limit(limit + 1).all()
+        has_more = len(events) > limit
+        events = events[:limit]
 
         return {
-            "summary": {
-                "total": total_apps,
-                "approved": approved,
-                "rejected": rejected,
-                "conditional": conditional
-            },
-            "recent_events": events_data
+            "events": [serialize_event(e) for e in events],
+            "next_cursor": encode_cursor(events[-1]) if has_more else None
         }
     finally:
         db.close()
+
+@app.get("/debug/agent-events/export")
+def export_agent_events(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    session_id: Optional[str] = None,
+    agent_name: Optional[str] = None,
+    event_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_events(
+            SessionLocal, format, session_id=session_id, agent_name=agent_name,
+            event_type=event_type, since=since, until=until
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=agent_events.{format}"}
+    )
+
+@app.get("/debug/agent-events/archive/{session_id}")
+def get_archived_session(session_id: str):
+    archived = audit_retention.archived_session(session_id)
+    if archived is None:
+        raise HTTPException(status_code=404, detail="Session not in the archive")
+    return archived
+
+@app.get("/debug/audit-retention")
+def get_audit_retention_stats():
+    return audit_retention.stats()
+
+@app.post("/debug/audit-retention/compact")
+def run_audit_compaction():
+    return audit_retention.compact()
+
+@app.get("/debug/startup")
+def get_startup_report():
+    return registry.report()
+
+@app.get("/debug/audit-writer")
+def get_audit_writer_stats():
+    return audit_writer.stats()
+
+@app.get("/debug/llm-cache")
+def get_llm_cache_stats():
+    return llm_cache.stats()
+
+@app.get("/debug/llm-gateway")
+def get_llm_gateway_stats():
+    return llm_gateway.stats()
+
+@app.get("/debug/jobs")
+def get_job_queue_stats():
+    return job_queue.stats()
+
+@app.get("/debug/drift")
+def get_input_drift():
+    return drift_monitor.report()
+
+@app.get("/debug/idempotency")
+def get_idempotency_stats():
+    return idempotency_store.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/api/dashboard/stats")
+def get_dashboard_stats():
+    # Served from in-memory aggregates, reloaded from the shared
+    # checkpoint every ANALYTICS_REFRESH_INTERVAL seconds
+    return dashboard_aggregator.snapshot()
@@ -0,0 +1,86 @@
+"""
+Parity check and microbenchmark for the compiled risk scorer.
+
+Usage (from backend/):
+    python -m app.ml.bench_scorer [--rows N] [--repeat N]
+
+1. Scores every row of loan_data.csv with both the sklearn pipeline
+   and CompiledRiskScorer and fails if any probability differs by
+   more than the tolerance.
+2. Times single-row scoring of a LoanInput on both paths.
+"""
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.ml.compiled_scorer import CompiledRiskScorer
+from app.ml.feature_builder import build_ml_features
+from app.schemas.loan_input import LoanInput
+
+ML_DIR = os.path.dirname(__file__)
+MODEL_PATH = os.path.join(ML_DIR, "risk_model.pkl")
+DATA_PATH = os.path.join(ML_DIR, "loan_data.csv")
+TOLERANCE = 1e-9
+
+
+def check_parity(pipeline, scorer, rows=None):
+    df = pd.read_csv(DATA_PATH, nrows=rows).drop(columns=["loan_status"])
+
+    expected = pipeline.predict_proba(df)[:, 1]
+    actual = np.array([scorer.predict_proba_row(row) for row in df.to_dict("records")])
+
+    max_diff = float(np.max(np.abs(expected - actual)))
+    print(f"Parity: {len(df)} rows, max |diff| = {max_diff:.3e}")
+    return max_diff <= TOLERANCE
+
+
+def bench(label, fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - start) / repeat
+    print(f"{label:<28} {per_call * 1e6:10.1f} us/call")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=None, help="limit parity check to N csv rows")
+    parser.add_argument("--repeat", type=int, default=2000, help="iterations per benchmark")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(MODEL_PATH)
+    scorer = CompiledRiskScorer.from_pipeline(pipeline)
+    if scorer is None:
+        print("Pipeline layout is not supported by CompiledRiskScorer")
+        return 1
+
+    if not check_parity(pipeline, scorer, args.rows):
+        print(f"FAILED: difference exceeds {TOLERANCE}")
+        return 1
+
+    loan_input = LoanInput(
+        monthly_income=60000,
+        existing_emi=8000,
+        loan_amount=400000,
+        tenure_months=36
+    )
+
+    slow = bench(
+        "Pipeline.predict_proba",
+        lambda: pipeline.predict_proba(build_ml_features(loan_input))[0][1],
+        args.repeat
+    )
+    fast = bench("CompiledRiskScorer.score", lambda: scorer.score(loan_input), args.repeat)
+    print(f"Speedup: {slow / fast:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.ml.feature_builder import build_feature_dict
+
+
+class CompiledRiskScorer:
+    """
+    Pandas-free scorer compiled from the saved sklearn pipeline.
+
+    Supports the StandardScaler + OneHotEncoder + LogisticRegression
+    layout produced by train_data.py. The scaler statistics, one-hot
+    category maps and LR coefficients are pulled into NumPy arrays
+    once, so scoring a row is a dot product plus a sigmoid.
+    """
+
+    def __init__(
+        self,
+        numeric_features: List[str],
+        means: np.ndarray,
+        scales: np.ndarray,
+        numeric_coef: np.ndarray,
+        categorical_features: List[str],
+        category_weights: List[Dict[str, float]],
+        intercept: float
+    ):
+        self.numeric_features = numeric_features
+        self.means = means
+        self.scales = scales
+        self.numeric_coef = numeric_coef
+        self.categorical_features = categorical_features
+        self.category_weights = category_weights
+        self.intercept = intercept
+
+    # =================================================
+    # COMPILATION
+    # =================================================
+    @classmethod
+    def from_pipeline(cls, pipeline) -> Optional["CompiledRiskScorer"]:
+        """
+        Compiles a fitted pipeline into a CompiledRiskScorer.
+        Returns None when the pipeline layout is not supported,
+        so callers can fall back to pipeline.predict_proba.
+        """
+        try:
+            preprocessor = pipeline.named_steps["preprocessor"]
+            classifier = pipeline.named_steps["classifier"]
+            transformers = {
+                name: (transformer, columns)
+                for name, transformer, columns in preprocessor.transformers_
+                if transformer != "drop"
+            }
+            if set(transformers) != {"num", "cat"} or classifier.coef_.shape[0] != 1:
+                return None
+
+            num_transformer, numeric_features = transformers["num"]
+            cat_transformer, categorical_features = transformers["cat"]
+            scaler = num_transformer.named_steps["scaler"]
+            onehot = cat_transformer.named_steps["onehot"]
+            if getattr(onehot, "drop_idx_", None) is not None:
+                return None
+        except (AttributeError, KeyError, TypeError):
+            return None
+
+        coef = classifier.coef_[0]
+        n_numeric = len(numeric_features)
+
+        means = scaler.mean_ if scaler.with_mean else np.zeros(n_numeric)
+        scales = scaler.scale_ if scaler.with_std else np.ones(n_numeric)
+
+        # One-hot columns follow the numeric block, in categories_ order
+        category_weights = []
+        offset = n_numeric
+        for categories in onehot.categories_:
+            category_weights.append({
+                str(category): float(coef[offset + i])
+                for i, category in enumerate(categories)
+            })
+            offset += len(categories)
+
+        if offset != len(coef):
+            return None
+
+        return cls(
+            numeric_features=list(numeric_features),
+            means=np.asarray(means, dtype=np.float64),
+            scales=np.asarray(scales, dtype=np.float64),
+            numeric_coef=np.asarray(coef[:n_numeric], dtype=np.float64),
+            categorical_features=list(categorical_features),
+            category_weights=category_weights,
+            intercept=float(classifier.intercept_[0])
+        )
+
+    # =================================================
+    # SCORING
+    # =================================================
+    def predict_proba_row(self, row: dict) -> float:
+        """
+        Returns the positive-class probability for one raw feature row.
+        Unknown categories contribute nothing, as with
+        OneHotEncoder(handle_unknown="ignore").
+        """
+        # Same operations in the same order as predict_proba_columns,
+        # so one row and a batch give bit-identical probabilities
+        z = self.intercept
+        for i, col in enumerate(self.numeric_features):
+            z += (float(row[col]) - self.means[i]) / self.scales[i] * self.numeric_coef[i]
+
+        for col, weights in zip(self.categorical_features, self.category_weights):
+            z += weights.get(str(row[col]), 0.0)
+
+        return _sigmoid(z)
+
+    def predict_proba_columns(self, columns: dict, n: int) -> np.ndarray:
+        """
+        Vectorized predict_proba_row over n rows given column-wise.
+        Scalar column values apply to every row.
+        """
+        z = np.full(n, self.intercept, dtype=np.float64)
+        for i, col in enumerate(self.numeric_features):
+            x = np.asarray(columns[col], dtype=np.float64)
+            z += (x - self.means[i]) / self.scales[i] * self.numeric_coef[i]
+
+        for col, weights in zip(self.categorical_features, self.category_weights):
+            values = columns[col]
+            if np.ndim(values) == 0:
+                z += weights.get(str(values), 0.0)
+            else:
+                z += np.array([weights.get(str(v), 0.0) for v in values])
+
+        # exp(-|z|) cannot overflow
+        e = np.exp(-np.abs(z))
+        return np.where(z >= 0, 1.0 / (1.0 + e), e / (1.0 + e))
+
+    def score(self, loan_input) -> float:
+        """
+        Returns the risk probability for a LoanInput.
+        """
+        return self.predict_proba_row(build_feature_dict(loan_input))
+
+
+def _sigmoid(z: float) -> float:
+    # np.exp rather than math.exp: the two can differ in the last bit
+    e = float(np.exp(-abs(z)))
+    if z >= 0:
+        return 1.0 / (1.0 + e)
+    return e / (1.0 + e)
@@ -0,0 +1,55 @@
+"""
+Drift reference profile.
+
+Usage (from backend/):
+    python -m app.ml.drift_reference [--model risk_model.pkl] [--version baseline]
+                                     [--bins 10] [--output drift_reference.json]
+
+Maps each loan_data.csv row onto the API's inputs (monthly income =
+person_income / 12, loan amount = loan_amnt), scores it with the risk
+model through the same feature builder the API uses, and saves the
+sketches and decile histograms that DriftMonitor compares live traffic
+against. Rebuild it after retraining, with the version that will serve.
+"""
+import argparse
+import json
+import os
+
+import joblib
+import pandas as pd
+
+from app.ml.model_registry import ModelVersion
+from app.services.drift import build_reference
+
+ML_DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(ML_DIR, "loan_data.csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--model", default="risk_model.pkl")
+    parser.add_argument("--version", default=os.getenv("RISK_MODEL_VERSION", "baseline"))
+    parser.add_argument("--bins", type=int, default=10)
+    parser.add_argument("--output", default=os.path.join(ML_DIR, "drift_reference.json"))
+    args = parser.parse_args()
+
+    frame = pd.read_csv(args.data, usecols=["person_income", "loan_amnt"])
+    monthly_income = frame["person_income"].to_numpy() / 12
+    loan_amount = frame["loan_amnt"].to_numpy()
+
+    model_path = os.path.join(ML_DIR, args.model)
+    model = ModelVersion(args.version, model_path, joblib.load(model_path))
+    risk_probability = model.predict_batch(monthly_income, loan_amount)
+
+    reference = build_reference(
+        monthly_income, loan_amount, risk_probability, bins=args.bins,
+        source=os.path.basename(args.data), model_version=args.version
+    )
+    with open(args.output, "w") as f:
+        json.dump(reference, f, indent=1)
+    print(f"Wrote {args.output} ({reference['rows']} rows, model {args.version})")
+
+
+if __name__ == "__main__":
+    main()
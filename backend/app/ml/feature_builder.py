@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 # EXACT columns used during training
@@ -19,39 +20,92 @@ TRAINING_COLUMNS = [
     "loan_grade"
 ]
 
-def build_ml_features(loan_input):
+# Safe defaults for attributes the API does not collect
+DEFAULT_FEATURES = {
+    # ---- DEMOGRAPHICS (defaults) ----
+    "person_age": 30,
+    "person_gender": "male",
+    "person_education": "Bachelor",
+    "person_emp_exp": 5,
+    "person_home_ownership": "RENT",
+
+    # ---- FINANCIALS (defaults) ----
+    "loan_int_rate": 12.0,
+
+    # ---- CREDIT HISTORY (defaults) ----
+    "cb_person_cred_hist_length": 6,
+    "cb_person_default_on_file": "N",
+    "previous_loan_defaults_on_file": "N",
+    "credit_score": 650,
+
+    # ---- LOAN METADATA (defaults) ----
+    "loan_intent": "PERSONAL",
+    "loan_grade": "B"
+}
+
+
+def build_feature_dict(loan_input):
     """
-    Builds a complete ML feature row.
+    Builds the raw feature mapping for one application.
     Uses safe defaults for unavailable attributes.
     """
 
     annual_income = loan_input.monthly_income * 12
 
-    data = {
-        # ---- DEMOGRAPHICS (defaults) ----
-        "person_age": 30,
-        "person_gender": "male",
-        "person_education": "Bachelor",
-        "person_emp_exp": 5,
-        "person_home_ownership": "RENT",
+    return {
+        **DEFAULT_FEATURES,
 
         # ---- FINANCIALS (from API) ----
         "person_income": annual_income,
         "loan_amnt": loan_input.loan_amount,
         "loan_percent_income": loan_input.loan_amount / annual_income,
-        "loan_int_rate": 12.0,
+    }
 
-        # ---- CREDIT HISTORY (defaults) ----
-        "cb_person_cred_hist_length": 6,
-        "cb_person_default_on_file": "N",
-        "previous_loan_defaults_on_file": "N",
-        "credit_score": 650,
 
-        # ---- LOAN METADATA (defaults) ----
-        "loan_intent": "PERSONAL",
-        "loan_grade": "B"
-    }
+def build_ml_features(loan_input):
+    """
+    Builds a complete ML feature row.
+    Uses safe defaults for unavailable attributes.
+    """
+
+    data = build_feature_dict(loan_input)
 
     # Force column order + completeness
     return pd.DataFrame([[data[col] for col in TRAINING_COLUMNS]],
                         columns=TRAINING_COLUMNS)
+
+
+def build_feature_columns(monthly_income, loan_amount):
+    """
+    Column-wise counterpart of build_feature_dict for many applications:
+    API-derived columns are arrays, defaults stay scalars.
+    """
+    annual_income = np.asarray(monthly_income) * 12
+    loan_amount = np.asarray(loan_amount)
+
+    return {
+        **DEFAULT_FEATURES,
+        "person_income": annual_income,
+        "loan_amnt": loan_amount,
+        "loan_percent_income": loan_amount / annual_income,
+    }
+
+
+def build_ml_features_batch(monthly_income, loan_amount):
+    """
+    Builds the ML feature matrix for many applications at once.
+    Takes aligned arrays of monthly income and loan amount and
+    returns one row per application, in TRAINING_COLUMNS order.
+    """
+
+    monthly_income = np.asarray(monthly_income)
+    loan_amount = np.asarray(loan_amount)
+    annual_income = monthly_income * 12
+
+    data = {col: np.full(len(loan_amount), value, dtype=object if isinstance(value, str) else None)
+            for col, value in DEFAULT_FEATURES.items()}
+    data["person_income"] = annual_income
+    data["loan_amnt"] = loan_amount
+    data["loan_percent_income"] = loan_amount / annual_income
+
+    return pd.DataFrame(data, columns=TRAINING_COLUMNS)
@@ -0,0 +1,475 @@
+import fcntl
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+
+from app.ml.compiled_scorer import CompiledRiskScorer
+from app.ml.feature_builder import (
+    build_feature_dict, build_feature_columns, build_ml_features, build_ml_features_batch
+)
+
+ML_DIR = os.path.dirname(__file__)
+
+# Warm-up row scored by every version before it can serve traffic
+_WARMUP_INPUT = {
+    "monthly_income": 50000,
+    "existing_emi": 5000,
+    "loan_amount": 300000,
+    "tenure_months": 36
+}
+
+# Grid checked for row/batch scorer parity during warm-up
+_PARITY_INCOMES = [8000, 25000, 50000, 120000, 400000]
+_PARITY_AMOUNTS = [50000, 300000, 1000000, 5000000]
+
+
+class ModelVersion:
+    """
+    One loaded risk pipeline plus its compiled fast-path scorer.
+    """
+
+    def __init__(self, version, path, pipeline):
+        self.version = version
+        self.path = path
+        self.pipeline = pipeline
+        self.scorer = CompiledRiskScorer.from_pipeline(pipeline)
+        self.loaded_at = datetime.now(timezone.utc)
+
+    def features(self, loan_input):
+        """
+        Model input for one application: a feature dict for the
+        compiled scorer, otherwise a one-row DataFrame.
+        """
+        if self.scorer is not None:
+            return build_feature_dict(loan_input)
+        return build_ml_features(loan_input)
+
+    def predict(self, features):
+        if self.scorer is not None:
+            return self.scorer.predict_proba_row(features)
+        return float(self.pipeline.predict_proba(features)[0][1])
+
+    def risk_probability(self, loan_input):
+        return self.predict(self.features(loan_input))
+
+    def predict_batch(self, monthly_income, loan_amount):
+        """
+        Risk probabilities for aligned arrays of income and amount.
+        """
+        if self.scorer is not None:
+            return self.scorer.predict_proba_columns(
+                build_feature_columns(monthly_income, loan_amount), len(loan_amount)
+            )
+        return self.pipeline.predict_proba(build_ml_features_batch(monthly_income, loan_amount))[:, 1]
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "path": os.path.relpath(self.path, ML_DIR),
+            "compiled": self.scorer is not None,
+            "loaded_at": self.loaded_at.isoformat()
+        }
+
+
+class ShadowStats:
+    def __init__(self, version):
+        self.version = version
+        self.scored = 0
+        self.skipped = 0
+        self.failed = 0
+        self.total_abs_diff = 0.0
+        self.max_abs_diff = 0.0
+        self.band_disagreements = 0
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "scored": self.scored,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "mean_abs_diff": round(self.total_abs_diff / self.scored, 6) if self.scored else None,
+            "max_abs_diff": round(self.max_abs_diff, 6),
+            "band_disagreements": self.band_disagreements
+        }
+
+
+class RiskModelRegistry:
+    """
+    Versioned risk pipelines with atomic hot swap and shadow scoring.
+
+    Versions are loaded and warmed on a background thread, then
+    promoted with activate(). Callers take one reference to `active`
+    per evaluation, so requests already in flight finish on the version
+    they started with and nothing is dropped during a swap.
+
+    A shadow version scores a sampled fraction of live traffic on a
+    separate thread, off the request path, and only its agreement with
+    the active model is recorded.
+
+    With a `state_path`, loads, promotions and shadow settings are
+    shared between worker processes: every change is written to that
+    JSON file under a file lock, and each worker re-checks the file's
+    mtime at most every `sync_interval` seconds (see sync()) and
+    converges on it, loading its own copy of new versions and swapping
+    once that copy is warm. Without one, state is per process.
+    """
+
+    def __init__(self, initial: ModelVersion, max_shadow_backlog=100, state_path=None,
+                 sync_interval=5.0):
+        self.base = initial
+        self.active = initial
+        self.versions = {initial.version: initial}
+        self.status = {initial.version: "active"}
+        self.shadow = None
+        self.shadow_fraction = 0.0
+        self.shadow_stats = None
+        self.max_shadow_backlog = max_shadow_backlog
+        self.state_path = state_path
+        self.sync_interval = sync_interval
+
+        # Shared desired state: versions (version -> load request),
+        # active version and shadow settings
+        self.desired = {"versions": {}, "active": initial.version, "shadow": None}
+        self._requests = {}  # version -> load request this process is serving / loading
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._shadow_pending = 0
+        self._state_id = None
+        self._synced = None
+        self._pid = os.getpid()
+
+    @classmethod
+    def from_path(cls, path, version, **kwargs):
+        model_version = ModelVersion(version, path, joblib.load(path))
+        cls._warm(model_version)
+        return cls(model_version, **kwargs)
+
+    # -------------------------------------------------
+    # LOADING & PROMOTION
+    # -------------------------------------------------
+    @staticmethod
+    def resolve_path(filename):
+        """
+        Model files must live under app/ml; rejects anything outside it.
+        """
+        path = os.path.realpath(os.path.join(ML_DIR, filename))
+        if not path.startswith(os.path.realpath(ML_DIR) + os.sep) or not os.path.isfile(path):
+            raise ValueError(f"Unknown model file: {filename}")
+        return path
+
+    @staticmethod
+    def _warm(model_version):
+        from app.schemas.loan_input import LoanInput
+
+        loan_input = LoanInput(**_WARMUP_INPUT)
+        model_version.pipeline.predict_proba(build_ml_features(loan_input))
+        model_version.risk_probability(loan_input)
+
+        # evaluate() scores one row, evaluate_many() a batch; a version
+        # whose two paths disagree would flip decisions at the policy
+        # risk cut-offs depending on the endpoint, so refuse to serve it
+        incomes, amounts = (a.ravel() for a in np.meshgrid(_PARITY_INCOMES, _PARITY_AMOUNTS))
+        batch = model_version.predict_batch(incomes, amounts)
+        for income, amount, expected in zip(incomes, amounts, batch):
+            row = model_version.risk_probability(LoanInput(**{
+                **_WARMUP_INPUT, "monthly_income": int(income), "loan_amount": int(amount)
+            }))
+            if row != float(expected):
+                raise ValueError(
+                    f"Model {model_version.version}: row and batch scorers disagree "
+                    f"for income={income}, amount={amount} ({row!r} != {float(expected)!r})"
+                )
+
+    def load_async(self, version, filename):
+        """
+        Loads and warms a version in the background, in every worker.
+        Poll describe() until its status is "ready".
+        """
+        self.resolve_path(filename)
+
+        def change(state):
+            if version == self.base.version or (
+                version in state["versions"]
+                and not str(self.status.get(version, "")).startswith("failed")
+            ):
+                raise ValueError(f"Model version {version} already exists")
+            # A new request id makes workers retry a version that failed before
+            state["versions"][version] = {"filename": filename, "requested_at": time.time()}
+
+        self._update(change)
+
+    def activate(self, version):
+        def change(state):
+            self._require_ready(state, version)
+            state["active"] = version
+            if (state["shadow"] or {}).get("version") == version:
+                state["shadow"] = None
+
+        self._update(change)
+
+    def unload(self, version):
+        def change(state):
+            if version == state["active"]:
+                raise ValueError("Cannot unload the active model version")
+            if version == self.base.version:
+                raise ValueError("Cannot unload the base model version")
+            state["versions"].pop(version, None)
+            if (state["shadow"] or {}).get("version") == version:
+                state["shadow"] = None
+
+        self._update(change)
+
+    def _require_ready(self, state, version):
+        # Checked on the worker handling the request; others swap as
+        # soon as their own copy is warm
+        if version == self.base.version:
+            return
+        if version in state["versions"] and self.status.get(version) == "loading":
+            raise ValueError(f"Model version {version} is still loading, retry shortly")
+        if version not in state["versions"] or self.status.get(version) not in ("ready", "active"):
+            raise ValueError(f"Model version {version} is not loaded")
+
+    # -------------------------------------------------
+    # SHARED STATE
+    # -------------------------------------------------
+    def sync(self):
+        """
+        Picks up changes other workers made to the shared state.
+        Cheap enough to call on every request: the file is only
+        checked every `sync_interval` seconds.
+        """
+        if self.state_path is None:
+            return
+        if self._synced is not None and time.monotonic() - self._synced < self.sync_interval:
+            return
+        self._synced = time.monotonic()
+
+        if self._pid != os.getpid():
+            # Load threads do not survive a fork: start them again here
+            with self._lock:
+                self._pid = os.getpid()
+                for version in [v for v, status in self.status.items() if status == "loading"]:
+                    del self.status[version]
+                    self._requests.pop(version, None)
+                self._state_id = None
+
+        try:
+            stat = os.stat(self.state_path)
+        except FileNotFoundError:
+            return
+        state_id = (stat.st_mtime_ns, stat.st_ino)
+        if state_id == self._state_id:
+            return
+        try:
+            state = self._read_state()
+        except (OSError, ValueError) as e:
+            print(f"Model registry Error: {self.state_path}: {e}")
+            return
+        self._state_id = state_id
+        self._apply(state)
+
+    def _update(self, change):
+        """
+        Applies change(state) to the shared state under an exclusive
+        file lock, then converges this worker on the result.
+        change() raises ValueError to reject the request.
+        """
+        if self.state_path is None:
+            with self._lock:
+                state = json.loads(json.dumps(self.desired))
+                change(state)
+            self._apply(state)
+            return
+
+        with open(self.state_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = self._read_state() if os.path.exists(self.state_path) else \
+                    json.loads(json.dumps(self.desired))
+                with self._lock:
+                    change(state)
+                tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f, indent=2)
+                os.replace(tmp_path, self.state_path)
+                stat = os.stat(self.state_path)
+                self._state_id = (stat.st_mtime_ns, stat.st_ino)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._apply(state)
+
+    def _read_state(self):
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if not isinstance(state, dict) or not isinstance(state.get("versions"), dict):
+            raise ValueError("invalid model state")
+        state.setdefault("active", self.base.version)
+        state.setdefault("shadow", None)
+        return state
+
+    def _apply(self, state):
+        """
+        Converges this worker on `state`: starts loads for new or
+        re-requested versions, drops removed ones, then promotes.
+        """
+        with self._lock:
+            self.desired = state
+            for version, request in state["versions"].items():
+                if self._requests.get(version) == request:
+                    continue
+                self._requests[version] = request
+                self.status[version] = "loading"
+                threading.Thread(
+                    target=self._load, args=(version, request),
+                    name=f"model-load-{version}", daemon=True
+                ).start()
+
+            for version in list(self.status):
+                if version in state["versions"] or version == self.base.version:
+                    continue
+                if version == self.active.version:
+                    continue  # kept until the desired version is warm
+                self.versions.pop(version, None)
+                self.status.pop(version, None)
+                self._requests.pop(version, None)
+
+            self._promote()
+
+    def _load(self, version, request):
+        try:
+            path = self.resolve_path(request["filename"])
+            model_version = ModelVersion(version, path, joblib.load(path))
+            self._warm(model_version)
+        except Exception as e:
+            with self._lock:
+                if self._requests.get(version) == request:
+                    self.status[version] = f"failed: {e}"
+            return
+        with self._lock:
+            # Superseded or unloaded while loading
+            if self._requests.get(version) != request:
+                return
+            self.versions[version] = model_version
+            self.status[version] = "ready"
+            self._promote()
+
+    def _promote(self):
+        # Caller holds self._lock
+        desired = self.desired
+        target = self.versions.get(desired["active"])
+        if target is not None and target is not self.active and desired["active"] in (
+            self.base.version, *desired["versions"]
+        ) and self.status.get(desired["active"]) in ("ready", "active"):
+            previous = self.active
+            # Single reference assignment: the swap is atomic
+            self.active = target
+            if previous.version in self.status:
+                self.status[previous.version] = "ready"
+            self.status[target.version] = "active"
+            if previous.version not in desired["versions"] and previous is not self.base:
+                self.versions.pop(previous.version, None)
+                self.status.pop(previous.version, None)
+                self._requests.pop(previous.version, None)
+
+        shadow = desired["shadow"]
+        if shadow is None:
+            self.shadow = None
+            self.shadow_fraction = 0.0
+            return
+        model_version = self.versions.get(shadow["version"])
+        if model_version is None or model_version is self.active or \
+                self.status.get(shadow["version"]) != "ready":
+            self.shadow = None
+            self.shadow_fraction = 0.0
+            return
+        if self.shadow is not model_version:
+            self.shadow_stats = ShadowStats(shadow["version"])
+        self.shadow = model_version
+        self.shadow_fraction = shadow["fraction"]
+
+    # -------------------------------------------------
+    # SHADOW SCORING
+    # -------------------------------------------------
+    def set_shadow(self, version, fraction):
+        def change(state):
+            if version is None:
+                state["shadow"] = None
+                return
+            self._require_ready(state, version)
+            state["shadow"] = {"version": version, "fraction": min(max(fraction, 0.0), 1.0)}
+
+        self._update(change)
+
+    def maybe_shadow(self, loan_input, active_probability, policy):
+        """
+        Scores a sampled request on the shadow version. Band
+        disagreements use `policy`'s risk cut-offs, the policy the
+        request itself was evaluated under.
+        """
+        shadow, stats = self.shadow, self.shadow_stats
+        if shadow is None or random.random() >= self.shadow_fraction:
+            return
+
+        with self._lock:
+            if self._shadow_pending >= self.max_shadow_backlog:
+                stats.skipped += 1
+                return
+            self._shadow_pending += 1
+
+        self._shadow_executor().submit(
+            self._score_shadow, shadow, stats, loan_input, active_probability, policy
+        )
+
+    def _shadow_executor(self):
+        # One executor per process; threads do not survive a fork
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-score")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _score_shadow(self, shadow, stats, loan_input, active_probability, policy):
+        try:
+            p = shadow.risk_probability(loan_input)
+            diff = abs(p - active_probability)
+            with self._lock:
+                stats.scored += 1
+                stats.total_abs_diff += diff
+                stats.max_abs_diff = max(stats.max_abs_diff, diff)
+                if policy.risk_band(p) != policy.risk_band(active_probability):
+                    stats.band_disagreements += 1
+        except Exception as e:
+            with self._lock:
+                stats.failed += 1
+            print(f"Shadow scoring Error ({shadow.version}): {e}")
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+
+    # -------------------------------------------------
+    # REPORTING
+    # -------------------------------------------------
+    def describe(self):
+        with self._lock:
+            return {
+                "active": self.active.version,
+                # Differs from active while this worker warms its copy
+                "desired_active": self.desired["active"],
+                "versions": [
+                    {**(self.versions[v].describe() if v in self.versions else {"version": v}),
+                     "status": status}
+                    for v, status in self.status.items()
+                ],
+                "shadow": {
+                    "fraction": self.shadow_fraction,
+                    **self.shadow_stats.describe()
+                } if self.shadow is not None else None
+            }
@@ -1,5 +1,4 @@
-from sqlalchemy import Column, String, DateTime
-from sqlalchemy.dialects.sqlite import JSON
+from sqlalchemy import Column, String, DateTime, Index, JSON
 from sqlalchemy.sql import func
 from app.db import Base
 
@@ -15,3 +14,11 @@ class AgentEvent(Base):
     output_snapshot = Column(JSON)
 
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Composite indexes backing keyset pagination on (timestamp, event_id)
+    __table_args__ = (
+        Index("ix_agent_events_timestamp_event_id", "timestamp", "event_id"),
+        Index("ix_agent_events_session_timestamp", "session_id", "timestamp"),
+        Index("ix_agent_events_agent_timestamp", "agent_name", "timestamp"),
+        Index("ix_agent_events_type_timestamp", "event_type", "timestamp"),
+    )
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy.sql import func
+from app.db import Base
+
+class AnalyticsCheckpoint(Base):
+    __tablename__ = "analytics_checkpoints"
+
+    name = Column(String, primary_key=True)
+    payload = Column(JSON)
+
+    # Every eligibility event stamped at or before this is folded into payload
+    watermark = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
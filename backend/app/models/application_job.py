@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index, JSON
+from sqlalchemy.sql import func
+from app.db import Base
+
+class ApplicationJob(Base):
+    __tablename__ = "application_jobs"
+
+    # One enrichment job per session
+    session_id = Column(String, primary_key=True)
+
+    # Lane: 0 interactive, 1 bulk (lower runs first)
+    priority = Column(Integer, default=0)
+    status = Column(String, default="queued")  # queued / running / done / failed
+    attempts = Column(Integer, default=0)
+
+    payload = Column(JSON)
+    result = Column(JSON)
+    error = Column(String)
+
+    enqueued_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    # A running job whose lease has expired (worker died) is picked up again
+    lease_expires_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_application_jobs_claim", "status", "priority", "enqueued_at"),
+    )
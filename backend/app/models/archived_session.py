@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy.sql import func
+from app.db import Base
+
+class ArchivedSession(Base):
+    __tablename__ = "archived_sessions"
+
+    # Lookup index for sessions whose agent events were moved to the archive
+    session_id = Column(String, primary_key=True)
+    partition = Column(String, index=True)  # YYYY-MM-DD of the session's first event
+    path = Column(String)                   # archive file, relative to the archive directory
+    event_count = Column(Integer)
+
+    first_event_at = Column(DateTime(timezone=True))
+    last_event_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
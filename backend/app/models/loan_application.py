@@ -6,7 +6,7 @@ class LoanApplication(Base):
     __tablename__ = "loan_applications"
 
     application_id = Column(String, primary_key=True, index=True)
-    session_id = Column(String, ForeignKey("sessions.session_id"))
+    session_id = Column(String, ForeignKey("sessions.session_id"), index=True)
 
     monthly_income = Column(Integer)
     existing_emi = Column(Integer)
@@ -15,6 +15,8 @@ class LoanApplication(Base):
 
     dti_ratio = Column(Float)
     eligibility_score = Column(Float)
-    decision = Column(String)
+    risk_probability = Column(Float)
+    decision = Column(String, index=True)
+    reason = Column(String)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
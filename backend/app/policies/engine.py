@@ -0,0 +1,464 @@
+import hashlib
+import json
+import operator
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.services.metrics import metrics
+
+POLICY_DIR = os.path.dirname(__file__)
+
+POLICY_RELOADS = metrics.counter(
+    "policy_reloads_total", "Eligibility policy reloads by outcome (loaded, invalid)", ("outcome",)
+)
+
+# Inputs a rule can test. Derived features use the same arithmetic the
+# eligibility rules always have, so rule boundaries stay exact.
+FEATURES = (
+    "monthly_income", "existing_emi", "loan_amount", "tenure_months",
+    "new_emi", "total_emi", "dti_ratio", "risk_probability"
+)
+
+# Array and scalar form of each comparison
+OPERATORS = {
+    "<": (np.less, operator.lt),
+    "<=": (np.less_equal, operator.le),
+    ">": (np.greater, operator.gt),
+    ">=": (np.greater_equal, operator.ge),
+    "==": (np.equal, operator.eq),
+    "!=": (np.not_equal, operator.ne)
+}
+
+# Levers the target solver moves, one at a time
+LEVERS = ("loan_amount", "tenure_months", "existing_emi")
+
+
+class PolicyError(ValueError):
+    pass
+
+
+def policy_features(monthly_income, existing_emi, loan_amount, tenure_months, risk_probability=None):
+    """
+    Rule inputs for scalars or aligned arrays.
+    """
+    new_emi = loan_amount / tenure_months
+    total_emi = existing_emi + new_emi
+    features = {
+        "monthly_income": monthly_income,
+        "existing_emi": existing_emi,
+        "loan_amount": loan_amount,
+        "tenure_months": tenure_months,
+        "new_emi": new_emi,
+        "total_emi": total_emi,
+        "dti_ratio": total_emi / monthly_income
+    }
+    if risk_probability is not None:
+        features["risk_probability"] = risk_probability
+    return features
+
+
+def boundary_candidates(points, low, high):
+    """
+    Sorted integers in [low, high] around each breakpoint: both sides
+    of a strict or non-strict comparison, plus one unit of rounding
+    slack. Always includes `low`. Between consecutive candidates no
+    rule from the breakpoints changes.
+    """
+    flat = [np.ravel(p) for p in points]
+    points = np.concatenate(flat) if flat else np.empty(0)
+    points = np.clip(points[np.isfinite(points)], low - 2, high + 2)
+    base = np.floor(points).astype(np.int64)
+    candidates = np.unique(np.concatenate(
+        [base + offset for offset in (-1, 0, 1, 2)] + [np.array([low], dtype=np.int64)]
+    ))
+    return candidates[(candidates >= low) & (candidates <= high)]
+
+
+class Condition:
+    """
+    feature <op> value, or feature <op> value * monthly_income when
+    "times" is given (e.g. loan amount above 10x income).
+    """
+
+    def __init__(self, spec, rule_id):
+        if not isinstance(spec, dict):
+            raise PolicyError(f"Rule {rule_id}: a condition must be an object")
+        self.feature = spec.get("feature")
+        self.op = spec.get("op")
+        self.value = spec.get("value")
+        self.times = spec.get("times")
+
+        if self.feature not in FEATURES:
+            raise PolicyError(f"Rule {rule_id}: unknown feature {self.feature!r}")
+        if self.op not in OPERATORS:
+            raise PolicyError(f"Rule {rule_id}: unknown operator {self.op!r}")
+        if isinstance(self.value, bool) or not isinstance(self.value, (int, float)):
+            raise PolicyError(f"Rule {rule_id}: value must be a number")
+        # Income is fixed for an applicant, which keeps every boundary solvable
+        if self.times not in (None, "monthly_income"):
+            raise PolicyError(f"Rule {rule_id}: only monthly_income multiples are supported")
+        self._compare, self._compare_row = OPERATORS[self.op]
+
+    def rhs(self, features):
+        if self.times is None:
+            return self.value
+        return self.value * features[self.times]
+
+    def __call__(self, features):
+        return self._compare(features[self.feature], self.rhs(features))
+
+    def holds(self, features):
+        return self._compare_row(features[self.feature], self.rhs(features))
+
+    def describe(self):
+        spec = {"feature": self.feature, "op": self.op, "value": self.value}
+        if self.times is not None:
+            spec["times"] = self.times
+        return spec
+
+
+class Rule:
+    """
+    A named conjunction of conditions. Scoring rules carry a penalty
+    and optionally a reason; improvement rules only an id.
+    """
+
+    def __init__(self, spec, scoring=True):
+        if not isinstance(spec, dict) or not spec.get("id"):
+            raise PolicyError("Every rule needs an id")
+        self.id = str(spec["id"])
+        when = spec.get("when")
+        when = when if isinstance(when, list) else [when]
+        if not when or when == [None]:
+            raise PolicyError(f"Rule {self.id}: missing conditions")
+        self.conditions = [Condition(c, self.id) for c in when]
+
+        self.reason = spec.get("reason")
+        self.penalty = spec.get("penalty", 0)
+        if scoring and (isinstance(self.penalty, bool) or not isinstance(self.penalty, (int, float))):
+            raise PolicyError(f"Rule {self.id}: penalty must be a number")
+
+    def mask(self, features):
+        result = self.conditions[0](features)
+        for condition in self.conditions[1:]:
+            result = result & condition(features)
+        return result
+
+    def holds(self, features):
+        return all(condition.holds(features) for condition in self.conditions)
+
+    def describe(self):
+        return {
+            "id": self.id,
+            "reason": self.reason,
+            "penalty": self.penalty,
+            "when": [c.describe() for c in self.conditions]
+        }
+
+
+class CompiledPolicy:
+    """
+    One version of the eligibility policy, compiled for NumPy.
+
+    The config lists scoring rules (conditions, penalty, reason),
+    decision cut-offs on the resulting score, and the improvement
+    factor rules used by CreditImprovementAgent. Conditions are parsed
+    and validated once; evaluate() then runs every rule as an array
+    expression over a batch, and evaluate_row() runs the same rules on
+    plain scalars, where NumPy's per-call overhead would dominate.
+    """
+
+    def __init__(self, spec, path=None, digest=None):
+        if not isinstance(spec, dict):
+            raise PolicyError("Policy must be a JSON object")
+        if not spec.get("version"):
+            raise PolicyError("Policy needs a version")
+        self.version = str(spec["version"])
+        self.description = spec.get("description")
+        self.path = path
+        self.digest = digest
+        self.loaded_at = datetime.now(timezone.utc)
+
+        self.base_score = spec.get("base_score", 100)
+        self.rules = [Rule(r) for r in spec.get("rules", [])]
+        ids = [r.id for r in self.rules]
+        if len(set(ids)) != len(ids):
+            raise PolicyError("Rule ids must be unique")
+        self.rule_ids = ids
+
+        decisions = spec.get("decisions", [])
+        try:
+            self.decisions = sorted(
+                ((str(d["decision"]), d["min_score"]) for d in decisions),
+                key=lambda d: d[1], reverse=True
+            )
+        except (KeyError, TypeError):
+            raise PolicyError("Each decision needs a decision and a min_score")
+        self.default_decision = str(spec.get("default_decision", "rejected"))
+
+        improvement = spec.get("improvement_factors", {})
+        self.factor_rules = [Rule(r, scoring=False) for r in improvement.get("rules", [])]
+        self.default_factor = improvement.get("default", "GENERAL_IMPROVEMENT")
+
+        self._penalties = np.array([r.penalty for r in self.rules])
+        # Later rules overwrite the reason, so check them first
+        self._reason_rules = [(i, r.reason) for i, r in enumerate(self.rules) if r.reason][::-1]
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            spec = json.loads(raw)
+        except (OSError, ValueError) as e:
+            raise PolicyError(f"Cannot read policy {path}: {e}")
+        return cls(spec, path=path, digest=hashlib.sha256(raw).hexdigest())
+
+    # -------------------------------------------------
+    # EVALUATION
+    # -------------------------------------------------
+    def evaluate(self, features):
+        """
+        Scores aligned feature arrays (see policy_features). Returns a
+        dict of arrays: eligibility_score, decision, reason, and
+        rule_mask shaped (rules, rows) with every triggered rule.
+        """
+        n = np.broadcast(*features.values()).shape
+        n = n[0] if n else 1
+        if self.rules:
+            rule_mask = np.stack([
+                np.broadcast_to(rule.mask(features), (n,)) for rule in self.rules
+            ])
+        else:
+            rule_mask = np.zeros((0, n), dtype=bool)
+
+        score = self.base_score - self._penalties @ rule_mask if self.rules \
+            else np.full(n, self.base_score)
+
+        decision = np.select(
+            [score >= min_score for _, min_score in self.decisions],
+            [name for name, _ in self.decisions],
+            default=self.default_decision
+        )
+
+        if self._reason_rules:
+            reason = np.select(
+                [rule_mask[i] for i, _ in self._reason_rules],
+                [text for _, text in self._reason_rules],
+                default=None
+            )
+        else:
+            reason = np.full(n, None, dtype=object)
+
+        return {
+            "eligibility_score": score,
+            "decision": decision,
+            "reason": reason,
+            "rule_mask": rule_mask
+        }
+
+    def evaluate_row(self, features):
+        """
+        evaluate() for one application given scalar features. Returns
+        eligibility_score, decision, reason and triggered_rules (ids).
+        """
+        triggered = [rule for rule in self.rules if rule.holds(features)]
+        score = self.base_score - sum(rule.penalty for rule in triggered)
+        decision = next(
+            (name for name, min_score in self.decisions if score >= min_score),
+            self.default_decision
+        )
+        reason = None
+        for rule in triggered:
+            reason = rule.reason or reason
+        return {
+            "eligibility_score": score,
+            "decision": decision,
+            "reason": reason,
+            "triggered_rules": [rule.id for rule in triggered]
+        }
+
+    def triggered_rules(self, rule_mask):
+        """
+        Triggered rule ids per row of an evaluate() rule_mask.
+        """
+        return [
+            [self.rule_ids[i] for i in np.flatnonzero(column)]
+            for column in rule_mask.T
+        ]
+
+    def risk_band(self, risk_probability):
+        """
+        Which scoring conditions on risk_probability hold for `p`. Two
+        probabilities in the same band get the same risk penalties.
+        """
+        features = {"risk_probability": risk_probability}
+        return tuple(
+            c.holds(features) for c in self.conditions("risk_probability") if c.times is None
+        )
+
+    def improvement_factors(self, features):
+        """
+        Improvement factor ids for one application (scalar features).
+        """
+        factors = [rule.id for rule in self.factor_rules if rule.holds(features)]
+        return factors or [self.default_factor]
+
+    # -------------------------------------------------
+    # BOUNDARIES (for the what-if search and the target solver)
+    # -------------------------------------------------
+    def conditions(self, feature):
+        return [c for rule in self.rules for c in rule.conditions if c.feature == feature]
+
+    def breakpoints(self, lever, features):
+        """
+        Values of `lever` at which some scoring condition flips, all
+        other inputs fixed, as float arrays broadcast against
+        `features` (NaN where it never flips). Conditions on
+        risk_probability are left out: risk is a model output, not a
+        closed-form function of the inputs.
+        """
+        if lever not in LEVERS:
+            raise ValueError(f"Unknown lever {lever!r}")
+
+        # The lever itself may be missing from `features`
+        income = features["monthly_income"]
+        emi = features.get("existing_emi")
+        amount = features.get("loan_amount")
+        tenure = features.get("tenure_months")
+
+        # Inverse of each derived feature in the lever, given its value v
+        inverses = {
+            "loan_amount": {
+                "loan_amount": lambda v: v,
+                "new_emi": lambda v: v * tenure,
+                "total_emi": lambda v: (v - emi) * tenure,
+                "dti_ratio": lambda v: (v * income - emi) * tenure
+            },
+            "tenure_months": {
+                "tenure_months": lambda v: v,
+                "new_emi": lambda v: amount / v,
+                "total_emi": lambda v: amount / (v - emi),
+                "dti_ratio": lambda v: amount / (v * income - emi)
+            },
+            "existing_emi": {
+                "existing_emi": lambda v: v,
+                "total_emi": lambda v: v - amount / tenure,
+                "dti_ratio": lambda v: v * income - amount / tenure
+            }
+        }[lever]
+
+        points = []
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for feature, inverse in inverses.items():
+                for condition in self.conditions(feature):
+                    point = np.asarray(inverse(condition.rhs(features)), dtype=np.float64)
+                    points.append(np.where(np.isfinite(point), point, np.nan))
+        return points
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "description": self.description,
+            "path": os.path.relpath(self.path, POLICY_DIR) if self.path else None,
+            "sha256": self.digest,
+            "loaded_at": self.loaded_at.isoformat(),
+            "base_score": self.base_score,
+            "decisions": [{"decision": d, "min_score": s} for d, s in self.decisions],
+            "default_decision": self.default_decision,
+            "rules": [r.describe() for r in self.rules],
+            "improvement_factors": {
+                "rules": [{"id": r.id, "when": [c.describe() for c in r.conditions]}
+                          for r in self.factor_rules],
+                "default": self.default_factor
+            }
+        }
+
+
+class PolicyStore:
+    """
+    The active CompiledPolicy, hot-reloaded from its file.
+
+    current() re-checks the file's mtime at most every `check_interval`
+    seconds and swaps in the recompiled policy when it changed, so every
+    worker process picks up an edit without a restart. An invalid file
+    is reported and the previous policy keeps serving. Callers take one
+    reference per evaluation, so a swap never mixes two versions.
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.policy = CompiledPolicy.from_file(path)
+        self.reloads = 0
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._checked = time.monotonic()
+
+    def current(self):
+        if self.check_interval >= 0 and time.monotonic() - self._checked >= self.check_interval:
+            self._check()
+        return self.policy
+
+    def _check(self):
+        with self._lock:
+            if time.monotonic() - self._checked < self.check_interval:
+                return
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                self.last_error = str(e)
+                return
+            if mtime == self._mtime:
+                return
+            # Remember the broken file too, so it is not re-parsed on every check
+            self._mtime = mtime
+            try:
+                self._load()
+            except PolicyError as e:
+                print(f"Policy Error: {e}")
+
+    def reload(self):
+        """
+        Reloads now. Raises PolicyError (and keeps the current policy)
+        when the file is invalid.
+        """
+        with self._lock:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            self._checked = time.monotonic()
+            return self._load()
+
+    def _load(self):
+        try:
+            policy = CompiledPolicy.from_file(self.path)
+        except PolicyError as e:
+            POLICY_RELOADS.inc(outcome="invalid")
+            self.last_error = str(e)
+            raise
+
+        previous = self.policy
+        if policy.digest == previous.digest:
+            return previous
+        if policy.version == previous.version:
+            print(f"Policy Warning: {self.path} changed without a version bump ({policy.version})")
+        # Single reference assignment: the swap is atomic
+        self.policy = policy
+        self.reloads += 1
+        self.last_error = None
+        POLICY_RELOADS.inc(outcome="loaded")
+        return policy
+
+    def describe(self):
+        return {
+            **self.policy.describe(),
+            "reload_interval_seconds": self.check_interval,
+            "reloads": self.reloads,
+            "last_error": self.last_error
+        }
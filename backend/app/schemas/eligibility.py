@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class EligibilityResult(BaseModel):
     decision: str  # approved / rejected / conditional
@@ -7,3 +7,7 @@ class EligibilityResult(BaseModel):
     eligibility_score: float
     risk_probability: float
     reason: Optional[str] = None
+    model_version: Optional[str] = None
+    # Every policy rule that fired; `reason` is the last one with a reason
+    triggered_rules: List[str] = []
+    policy_version: Optional[str] = None
@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class EligibilityGridRequest(BaseModel):
+    monthly_income: int = Field(..., gt=0)
+    existing_emi: int = Field(0, ge=0)
+
+    # Loan amount axis: explicit values, or amount_min..amount_max by amount_step
+    loan_amounts: Optional[List[int]] = None
+    amount_min: int = Field(50000, gt=0)
+    amount_max: int = Field(2000000, gt=0)
+    amount_step: int = Field(50000, gt=0)
+
+    tenures: List[int] = Field(default_factory=lambda: [12, 24, 36, 48, 60, 84, 120])
+
+    # Resolution (rupees) of the max approvable amount search
+    search_step: int = Field(1000, gt=0)
@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class ModelLoadRequest(BaseModel):
+    version: str
+    filename: str  # relative to app/ml, e.g. "risk_model_v2.pkl"
+
+class ShadowConfig(BaseModel):
+    version: Optional[str] = None  # None disables shadow scoring
+    fraction: float = Field(0.1, ge=0.0, le=1.0)
@@ -0,0 +1,109 @@
+"""
+Pre-forking API server.
+
+Usage (from backend/):
+    python -m app.serve [--host H] [--port P] [--workers N] [--preload]
+
+With --preload the risk model and compiled scorer are loaded once in
+the parent before forking, so all workers share them copy-on-write
+instead of each unpickling its own copy; every worker also warms its
+LLM client during startup rather than on its first request.
+Without --preload everything is loaded lazily on first use.
+
+The database schema is upgraded once here, before forking; workers
+skip the upgrade in their lifespan instead of racing each other.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+
+def _bind(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, host, port, sock):
+    import uvicorn
+    from app.db import engine
+
+    # Never reuse pooled DB connections opened by the parent
+    engine.dispose(close=False)
+
+    config = uvicorn.Config(app, host=host, port=port, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the loan advisor API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--preload", action="store_true",
+                        help="load the model before forking and warm LLM clients at startup")
+    args = parser.parse_args()
+
+    if args.preload:
+        os.environ["PRELOAD_RESOURCES"] = "1"
+
+    from app.main import app
+    from app.db import engine, upgrade_schema
+    from app.services.registry import registry
+
+    start = time.perf_counter()
+    upgrade_schema(engine)
+    registry.record_timing("schema_upgrade", time.perf_counter() - start)
+    # Workers inherit this and skip their own upgrade
+    os.environ["SCHEMA_UPGRADED"] = "1"
+    engine.dispose()
+
+    if args.preload:
+        start = time.perf_counter()
+        registry.preload(fork_safe_only=True)
+        print(f"Preloaded in {time.perf_counter() - start:.2f}s: {registry.report()}")
+
+    sock = _bind(args.host, args.port)
+
+    if args.workers <= 1:
+        _run_worker(app, args.host, args.port, sock)
+        return
+
+    # Keep preloaded objects out of the GC's reach so collections in
+    # the workers do not touch (and copy) their pages
+    gc.freeze()
+
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            _run_worker(app, args.host, args.port, sock)
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for pid in children:
+        os.waitpid(pid, 0)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
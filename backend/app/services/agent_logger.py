@@ -1,6 +1,243 @@
+import os
+import queue
+import threading
+import time
 import uuid
+from datetime import datetime, timezone
+
 from app.db import SessionLocal
 from app.models.agent_event import AgentEvent
+from app.models.loan_application import LoanApplication
+from app.models.session import Session
+from app.services.metrics import metrics, DB_WRITE_SECONDS, DB_ROWS_WRITTEN
+
+
+# Insert order within a batch: parents before the rows that reference them
+WRITE_ORDER = (Session, LoanApplication, AgentEvent)
+
+
+def _write_rank(model):
+    return WRITE_ORDER.index(model) if model in WRITE_ORDER else len(WRITE_ORDER)
+
+
+class AuditWriter:
+    """
+    Background writer for agent audit events and application records.
+
+    Events go into a bounded queue and a daemon thread flushes them as
+    one bulk insert when `batch_size` events are waiting or
+    `flush_interval` seconds have passed, whichever comes first.
+
+    When the queue is full, producers wait up to `enqueue_timeout`
+    seconds (backpressure) and then write the event synchronously, so
+    audit events are never dropped. If a bulk insert fails, its rows
+    are retried one by one and only rows that fail on their own are lost.
+
+    In durable mode every event is committed synchronously before
+    log_agent_event returns, as before.
+    """
+
+    def __init__(self, durable=False, max_queue=10000, batch_size=200,
+                 flush_interval=0.5, enqueue_timeout=1.0):
+        self.durable = durable
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        # Backpressure / throughput metrics
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.blocked = 0
+        self.sync_fallbacks = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.last_flush_seconds = 0.0
+
+    # -------------------------------------------------
+    # LIFECYCLE
+    # -------------------------------------------------
+    def start(self):
+        with self._lock:
+            if self.durable or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="audit-writer", daemon=True
+            )
+            self._thread.start()
+
+    def shutdown(self, timeout=10.0):
+        """
+        Stops the worker after flushing everything still queued.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    # -------------------------------------------------
+    # PRODUCER SIDE
+    # -------------------------------------------------
+    def submit(self, model, row: dict):
+        item = (model, row)
+        if self.durable:
+            self._write([item], path="durable")
+            return
+
+        self.start()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.blocked += 1
+            try:
+                self._queue.put(item, timeout=self.enqueue_timeout)
+            except queue.Full:
+                self.sync_fallbacks += 1
+                self._write([item], path="sync_fallback")
+                return
+
+        self.enqueued += 1
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def has_room(self, rows):
+        """
+        True when `rows` more events would be queued without waiting,
+        i.e. submit() cannot block or fall back to a synchronous write.
+        Async callers check this before submitting on the event loop.
+        """
+        if self.durable:
+            return False
+        return self._queue.maxsize - self._queue.qsize() >= rows
+
+    def flush(self):
+        """
+        Synchronously writes everything currently queued.
+        """
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    # -------------------------------------------------
+    # WORKER SIDE
+    # -------------------------------------------------
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+        self.flush()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, items, path="batch"):
+        start = time.perf_counter()
+
+        # One bulk insert per model, parents before children so foreign
+        # keys hold on databases that check them per statement
+        rows_by_model = {}
+        for model, row in items:
+            rows_by_model.setdefault(model, []).append(row)
+        ordered = sorted(rows_by_model.items(), key=lambda entry: _write_rank(entry[0]))
+
+        db = SessionLocal()
+        try:
+            for model, rows in ordered:
+                db.bulk_insert_mappings(model, rows)
+            db.commit()
+            self.written += len(items)
+            self.batches += 1
+            DB_ROWS_WRITTEN.inc(len(items), outcome="written")
+        except Exception as e:
+            db.rollback()
+            print(f"AuditWriter Error: {e}, retrying rows one by one")
+            self._write_rows(db, ordered)
+        finally:
+            db.close()
+            self.last_flush_seconds = time.perf_counter() - start
+            DB_WRITE_SECONDS.observe(self.last_flush_seconds, path=path)
+
+    def _write_rows(self, db, ordered):
+        """
+        Fallback for a failed batch: one transaction per row, so a
+        single bad row does not take the rest of the batch with it.
+        """
+        written = failed = 0
+        for model, rows in ordered:
+            for row in rows:
+                try:
+                    db.bulk_insert_mappings(model, [row])
+                    db.commit()
+                    written += 1
+                except Exception as e:
+                    db.rollback()
+                    failed += 1
+                    print(f"AuditWriter Error: {model.__tablename__} row dropped: {e}")
+        self.written += written
+        self.failed += failed
+        self.batches += 1
+        DB_ROWS_WRITTEN.inc(written, outcome="written")
+        if failed:
+            DB_ROWS_WRITTEN.inc(failed, outcome="failed")
+
+    def stats(self):
+        return {
+            "mode": "durable" if self.durable else "async",
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "blocked": self.blocked,
+            "sync_fallbacks": self.sync_fallbacks,
+            "failed": self.failed,
+            "last_flush_seconds": round(self.last_flush_seconds, 6)
+        }
+
+
+audit_writer = AuditWriter(
+    durable=os.getenv("AUDIT_MODE", "async").lower() == "durable",
+    max_queue=int(os.getenv("AUDIT_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.5"))
+)
+
+metrics.gauge("audit_queue_depth", "Audit events waiting to be written",
+              lambda: audit_writer._queue.qsize())
 
 
 def log_agent_event(
@@ -8,22 +245,50 @@ def log_agent_event(
     agent_name: str,
     event_type: str,
     input_snapshot: dict,
-    output_snapshot: dict
+    output_snapshot: dict,
+    timestamp: datetime = None
 ):
     """
     Persists agent-level events for auditability and analytics.
     """
-    db = SessionLocal()
-    try:
-        event = AgentEvent(
-            event_id=str(uuid.uuid4()),
-            session_id=session_id,
-            agent_name=agent_name,
-            event_type=event_type,
-            input_snapshot=input_snapshot,
-            output_snapshot=output_snapshot
-        )
-        db.add(event)
-        db.commit()
-    finally:
-        db.close()
+    audit_writer.submit(AgentEvent, {
+        "event_id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "agent_name": agent_name,
+        "event_type": event_type,
+        "input_snapshot": input_snapshot,
+        "output_snapshot": output_snapshot,
+        # Stamped at submit time so batching does not reorder the trail
+        "timestamp": timestamp or datetime.now(timezone.utc)
+    })
+
+
+def record_loan_application(session_id: str, loan_input, eligibility_result,
+                            created_at: datetime = None, with_session: bool = True):
+    """
+    Persists the session and its structured eligibility outcome
+    into the typed sessions / loan_applications tables.
+    Job mode commits its own session row (with_session=False).
+    """
+    now = created_at or datetime.now(timezone.utc)
+
+    if with_session:
+        audit_writer.submit(Session, {
+            "session_id": session_id,
+            "status": "completed",
+            "created_at": now
+        })
+    audit_writer.submit(LoanApplication, {
+        "application_id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "monthly_income": loan_input.monthly_income,
+        "existing_emi": loan_input.existing_emi,
+        "loan_amount": loan_input.loan_amount,
+        "tenure_months": loan_input.tenure_months,
+        "dti_ratio": eligibility_result.dti_ratio,
+        "eligibility_score": eligibility_result.eligibility_score,
+        "risk_probability": eligibility_result.risk_probability,
+        "decision": eligibility_result.decision,
+        "reason": eligibility_result.reason,
+        "created_at": now
+    })
@@ -0,0 +1,318 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app.db import SessionLocal
+from app.models.agent_event import AgentEvent
+from app.models.analytics_checkpoint import AnalyticsCheckpoint
+
+DECISIONS = ("approved", "rejected", "conditional")
+
+# name -> (bucket width in seconds, buckets retained)
+VOLUME_WINDOWS = {
+    "minute": (60, 120),
+    "hour": (3600, 72),
+    "day": (86400, 90)
+}
+
+RISK_BINS = 10      # over [0, 1]
+SCORE_BINS = 10     # over [0, 100]
+
+CHECKPOINT_NAME = "dashboard"
+
+
+def _epoch(ts):
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def _bin(value, upper, bins):
+    index = int(value / upper * bins)
+    return min(max(index, 0), bins - 1)
+
+
+class DashboardAggregator:
+    """
+    Incrementally maintained dashboard analytics.
+
+    Every EligibilityResult updates decision counts, time-bucketed
+    volume and fixed-bin histograms in O(1), so the stats endpoint
+    reads memory between refreshes. State is rebuilt on startup from
+    the last checkpoint plus any newer "eligibility_decision" events.
+
+    The checkpoint is folded from the events in the database, not from
+    in-memory state, so several worker processes can advance the one
+    shared row without overwriting each other. Its watermark only moves
+    up to `settle_seconds` ago, by which time the audit writer has
+    flushed every event stamped before it.
+
+    Each worker only records its own traffic, so snapshot() reloads
+    the shared checkpoint and newer events when its state is older than
+    `refresh_interval` seconds; every worker then serves the same
+    totals, up to audit writer lag.
+    """
+
+    def __init__(self, checkpoint_interval=60.0, settle_seconds=30.0, refresh_interval=5.0):
+        self.checkpoint_interval = checkpoint_interval
+        self.settle_seconds = settle_seconds
+        self.refresh_interval = refresh_interval
+        self._refreshed = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self.counts = {d: 0 for d in DECISIONS}
+        self.volume = {name: OrderedDict() for name in VOLUME_WINDOWS}
+        self.risk_histogram = [0] * RISK_BINS
+        self.score_histogram = [0] * SCORE_BINS
+
+    # -------------------------------------------------
+    # UPDATES
+    # -------------------------------------------------
+    def record(self, eligibility_result, timestamp=None):
+        self._record(
+            eligibility_result.decision,
+            eligibility_result.risk_probability,
+            eligibility_result.eligibility_score,
+            timestamp or datetime.now(timezone.utc)
+        )
+
+    def _record(self, decision, risk_probability, eligibility_score, timestamp):
+        epoch = _epoch(timestamp)
+        with self._lock:
+            self.counts[decision] = self.counts.get(decision, 0) + 1
+
+            for name, (width, retained) in VOLUME_WINDOWS.items():
+                buckets = self.volume[name]
+                start = int(epoch // width * width)
+                buckets[start] = buckets.get(start, 0) + 1
+                if len(buckets) > retained:
+                    # Keep the newest buckets
+                    for old in sorted(buckets)[:len(buckets) - retained]:
+                        del buckets[old]
+
+            if risk_probability is not None:
+                self.risk_histogram[_bin(risk_probability, 1.0, RISK_BINS)] += 1
+            if eligibility_score is not None:
+                self.score_histogram[_bin(eligibility_score, 100.0, SCORE_BINS)] += 1
+
+    # -------------------------------------------------
+    # READS
+    # -------------------------------------------------
+    def snapshot(self):
+        if self._refreshed is not None and time.monotonic() - self._refreshed >= self.refresh_interval:
+            # One reader refreshes; the others serve the current state
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    self.rebuild()
+                except Exception as e:
+                    # Serve the local state rather than fail the dashboard
+                    print(f"DashboardAggregator Error: {e}")
+                finally:
+                    self._refresh_lock.release()
+        with self._lock:
+            return {
+                "summary": {
+                    "total": sum(self.counts.values()),
+                    **{d: self.counts.get(d, 0) for d in DECISIONS}
+                },
+                "volume": {
+                    name: [
+                        {
+                            "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                            "count": count
+                        }
+                        for start, count in sorted(buckets.items())
+                    ]
+                    for name, buckets in self.volume.items()
+                },
+                "histograms": {
+                    "risk_probability": {
+                        "edges": [round(i / RISK_BINS, 2) for i in range(RISK_BINS + 1)],
+                        "counts": list(self.risk_histogram)
+                    },
+                    "eligibility_score": {
+                        "edges": [round(i * 100 / SCORE_BINS, 2) for i in range(SCORE_BINS + 1)],
+                        "counts": list(self.score_histogram)
+                    }
+                }
+            }
+
+    # -------------------------------------------------
+    # PERSISTENCE
+    # -------------------------------------------------
+    def _state(self):
+        return {
+            "counts": dict(self.counts),
+            "volume": {name: [[s, c] for s, c in b.items()] for name, b in self.volume.items()},
+            "risk_histogram": list(self.risk_histogram),
+            "score_histogram": list(self.score_histogram)
+        }
+
+    def _restore(self, payload):
+        self.counts.update(payload.get("counts", {}))
+        for name, pairs in payload.get("volume", {}).items():
+            if name in self.volume:
+                self.volume[name] = OrderedDict((int(s), c) for s, c in pairs)
+        if len(payload.get("risk_histogram", [])) == RISK_BINS:
+            self.risk_histogram = list(payload["risk_histogram"])
+        if len(payload.get("score_histogram", [])) == SCORE_BINS:
+            self.score_histogram = list(payload["score_histogram"])
+
+    def checkpoint(self, now=None, batch_size=1000):
+        """
+        Folds eligibility events stamped after the saved watermark and
+        at least `settle_seconds` old into the shared checkpoint.
+        Returns the number of events folded, or None when another worker
+        advanced the checkpoint first.
+        """
+        now = now or datetime.now(timezone.utc)
+        # Stored timestamps are naive UTC
+        cutoff = (now - timedelta(seconds=self.settle_seconds)).astimezone(timezone.utc).replace(tzinfo=None)
+
+        db = SessionLocal()
+        try:
+            saved = db.get(AnalyticsCheckpoint, CHECKPOINT_NAME)
+            previous = saved.watermark if saved is not None else None
+            if previous is not None and previous.replace(tzinfo=None) >= cutoff:
+                return 0
+
+            folded = DashboardAggregator()
+            if saved is not None and saved.payload:
+                folded._restore(saved.payload)
+
+            query = db.query(
+                AgentEvent.output_snapshot, AgentEvent.timestamp
+            ).filter(
+                AgentEvent.event_type == "eligibility_decision",
+                AgentEvent.timestamp <= cutoff
+            )
+            if previous is not None:
+                query = query.filter(AgentEvent.timestamp > previous.replace(tzinfo=None))
+
+            count = 0
+            for output, timestamp in query.yield_per(batch_size):
+                output = output or {}
+                folded._record(
+                    output.get("decision"),
+                    output.get("risk_probability"),
+                    output.get("eligibility_score"),
+                    timestamp
+                )
+                count += 1
+
+            watermark = cutoff.replace(tzinfo=timezone.utc)
+            if saved is None:
+                db.add(AnalyticsCheckpoint(
+                    name=CHECKPOINT_NAME, payload=folded._state(), watermark=watermark
+                ))
+            else:
+                # Compare-and-set on the watermark: if another worker
+                # folded first, its row stands and this fold is discarded
+                result = db.execute(
+                    update(AnalyticsCheckpoint)
+                    .where(AnalyticsCheckpoint.name == CHECKPOINT_NAME)
+                    .where(AnalyticsCheckpoint.watermark == previous
+                           if previous is not None else AnalyticsCheckpoint.watermark.is_(None))
+                    .values(payload=folded._state(), watermark=watermark)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    db.rollback()
+                    return None
+            db.commit()
+            return count
+        except IntegrityError:
+            # Another worker created the row first
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def rebuild(self, batch_size=1000):
+        """
+        Loads the last checkpoint, then replays newer eligibility events.
+        The state is built aside and swapped in, so concurrent reads
+        never see a partial replay. Returns the number of events replayed.
+        """
+        fresh = DashboardAggregator()
+        replayed = fresh._load(batch_size)
+        with self._lock:
+            self.counts = fresh.counts
+            self.volume = fresh.volume
+            self.risk_histogram = fresh.risk_histogram
+            self.score_histogram = fresh.score_histogram
+            self._refreshed = time.monotonic()
+        return replayed
+
+    def _load(self, batch_size):
+        db = SessionLocal()
+        try:
+            saved = db.get(AnalyticsCheckpoint, CHECKPOINT_NAME)
+            if saved is not None and saved.payload:
+                self._restore(saved.payload)
+
+            query = db.query(
+                AgentEvent.output_snapshot, AgentEvent.timestamp
+            ).filter(AgentEvent.event_type == "eligibility_decision")
+            if saved is not None and saved.watermark is not None:
+                # Stored timestamps are naive UTC
+                query = query.filter(
+                    AgentEvent.timestamp > saved.watermark.replace(tzinfo=None)
+                )
+
+            replayed = 0
+            for output, timestamp in query.order_by(AgentEvent.timestamp).yield_per(batch_size):
+                output = output or {}
+                self._record(
+                    output.get("decision"),
+                    output.get("risk_probability"),
+                    output.get("eligibility_score"),
+                    timestamp
+                )
+                replayed += 1
+            return replayed
+        finally:
+            db.close()
+
+    # -------------------------------------------------
+    # LIFECYCLE
+    # -------------------------------------------------
+    def start(self):
+        self.rebuild()
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="analytics-checkpoint", daemon=True
+        )
+        self._thread.start()
+
+    def shutdown(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        self.checkpoint()
+
+    def _run(self):
+        while not self._stopping.wait(self.checkpoint_interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print(f"DashboardAggregator Error: {e}")
+
+
+dashboard_aggregator = DashboardAggregator(
+    checkpoint_interval=float(os.getenv("ANALYTICS_CHECKPOINT_INTERVAL", "60")),
+    settle_seconds=float(os.getenv("ANALYTICS_SETTLE_SECONDS", "30")),
+    refresh_interval=float(os.getenv("ANALYTICS_REFRESH_INTERVAL", "5"))
+)
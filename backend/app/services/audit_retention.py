@@ -0,0 +1,373 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.db import SessionLocal, engine
+from app.models.agent_event import AgentEvent
+from app.models.analytics_checkpoint import AnalyticsCheckpoint
+from app.models.archived_session import ArchivedSession
+from app.services.analytics import CHECKPOINT_NAME
+from app.services.event_query import serialize_event
+from app.services.metrics import metrics
+
+ARCHIVED_EVENTS = metrics.counter(
+    "audit_archived_events_total", "Agent events moved from the hot table to the archive"
+)
+RECLAIMED_BYTES = metrics.counter(
+    "audit_reclaimed_bytes_total", "Database bytes freed by audit compaction"
+)
+
+# Snapshots smaller than this (serialized) are kept inline
+MIN_DEDUP_BYTES = 32
+
+
+def _naive_utc(ts):
+    # Timestamps are stored as naive UTC
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _digest(snapshot):
+    return hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def dedupe_snapshots(records):
+    """
+    Replaces snapshots repeated within a session (e.g. the loan input
+    stored by both the eligibility and the final event) with
+    {"$ref": "<event_id>.<field>"} pointing at the first copy.
+    Records must be in event order. Returns the number replaced.
+    """
+    seen = {}
+    replaced = 0
+    for record in records:
+        for field in ("input", "output"):
+            snapshot = record[field]
+            if snapshot is None or len(json.dumps(snapshot)) < MIN_DEDUP_BYTES:
+                continue
+            key = (record["session_id"], _digest(snapshot))
+            if key in seen:
+                record[field] = {"$ref": seen[key]}
+                replaced += 1
+            else:
+                seen[key] = f"{record['event_id']}.{field}"
+    return replaced
+
+
+def resolve_snapshots(records):
+    """
+    Inverse of dedupe_snapshots.
+    """
+    by_ref = {}
+    for record in records:
+        for field in ("input", "output"):
+            snapshot = record[field]
+            if isinstance(snapshot, dict) and set(snapshot) == {"$ref"}:
+                record[field] = by_ref.get(snapshot["$ref"])
+            by_ref[f"{record['event_id']}.{field}"] = record[field]
+    return records
+
+
+class AuditRetention:
+    """
+    Keeps the agent_events table small.
+
+    compact() moves every session whose events are all older than
+    `retention_days` into gzip-compressed JSONL archive files
+    partitioned by the date of the session's first event
+    (<archive_dir>/date=YYYY-MM-DD/events-*.jsonl.gz), written per
+    partition for each batch of `batch_size` sessions. Snapshots
+    repeated within a session are stored once. The archived_sessions
+    table maps each session to its file; its rows are inserted in the
+    same transaction that deletes the hot events, so a session is
+    always findable in exactly one place.
+
+    Events newer than the dashboard checkpoint are never archived, so
+    the aggregates can still be rebuilt. A background thread runs
+    compact() every `interval` seconds.
+    """
+
+    def __init__(self, archive_dir="audit_archive", retention_days=30, interval=3600.0,
+                 batch_size=500, vacuum=False):
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.vacuum = vacuum
+
+        self._run_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.last_report = None
+        self.totals = {"runs": 0, "sessions": 0, "events": 0, "bytes_reclaimed": 0}
+
+    # -------------------------------------------------
+    # COMPACTION
+    # -------------------------------------------------
+    def compact(self, now=None):
+        """
+        Archives everything past retention. Returns a report of what
+        moved and how many database bytes were freed.
+        """
+        with self._run_lock:
+            start = time.perf_counter()
+            now = now or datetime.now(timezone.utc)
+            cutoff = now - timedelta(days=self.retention_days)
+            report = {
+                "started_at": now.isoformat(),
+                "cutoff": None,
+                "sessions_archived": 0,
+                "events_archived": 0,
+                "snapshots_deduplicated": 0,
+                "archive_files": [],
+                "archive_bytes": 0,
+                "payload_bytes_removed": 0
+            }
+
+            watermark = self._analytics_watermark()
+            if watermark is None:
+                report["skipped"] = "no dashboard checkpoint yet"
+                return self._finish(report, start)
+            cutoff = min(_naive_utc(cutoff), _naive_utc(watermark))
+            report["cutoff"] = cutoff.isoformat()
+
+            used_before = self._used_bytes()
+            straddling = set()
+            while True:
+                moved = self._archive_batch(cutoff, straddling, report)
+                if not moved:
+                    break
+
+            if self.vacuum and report["events_archived"]:
+                self._vacuum()
+            used_after = self._used_bytes()
+            report["db_bytes_before"] = used_before
+            report["db_bytes_after"] = used_after
+            if used_before is not None and used_after is not None:
+                report["bytes_reclaimed"] = max(0, used_before - used_after)
+                RECLAIMED_BYTES.inc(report["bytes_reclaimed"])
+            return self._finish(report, start)
+
+    def _finish(self, report, start):
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        self.totals["runs"] += 1
+        self.totals["sessions"] += report["sessions_archived"]
+        self.totals["events"] += report["events_archived"]
+        self.totals["bytes_reclaimed"] += report.get("bytes_reclaimed", 0)
+        self.last_report = report
+        return report
+
+    def _archive_batch(self, cutoff, straddling, report):
+        """
+        Archives up to batch_size whole sessions. Returns the number of
+        sessions moved (0 when nothing is left).
+        """
+        db = SessionLocal()
+        paths = {}
+        try:
+            query = db.query(AgentEvent.session_id).filter(AgentEvent.timestamp < cutoff)
+            if straddling:
+                query = query.filter(AgentEvent.session_id.notin_(straddling))
+            rows = query.order_by(AgentEvent.timestamp).limit(self.batch_size * 4).all()
+            session_ids = list(dict.fromkeys(r[0] for r in rows))[:self.batch_size]
+            if not session_ids:
+                return 0
+
+            events = (
+                db.query(AgentEvent)
+                .filter(AgentEvent.session_id.in_(session_ids))
+                .order_by(AgentEvent.timestamp, AgentEvent.event_id)
+                .all()
+            )
+
+            sessions = {}
+            for event in events:
+                sessions.setdefault(event.session_id, []).append(event)
+            # A session with a newer event stays hot until all of it is old
+            for session_id, session_events in list(sessions.items()):
+                if session_events[-1].timestamp >= cutoff:
+                    straddling.add(session_id)
+                    del sessions[session_id]
+            if not sessions:
+                return len(session_ids)
+
+            records = [serialize_event(e) for e in events if e.session_id in sessions]
+            payload_bytes = sum(
+                len(json.dumps(r["input"])) + len(json.dumps(r["output"])) for r in records
+            )
+            deduplicated = dedupe_snapshots(records)
+
+            # One file per partition date touched by this batch
+            partition_of = {
+                session_id: session_events[0].timestamp.strftime("%Y-%m-%d")
+                for session_id, session_events in sessions.items()
+            }
+            by_partition = {}
+            for record in records:
+                by_partition.setdefault(partition_of[record["session_id"]], []).append(record)
+            for partition, partition_records in by_partition.items():
+                paths[partition] = self._write_file(partition, partition_records)
+
+            db.bulk_insert_mappings(ArchivedSession, [
+                {
+                    "session_id": session_id,
+                    "partition": partition_of[session_id],
+                    "path": paths[partition_of[session_id]],
+                    "event_count": len(session_events),
+                    "first_event_at": session_events[0].timestamp,
+                    "last_event_at": session_events[-1].timestamp
+                }
+                for session_id, session_events in sessions.items()
+            ])
+            db.query(AgentEvent).filter(
+                AgentEvent.session_id.in_(list(sessions))
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # Another process may have archived the same sessions first
+            for path in paths.values():
+                os.remove(os.path.join(self.archive_dir, path))
+            print(f"AuditRetention Error: {e}")
+            return 0
+        finally:
+            db.close()
+
+        ARCHIVED_EVENTS.inc(len(records))
+        report["sessions_archived"] += len(sessions)
+        report["events_archived"] += len(records)
+        report["snapshots_deduplicated"] += deduplicated
+        report["payload_bytes_removed"] += payload_bytes
+        for path in paths.values():
+            report["archive_files"].append(path)
+            report["archive_bytes"] += os.path.getsize(os.path.join(self.archive_dir, path))
+        return len(session_ids)
+
+    def _write_file(self, partition, records):
+        directory = os.path.join(self.archive_dir, f"date={partition}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"events-{datetime.now(timezone.utc):%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+        final = os.path.join(directory, name)
+        partial = final + ".partial"
+
+        with gzip.open(partial, "wt", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        # Appears complete or not at all
+        os.replace(partial, final)
+        return os.path.relpath(final, self.archive_dir)
+
+    # -------------------------------------------------
+    # LOOKUP
+    # -------------------------------------------------
+    def archived_session(self, session_id):
+        """
+        Archived events of a session (snapshots resolved), or None.
+        """
+        db = SessionLocal()
+        try:
+            entry = db.get(ArchivedSession, session_id)
+        finally:
+            db.close()
+        if entry is None:
+            return None
+
+        records = []
+        with gzip.open(os.path.join(self.archive_dir, entry.path), "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["session_id"] == session_id:
+                    records.append(record)
+        return {
+            "session_id": session_id,
+            "partition": entry.partition,
+            "path": entry.path,
+            "events": resolve_snapshots(records)
+        }
+
+    # -------------------------------------------------
+    # HELPERS
+    # -------------------------------------------------
+    @staticmethod
+    def _analytics_watermark():
+        db = SessionLocal()
+        try:
+            saved = db.get(AnalyticsCheckpoint, CHECKPOINT_NAME)
+            return saved.watermark if saved is not None else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _used_bytes():
+        """
+        Bytes in use by the SQLite database (pages minus free pages),
+        or None for other backends.
+        """
+        if engine.dialect.name != "sqlite":
+            return None
+        with engine.connect() as conn:
+            page_size = conn.execute(text("PRAGMA page_size")).scalar()
+            page_count = conn.execute(text("PRAGMA page_count")).scalar()
+            free = conn.execute(text("PRAGMA freelist_count")).scalar()
+        return (page_count - free) * page_size
+
+    @staticmethod
+    def _vacuum():
+        # Returns free pages to the filesystem; holds the write lock while it runs
+        if engine.dialect.name != "sqlite":
+            return
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+
+    def stats(self):
+        return {
+            "archive_dir": os.path.abspath(self.archive_dir),
+            "retention_days": self.retention_days,
+            "interval_seconds": self.interval,
+            "totals": dict(self.totals),
+            "last_report": self.last_report
+        }
+
+    # -------------------------------------------------
+    # LIFECYCLE
+    # -------------------------------------------------
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-retention", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                report = self.compact()
+                if report["events_archived"]:
+                    print(f"AuditRetention: archived {report['events_archived']} events, "
+                          f"reclaimed {report.get('bytes_reclaimed', 0)} bytes")
+            except Exception as e:
+                print(f"AuditRetention Error: {e}")
+
+
+audit_retention = AuditRetention(
+    archive_dir=os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive"),
+    retention_days=float(os.getenv("AUDIT_RETENTION_DAYS", "30")),
+    interval=float(os.getenv("AUDIT_COMPACTION_INTERVAL", "3600")),
+    batch_size=int(os.getenv("AUDIT_ARCHIVE_BATCH", "500")),
+    vacuum=os.getenv("AUDIT_VACUUM", "0") == "1"
+)
@@ -0,0 +1,472 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.services.metrics import metrics
+
+# Monitored model inputs and output, as the API sees them
+FEATURES = ("monthly_income", "loan_amount", "loan_percent_income", "risk_probability")
+
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), "..", "ml", "drift_reference.json")
+
+# Conventional PSI reading: below 0.1 stable, above 0.25 significant shift
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Floor for empty bins, so PSI stays finite
+PSI_EPSILON = 1e-4
+
+REPORTED_QUANTILES = (0.05, 0.5, 0.95)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative error (DDSketch-style).
+
+    Positive values are counted in logarithmic buckets
+    (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so any
+    quantile is returned within relative error `a`. Values at or below
+    `min_value` share one bucket. Past `max_buckets` the lowest buckets
+    are collapsed, which bounds memory. Two sketches with the same
+    accuracy merge by adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048, min_value=1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+        self.bins = {}
+        self.zero = 0
+        self.count = 0
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value):
+        if value <= self.min_value:
+            self.zero += 1
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + 1
+            if len(self.bins) > self.max_buckets:
+                self._collapse()
+        self.count += 1
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > self.min_value]
+        self.zero += len(values) - len(positive)
+        self.count += len(values)
+        if len(positive):
+            indexes, counts = np.unique(
+                np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True
+            )
+            for index, count in zip(indexes.tolist(), counts.tolist()):
+                self.bins[index] = self.bins.get(index, 0) + count
+            if len(self.bins) > self.max_buckets:
+                self._collapse()
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+        if len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        excess = keys[:len(keys) - self.max_buckets + 1]
+        target = keys[len(excess)]
+        self.bins[target] += sum(self.bins.pop(k) for k in excess)
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return self._value(index)
+        return self._value(max(self.bins))
+
+    def ks(self, other):
+        """
+        Kolmogorov-Smirnov distance between the two distributions, at
+        bucket resolution.
+        """
+        if not self.count or not other.count:
+            return None
+        a = self.zero / self.count
+        b = other.zero / other.count
+        distance = abs(a - b)
+        for index in sorted(set(self.bins) | set(other.bins)):
+            a += self.bins.get(index, 0) / self.count
+            b += other.bins.get(index, 0) / other.count
+            distance = max(distance, abs(a - b))
+        return distance
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero": self.zero,
+            "bins": {str(k): v for k, v in sorted(self.bins.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.bins = {int(k): v for k, v in data["bins"].items()}
+        sketch.zero = data["zero"]
+        sketch.count = sketch.zero + sum(sketch.bins.values())
+        return sketch
+
+
+class BinnedHistogram:
+    """
+    Counts over fixed bin edges: (-inf, e0), [e0, e1), ..., [en, inf).
+    """
+
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+
+    def add(self, value):
+        self.counts[bisect.bisect_right(self.edges, value)] += 1
+
+    def add_many(self, values):
+        indexes = np.searchsorted(self.edges, values, side="right")
+        for index, count in enumerate(np.bincount(indexes, minlength=len(self.counts)).tolist()):
+            self.counts[index] += count
+
+    def merge(self, other):
+        if other.edges != self.edges:
+            raise ValueError("Cannot merge histograms with different edges")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def psi(self, reference):
+        """
+        Population stability index of this histogram against a
+        reference with the same edges.
+        """
+        total, reference_total = sum(self.counts), sum(reference.counts)
+        if not total or not reference_total:
+            return None
+        psi = 0.0
+        for count, reference_count in zip(self.counts, reference.counts):
+            actual = max(count / total, PSI_EPSILON)
+            expected = max(reference_count / reference_total, PSI_EPSILON)
+            psi += (actual - expected) * math.log(actual / expected)
+        return psi
+
+    def to_dict(self):
+        return {"edges": self.edges, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["edges"])
+        histogram.counts = list(data["counts"])
+        return histogram
+
+
+class DriftProfile:
+    """
+    One quantile sketch and one histogram per monitored feature.
+    Profiles sharing the reference's bin edges merge by adding counts.
+    """
+
+    def __init__(self, edges, relative_accuracy=0.01):
+        self.sketches = {f: QuantileSketch(relative_accuracy) for f in FEATURES}
+        self.histograms = {f: BinnedHistogram(edges[f]) for f in FEATURES}
+
+    def empty_like(self):
+        return DriftProfile(
+            {f: h.edges for f, h in self.histograms.items()},
+            self.sketches[FEATURES[0]].relative_accuracy
+        )
+
+    def add(self, values):
+        for feature, value in values.items():
+            if value is None or not math.isfinite(value):
+                continue
+            self.sketches[feature].add(value)
+            self.histograms[feature].add(value)
+
+    def add_many(self, values):
+        for feature, array in values.items():
+            array = np.asarray(array, dtype=np.float64)
+            array = array[np.isfinite(array)]
+            self.sketches[feature].add_many(array)
+            self.histograms[feature].add_many(array)
+
+    def merge(self, other):
+        for feature in FEATURES:
+            self.sketches[feature].merge(other.sketches[feature])
+            self.histograms[feature].merge(other.histograms[feature])
+
+    def compare(self, reference, min_samples):
+        """
+        PSI, KS and headline quantiles per feature against a reference
+        profile. Scores are None below min_samples observations.
+        """
+        report = {}
+        for feature in FEATURES:
+            sketch, reference_sketch = self.sketches[feature], reference.sketches[feature]
+            entry = {
+                "samples": sketch.count,
+                "psi": None,
+                "ks": None,
+                "status": "insufficient_data",
+                "quantiles": _quantiles(sketch),
+                "reference_quantiles": _quantiles(reference_sketch)
+            }
+            if sketch.count >= min_samples:
+                psi = self.histograms[feature].psi(reference.histograms[feature])
+                entry["psi"] = round(psi, 4)
+                entry["ks"] = round(sketch.ks(reference_sketch), 4)
+                entry["status"] = (
+                    "significant" if psi >= PSI_SIGNIFICANT
+                    else "moderate" if psi >= PSI_MODERATE
+                    else "stable"
+                )
+            report[feature] = entry
+        return report
+
+    def to_dict(self):
+        return {
+            feature: {
+                "histogram": self.histograms[feature].to_dict(),
+                "sketch": self.sketches[feature].to_dict()
+            }
+            for feature in FEATURES
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls({f: data[f]["histogram"]["edges"] for f in FEATURES},
+                      data[FEATURES[0]]["sketch"]["relative_accuracy"])
+        for feature in FEATURES:
+            profile.histograms[feature] = BinnedHistogram.from_dict(data[feature]["histogram"])
+            profile.sketches[feature] = QuantileSketch.from_dict(data[feature]["sketch"])
+        return profile
+
+
+def _quantiles(sketch):
+    quantiles = {}
+    for q in REPORTED_QUANTILES:
+        value = sketch.quantile(q)
+        quantiles[f"p{round(q * 100):02d}"] = round(value, 4) if value is not None else None
+    return quantiles
+
+
+def input_values(monthly_income, loan_amount, risk_probability):
+    """
+    Monitored values for one application (scalars) or many (arrays),
+    derived the way the feature builder derives them.
+    """
+    annual_income = np.asarray(monthly_income, dtype=np.float64) * 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        loan_percent_income = np.asarray(loan_amount, dtype=np.float64) / annual_income
+    return {
+        "monthly_income": monthly_income,
+        "loan_amount": loan_amount,
+        "loan_percent_income": loan_percent_income,
+        "risk_probability": risk_probability
+    }
+
+
+def build_reference(monthly_income, loan_amount, risk_probability, bins=10,
+                    relative_accuracy=0.01, **metadata):
+    """
+    Reference profile from training rows. Histogram edges are the
+    reference deciles (for bins=10), so each reference bin holds about
+    the same share of rows.
+    """
+    values = {
+        f: np.asarray(v, dtype=np.float64)
+        for f, v in input_values(monthly_income, loan_amount, risk_probability).items()
+    }
+    cuts = np.linspace(0, 1, bins + 1)[1:-1]
+    edges = {
+        f: np.unique(np.quantile(v[np.isfinite(v)], cuts)).tolist()
+        for f, v in values.items()
+    }
+    profile = DriftProfile(edges, relative_accuracy)
+    profile.add_many(values)
+    return {
+        **metadata,
+        "rows": int(len(values["loan_amount"])),
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "profile": profile.to_dict()
+    }
+
+
+class DriftMonitor:
+    """
+    Streaming input-drift monitor.
+
+    Every evaluation adds its income, loan amount, loan-to-income ratio
+    and risk probability to the current time slot's DriftProfile, an
+    O(1) update with no database access. A sliding window of `slots`
+    slots covers the last `window_seconds`; a recycled slot is merged
+    into the lifetime totals, so memory stays constant. report() merges
+    the slots and compares them with the reference profile built from
+    the training data (python -m app.ml.drift_reference).
+
+    State is per worker process, like /metrics.
+    """
+
+    def __init__(self, reference_path=REFERENCE_PATH, window_seconds=3600.0, slots=6,
+                 min_samples=50, enabled=True):
+        self.reference_path = reference_path
+        self.window_seconds = window_seconds
+        self.slots = max(1, slots)
+        self.slot_seconds = window_seconds / self.slots
+        self.min_samples = min_samples
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._reference = None
+        self._reference_meta = None
+        self._error = None
+        self._slots = [None] * self.slots   # (slot key, DriftProfile)
+        self._retired = None
+        self._cached_report = (0.0, None)
+
+    def _ensure_reference(self):
+        # Called under the lock; loads the reference once
+        if self._reference is not None:
+            return True
+        if self._error is not None or not self.enabled:
+            return False
+        try:
+            with open(self.reference_path) as f:
+                data = json.load(f)
+            self._reference = DriftProfile.from_dict(data.pop("profile"))
+            self._reference_meta = data
+            self._retired = self._reference.empty_like()
+        except (OSError, ValueError, KeyError) as e:
+            self._error = f"Cannot load drift reference {self.reference_path}: {e}"
+            print(f"DriftMonitor Error: {self._error}")
+            return False
+        return True
+
+    def _slot(self, now):
+        key = int(now // self.slot_seconds)
+        position = key % self.slots
+        current = self._slots[position]
+        if current is None or current[0] != key:
+            if current is not None:
+                self._retired.merge(current[1])
+            current = (key, self._reference.empty_like())
+            self._slots[position] = current
+        return current[1]
+
+    # -------------------------------------------------
+    # RECORDING
+    # -------------------------------------------------
+    def observe(self, monthly_income, loan_amount, risk_probability):
+        if not self.enabled:
+            return
+        annual_income = monthly_income * 12
+        values = {
+            "monthly_income": monthly_income,
+            "loan_amount": loan_amount,
+            "loan_percent_income": loan_amount / annual_income if annual_income else None,
+            "risk_probability": float(risk_probability)
+        }
+        try:
+            with self._lock:
+                if self._ensure_reference():
+                    self._slot(time.time()).add(values)
+        except Exception as e:
+            print(f"DriftMonitor Error: {e}")
+
+    def observe_many(self, monthly_income, loan_amount, risk_probability):
+        if not self.enabled:
+            return
+        values = input_values(monthly_income, loan_amount, risk_probability)
+        try:
+            with self._lock:
+                if self._ensure_reference():
+                    self._slot(time.time()).add_many(values)
+        except Exception as e:
+            print(f"DriftMonitor Error: {e}")
+
+    # -------------------------------------------------
+    # REPORTING
+    # -------------------------------------------------
+    def report(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            if not self._ensure_reference():
+                return {"enabled": self.enabled, "error": self._error}
+            oldest = int(now // self.slot_seconds) - self.slots + 1
+            window = self._reference.empty_like()
+            lifetime = self._reference.empty_like()
+            lifetime.merge(self._retired)
+            for slot in self._slots:
+                if slot is None:
+                    continue
+                lifetime.merge(slot[1])
+                if slot[0] >= oldest:
+                    window.merge(slot[1])
+            reference, meta = self._reference, dict(self._reference_meta)
+
+        report = {
+            "enabled": True,
+            "reference": meta,
+            "window_seconds": self.window_seconds,
+            "min_samples": self.min_samples,
+            "window": window.compare(reference, self.min_samples),
+            "lifetime": lifetime.compare(reference, self.min_samples)
+        }
+        self._cached_report = (time.monotonic(), report)
+        return report
+
+    def scores(self, statistic):
+        """
+        {(feature,): value} of one window statistic, for the gauges.
+        """
+        # One report per scrape serves every drift gauge
+        at, report = self._cached_report
+        if report is None or time.monotonic() - at > 1.0:
+            report = self.report()
+        return {
+            (feature,): entry[statistic]
+            for feature, entry in report.get("window", {}).items()
+            if entry[statistic] is not None
+        }
+
+
+drift_monitor = DriftMonitor(
+    reference_path=os.getenv("DRIFT_REFERENCE_PATH", REFERENCE_PATH),
+    window_seconds=float(os.getenv("DRIFT_WINDOW_SECONDS", "3600")),
+    slots=int(os.getenv("DRIFT_WINDOW_SLOTS", "6")),
+    min_samples=int(os.getenv("DRIFT_MIN_SAMPLES", "50")),
+    enabled=os.getenv("DRIFT_MONITOR", "1") == "1"
+)
+
+metrics.gauge("input_drift_psi", "PSI of live inputs vs the training reference over the drift window",
+              lambda: drift_monitor.scores("psi"), labelnames=("feature",))
+metrics.gauge("input_drift_ks", "KS distance of live inputs vs the training reference over the drift window",
+              lambda: drift_monitor.scores("ks"), labelnames=("feature",))
+metrics.gauge("input_drift_samples", "Observations per feature in the drift window",
+              lambda: drift_monitor.scores("samples"), labelnames=("feature",))
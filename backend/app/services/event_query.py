@@ -0,0 +1,106 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, or_
+
+from app.models.agent_event import AgentEvent
+
+CSV_COLUMNS = ["event_id", "session_id", "agent", "event_type", "timestamp", "input", "output"]
+
+
+def _naive_utc(ts):
+    # Timestamps are stored as naive UTC
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def encode_cursor(event):
+    raw = f"{event.timestamp.isoformat()}|{event.event_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Returns (timestamp, event_id), or raises ValueError for a bad cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, event_id = raw.split("|", 1)
+        return _naive_utc(datetime.fromisoformat(timestamp)), event_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def filtered_events(db, session_id=None, agent_name=None, event_type=None,
+                    since=None, until=None, cursor=None):
+    """
+    Agent events matching the filters in (timestamp, event_id) order,
+    positioned after `cursor` when one is given.
+    """
+    query = db.query(AgentEvent)
+
+    if session_id:
+        query = query.filter(AgentEvent.session_id == session_id)
+    if agent_name:
+        query = query.filter(AgentEvent.agent_name == agent_name)
+    if event_type:
+        query = query.filter(AgentEvent.event_type == event_type)
+    if since:
+        query = query.filter(AgentEvent.timestamp >= _naive_utc(since))
+    if until:
+        query = query.filter(AgentEvent.timestamp < _naive_utc(until))
+
+    if cursor:
+        last_timestamp, last_event_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            AgentEvent.timestamp > last_timestamp,
+            and_(AgentEvent.timestamp == last_timestamp, AgentEvent.event_id > last_event_id)
+        ))
+
+    return query.order_by(AgentEvent.timestamp, AgentEvent.event_id)
+
+
+def serialize_event(e):
+    return {
+        "event_id": e.event_id,
+        "session_id": e.session_id,
+        "agent": e.agent_name,
+        "event_type": e.event_type,
+        "timestamp": e.timestamp.isoformat() if e.timestamp else None,
+        "input": e.input_snapshot,
+        "output": e.output_snapshot
+    }
+
+
+def stream_events(db_factory, fmt, batch_size=1000, **filters):
+    """
+    Yields an export of the matching events as NDJSON lines or CSV rows.
+    Rows are fetched through a server-side cursor in batches of
+    `batch_size`, so memory stays constant regardless of table size.
+    """
+    db = db_factory()
+    try:
+        # yield_per also enables a server-side cursor (stream_results)
+        query = filtered_events(db, **filters).yield_per(batch_size)
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_COLUMNS)
+            for e in query:
+                row = serialize_event(e)
+                row["input"] = json.dumps(row["input"])
+                row["output"] = json.dumps(row["output"])
+                writer.writerow([row[col] for col in CSV_COLUMNS])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        else:
+            for e in query:
+                yield json.dumps(serialize_event(e)) + "\n"
+    finally:
+        db.close()
@@ -0,0 +1,24 @@
+import os
+
+from app.services.registry import registry
+
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
+
+
+def _create_gemini_model():
+    # Imported here so app startup does not pay for the SDK import
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+
+# gRPC channels must not cross a fork, so workers build their own client
+registry.register("gemini_model", _create_gemini_model, fork_safe=False)
+
+
+def gemini_model():
+    """
+    Shared Gemini client, configured on first use.
+    """
+    return registry.get("gemini_model")
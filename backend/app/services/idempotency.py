@@ -0,0 +1,184 @@
+import asyncio
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.llm_cache import prompt_fingerprint
+from app.services.metrics import metrics
+
+IDEMPOTENCY_REQUESTS = metrics.counter(
+    "idempotency_requests_total", "Loan applications by idempotency outcome (miss, hit, coalesced, conflict)",
+    ("outcome",)
+)
+
+
+class IdempotencyConflict(ValueError):
+    """
+    The Idempotency-Key was already used with a different request body.
+    """
+
+
+class IdempotencyStore:
+    """
+    Deduplicates repeated loan applications.
+
+    Requests are keyed on the client's Idempotency-Key header, or, when
+    none is sent, on a hash of the client identity and the LoanInput,
+    which is only reused within `window_seconds`. Without a key, only
+    the same client repeating the same inputs is deduplicated; another
+    client's identical application is computed for that client. With no
+    client identity, or `window_seconds` <= 0, requests without a key
+    are not deduplicated. A completed request's response is replayed
+    for its key; concurrent duplicates of an in-flight request wait for
+    that one computation (single-flight) instead of starting their own.
+    Failed computations are not stored.
+
+    Completed entries are LRU-evicted beyond `max_entries`.
+    State is per process, like the LLM cache's in-memory backend.
+    """
+
+    def __init__(self, key_ttl_seconds=86400, window_seconds=300, max_entries=10000):
+        self.key_ttl_seconds = key_ttl_seconds
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._completed = OrderedDict()  # key -> (expires_at, fingerprint, response)
+        self._in_flight = {}  # key -> (fingerprint, future)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def fingerprint(scope, loan_input):
+        return prompt_fingerprint(
+            scope, loan_input.monthly_income, loan_input.existing_emi,
+            loan_input.loan_amount, loan_input.tenure_months
+        )
+
+    def key_for(self, scope, loan_input, idempotency_key=None, client=None):
+        """
+        Returns (key, fingerprint, ttl) for a request. The key is None
+        when the request is not deduplicated.
+        """
+        fingerprint = self.fingerprint(scope, loan_input)
+        if idempotency_key:
+            return f"key:{scope}:{idempotency_key}", fingerprint, self.key_ttl_seconds
+        if not client or self.window_seconds <= 0:
+            return None, fingerprint, 0
+        return f"input:{prompt_fingerprint(client)}:{fingerprint}", fingerprint, self.window_seconds
+
+    # -------------------------------------------------
+    # LOOKUP / STORE
+    # -------------------------------------------------
+    def lookup(self, key, fingerprint):
+        """
+        Stored response for a completed request, or None.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._completed.get(key)
+            if entry is None:
+                return None
+            expires_at, stored_fingerprint, response = entry
+            if expires_at < time.time():
+                del self._completed[key]
+                return None
+            if stored_fingerprint != fingerprint:
+                IDEMPOTENCY_REQUESTS.inc(outcome="conflict")
+                raise IdempotencyConflict("Idempotency-Key reused with a different request body")
+            self._completed.move_to_end(key)
+        IDEMPOTENCY_REQUESTS.inc(outcome="hit")
+        return copy.deepcopy(response)
+
+    def store(self, key, fingerprint, ttl, response):
+        if key is None:
+            return
+        with self._lock:
+            self._completed[key] = (time.time() + ttl, fingerprint, copy.deepcopy(response))
+            self._completed.move_to_end(key)
+            while len(self._completed) > self.max_entries:
+                self._completed.popitem(last=False)
+                self.evictions += 1
+
+    # -------------------------------------------------
+    # SINGLE-FLIGHT
+    # -------------------------------------------------
+    async def run(self, key, fingerprint, ttl, compute):
+        """
+        Returns (response, replayed). compute() is awaited at most once
+        per key at a time.
+        """
+        if key is None:
+            return await compute(), False
+
+        stored = self.lookup(key, fingerprint)
+        if stored is not None:
+            return stored, True
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._in_flight.get(key)
+            # Futures belong to one event loop; ignore leftovers from another
+            if flight is not None and flight[1].get_loop() is loop:
+                leader = False
+            else:
+                flight = (fingerprint, loop.create_future())
+                self._in_flight[key] = flight
+                leader = True
+
+        if not leader:
+            if flight[0] != fingerprint:
+                IDEMPOTENCY_REQUESTS.inc(outcome="conflict")
+                raise IdempotencyConflict("Idempotency-Key reused with a different request body")
+            IDEMPOTENCY_REQUESTS.inc(outcome="coalesced")
+            try:
+                response = await asyncio.shield(flight[1])
+            except asyncio.CancelledError:
+                if not flight[1].cancelled():
+                    raise
+                # The leading request was abandoned; compute afresh
+                return await self.run(key, fingerprint, ttl, compute)
+            return copy.deepcopy(response), True
+
+        IDEMPOTENCY_REQUESTS.inc(outcome="miss")
+        future = flight[1]
+        try:
+            response = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        else:
+            self.store(key, fingerprint, ttl, response)
+            future.set_result(response)
+            return response, False
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "completed": len(self._completed),
+                "in_flight": len(self._in_flight),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "window_seconds": self.window_seconds,
+                "key_ttl_seconds": self.key_ttl_seconds
+            }
+
+
+idempotency_store = IdempotencyStore(
+    key_ttl_seconds=float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400")),
+    window_seconds=float(os.getenv("IDEMPOTENCY_WINDOW", "300")),
+    max_entries=int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+)
+
+metrics.gauge("idempotency_entries", "Completed responses held for replay",
+              lambda: len(idempotency_store._completed))
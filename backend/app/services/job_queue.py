@@ -0,0 +1,382 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, or_, func
+
+from app.db import SessionLocal
+from app.models.application_job import ApplicationJob
+from app.models.session import Session
+from app.services.metrics import metrics
+
+# Priority lanes (lower runs first)
+LANES = {"interactive": 0, "bulk": 1}
+LANE_NAMES = {v: k for k, v in LANES.items()}
+
+JOBS_PROCESSED = metrics.counter(
+    "application_jobs_total", "Enrichment jobs by lane and outcome (done, retried, failed)",
+    ("lane", "outcome")
+)
+JOB_WAIT_SECONDS = metrics.histogram(
+    "application_job_wait_seconds", "Time from enqueue to a worker picking the job up", ("lane",)
+)
+JOB_RUN_SECONDS = metrics.histogram(
+    "application_job_run_seconds", "Enrichment job run time", ("lane",)
+)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _epoch(ts):
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+class JobQueue:
+    """
+    Durable queue of deferred LLM enrichment jobs.
+
+    Jobs live in the application_jobs table, committed together with
+    their session (status "queued"), so a restart loses nothing. A
+    bounded pool of `workers` threads claims jobs in priority order
+    (interactive before bulk, then oldest first) with a conditional
+    UPDATE, which is safe across processes sharing the database. At
+    most `bulk_workers` threads run bulk jobs at once, keeping the rest
+    free for interactive traffic.
+
+    Claimed jobs hold a lease; a job whose worker died is claimed again
+    once the lease expires, or marked failed if it has used all
+    `max_attempts`. Failed jobs are retried up to `max_attempts` times.
+    A worker only records its outcome while the job still carries the
+    attempt it claimed, so a worker whose lease was taken over cannot
+    overwrite the newer attempt. Session.status follows the job:
+    queued -> enriching -> completed / failed.
+    """
+
+    def __init__(self, workers=4, bulk_workers=2, poll_interval=0.5, lease_seconds=120.0,
+                 max_attempts=3):
+        self.workers = max(1, workers)
+        self.bulk_workers = max(1, min(bulk_workers, self.workers))
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self._handler = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self.running = {lane: 0 for lane in LANES.values()}
+
+    # -------------------------------------------------
+    # LIFECYCLE
+    # -------------------------------------------------
+    def start(self, handler):
+        """
+        Starts the worker pool. handler(session_id, payload) runs the
+        enrichment and returns the result stored on the job.
+        """
+        with self._lock:
+            self._handler = handler
+            self._threads = [t for t in self._threads if t.is_alive()]
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self, timeout=10.0):
+        """
+        Stops claiming jobs and waits for running ones. Jobs still
+        queued stay in the table for the next start.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stopping.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    # -------------------------------------------------
+    # PRODUCER SIDE
+    # -------------------------------------------------
+    def enqueue(self, session_id, payload, lane="interactive", created_at=None):
+        """
+        Commits the session (status "queued") and its job in one
+        transaction.
+        """
+        now = created_at or _utcnow()
+        db = SessionLocal()
+        try:
+            db.add(Session(session_id=session_id, status="queued", created_at=now))
+            db.add(ApplicationJob(
+                session_id=session_id,
+                priority=LANES[lane],
+                status="queued",
+                attempts=0,
+                payload=payload,
+                enqueued_at=now
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self._wake.set()
+
+    def get(self, session_id):
+        """
+        Session status and job state, or None for an unknown session.
+        """
+        db = SessionLocal()
+        try:
+            session = db.get(Session, session_id)
+            if session is None:
+                return None
+            job = db.get(ApplicationJob, session_id)
+            state = {"session_id": session_id, "status": session.status}
+            if job is not None:
+                state.update({
+                    "lane": LANE_NAMES.get(job.priority, str(job.priority)),
+                    "attempts": job.attempts,
+                    "eligibility": job.payload.get("eligibility"),
+                    "eligibility_targets": job.payload.get("eligibility_targets"),
+                    "response": job.result,
+                    "error": job.error
+                })
+            return state
+        finally:
+            db.close()
+
+    # -------------------------------------------------
+    # WORKER SIDE
+    # -------------------------------------------------
+    def _run(self):
+        while not self._stopping.is_set():
+            job = self._next_job()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._execute(job)
+            finally:
+                with self._lock:
+                    self.running[job["priority"]] -= 1
+
+    def _next_job(self):
+        # Reserve a bulk slot before claiming, so concurrent workers
+        # cannot exceed bulk_workers between the check and the claim
+        with self._lock:
+            allow_bulk = self.running[LANES["bulk"]] < self.bulk_workers
+            if allow_bulk:
+                self.running[LANES["bulk"]] += 1
+
+        lanes = list(LANES.values()) if allow_bulk else [LANES["interactive"]]
+        try:
+            job = self._claim(lanes)
+        except Exception as e:
+            print(f"JobQueue Error: {e}")
+            job = None
+
+        with self._lock:
+            if allow_bulk:
+                self.running[LANES["bulk"]] -= 1
+            if job is not None:
+                self.running[job["priority"]] += 1
+        return job
+
+    def _claim(self, lanes):
+        now = _utcnow()
+        expired = and_(ApplicationJob.status == "running", ApplicationJob.lease_expires_at < now)
+        claimable = or_(
+            ApplicationJob.status == "queued",
+            and_(expired, ApplicationJob.attempts < self.max_attempts)
+        )
+
+        db = SessionLocal()
+        try:
+            self._fail_exhausted(db, lanes, and_(expired, ApplicationJob.attempts >= self.max_attempts), now)
+
+            candidates = (
+                db.query(ApplicationJob.session_id)
+                .filter(ApplicationJob.priority.in_(lanes), claimable)
+                .order_by(ApplicationJob.priority, ApplicationJob.enqueued_at)
+                .limit(8)
+                .all()
+            )
+            for (session_id,) in candidates:
+                # Conditional update: only one worker (in any process) wins
+                claimed = (
+                    db.query(ApplicationJob)
+                    .filter(ApplicationJob.session_id == session_id, claimable)
+                    .update({
+                        "status": "running",
+                        "attempts": ApplicationJob.attempts + 1,
+                        "started_at": now,
+                        "lease_expires_at": now + timedelta(seconds=self.lease_seconds)
+                    }, synchronize_session=False)
+                )
+                if not claimed:
+                    db.rollback()
+                    continue
+                db.query(Session).filter(Session.session_id == session_id).update(
+                    {"status": "enriching"}, synchronize_session=False
+                )
+                db.commit()
+
+                job = db.get(ApplicationJob, session_id)
+                lane = LANE_NAMES.get(job.priority, str(job.priority))
+                JOB_WAIT_SECONDS.observe(max(0.0, _epoch(now) - _epoch(job.enqueued_at)), lane=lane)
+                return {
+                    "session_id": job.session_id,
+                    "priority": job.priority,
+                    "attempts": job.attempts,
+                    "payload": job.payload
+                }
+            return None
+        finally:
+            db.close()
+
+    def _fail_exhausted(self, db, lanes, exhausted, now):
+        """
+        Marks jobs whose last allowed attempt lost its lease as failed
+        instead of claiming them again.
+        """
+        rows = (
+            db.query(ApplicationJob.session_id, ApplicationJob.priority)
+            .filter(ApplicationJob.priority.in_(lanes), exhausted)
+            .all()
+        )
+        for session_id, priority in rows:
+            failed = (
+                db.query(ApplicationJob)
+                .filter(ApplicationJob.session_id == session_id, exhausted)
+                .update({
+                    "status": "failed",
+                    "error": "lease expired on the last attempt",
+                    "lease_expires_at": None,
+                    "finished_at": now
+                }, synchronize_session=False)
+            )
+            if not failed:
+                db.rollback()
+                continue
+            db.query(Session).filter(Session.session_id == session_id).update(
+                {"status": "failed"}, synchronize_session=False
+            )
+            db.commit()
+            print(f"JobQueue Error ({session_id}): lease expired after {self.max_attempts} attempts")
+            JOBS_PROCESSED.inc(lane=LANE_NAMES.get(priority, str(priority)), outcome="failed")
+
+    def _execute(self, job):
+        lane = LANE_NAMES.get(job["priority"], str(job["priority"]))
+        start = time.perf_counter()
+        try:
+            result = self._handler(job["session_id"], job["payload"])
+        except Exception as e:
+            print(f"JobQueue Error ({job['session_id']}): {e}")
+            retry = job["attempts"] < self.max_attempts
+            if self._finish(job, "queued" if retry else "failed",
+                            "queued" if retry else "failed", error=str(e)):
+                JOBS_PROCESSED.inc(lane=lane, outcome="retried" if retry else "failed")
+                if retry:
+                    self._wake.set()
+            return
+        JOB_RUN_SECONDS.observe(time.perf_counter() - start, lane=lane)
+        if self._finish(job, "done", "completed", result=result):
+            JOBS_PROCESSED.inc(lane=lane, outcome="done")
+
+    def _finish(self, job, job_status, session_status, result=None, error=None):
+        """
+        Records the outcome of the claimed attempt. Returns False when
+        the job was claimed again after this worker's lease expired.
+        """
+        session_id = job["session_id"]
+        db = SessionLocal()
+        try:
+            values = {"status": job_status, "error": error, "lease_expires_at": None}
+            if job_status != "queued":
+                values.update({"result": result, "finished_at": _utcnow()})
+            updated = (
+                db.query(ApplicationJob)
+                .filter(
+                    ApplicationJob.session_id == session_id,
+                    ApplicationJob.status == "running",
+                    ApplicationJob.attempts == job["attempts"]
+                )
+                .update(values, synchronize_session=False)
+            )
+            if not updated:
+                db.rollback()
+                print(f"JobQueue Error ({session_id}): lease lost, outcome of attempt {job['attempts']} discarded")
+                return False
+            db.query(Session).filter(Session.session_id == session_id).update(
+                {"status": session_status}, synchronize_session=False
+            )
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            print(f"JobQueue Error: {e}")
+            return False
+        finally:
+            db.close()
+
+    # -------------------------------------------------
+    # STATS
+    # -------------------------------------------------
+    def depth(self):
+        """
+        Queued jobs per lane.
+        """
+        db = SessionLocal()
+        try:
+            counts = {name: 0 for name in LANES}
+            rows = (
+                db.query(ApplicationJob.priority, func.count())
+                .filter(ApplicationJob.status == "queued")
+                .group_by(ApplicationJob.priority)
+                .all()
+            )
+            for priority, count in rows:
+                counts[LANE_NAMES.get(priority, str(priority))] = count
+            return counts
+        finally:
+            db.close()
+
+    def stats(self):
+        with self._lock:
+            running = {LANE_NAMES[p]: n for p, n in self.running.items()}
+            alive = sum(t.is_alive() for t in self._threads)
+        return {
+            "workers": self.workers,
+            "workers_alive": alive,
+            "bulk_workers": self.bulk_workers,
+            "running": running,
+            "queued": self.depth(),
+            "lease_seconds": self.lease_seconds,
+            "max_attempts": self.max_attempts
+        }
+
+
+job_queue = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    bulk_workers=int(os.getenv("JOB_BULK_WORKERS", "2")),
+    poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "0.5")),
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "120")),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+)
+
+metrics.gauge("application_jobs_queued", "Enrichment jobs waiting for a worker",
+              lambda: sum(job_queue.depth().values()))
+metrics.gauge("application_jobs_running", "Enrichment jobs currently running",
+              lambda: sum(job_queue.running.values()))
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+
+from app.services.gemini import gemini_model
+from app.services.registry import registry
+
+
+class LLMBackend(ABC):
+    """
+    Text generation interface used by the LLM agents.
+
+    Responses follow the shape of Gemini's: `.text` and
+    `.usage_metadata` (prompt_token_count / candidates_token_count).
+    generate() takes an optional timeout in seconds; async callers
+    bound the call with asyncio.wait_for instead.
+    stream_async() returns an async iterable of chunks with `.text`;
+    its `.usage_metadata` is available once iteration has finished.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self, prompt, json_mode=False, timeout=None):
+        ...
+
+    @abstractmethod
+    async def generate_async(self, prompt, json_mode=False):
+        ...
+
+    @abstractmethod
+    async def stream_async(self, prompt, json_mode=False):
+        ...
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    @staticmethod
+    def _config(json_mode):
+        return {"response_mime_type": "application/json"} if json_mode else None
+
+    def generate(self, prompt, json_mode=False, timeout=None):
+        return gemini_model().generate_content(
+            prompt, generation_config=self._config(json_mode),
+            request_options={"timeout": timeout} if timeout else None
+        )
+
+    async def generate_async(self, prompt, json_mode=False):
+        return await gemini_model().generate_content_async(
+            prompt, generation_config=self._config(json_mode)
+        )
+
+    async def stream_async(self, prompt, json_mode=False):
+        return await gemini_model().generate_content_async(
+            prompt, generation_config=self._config(json_mode), stream=True
+        )
+
+
+# -------------------------------------------------
+# OFFLINE STAND-IN
+# -------------------------------------------------
+class StubLLMError(RuntimeError):
+    pass
+
+
+class _StubStream:
+    def __init__(self, chunks, delays, fail_after, usage):
+        self._chunks = chunks
+        self._delays = delays
+        self._fail_after = fail_after
+        self._usage = usage
+        self.usage_metadata = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for i, (chunk, delay) in enumerate(zip(self._chunks, self._delays)):
+            await asyncio.sleep(delay)
+            if i == self._fail_after:
+                raise StubLLMError("stub stream interrupted")
+            yield SimpleNamespace(text=chunk)
+        self.usage_metadata = self._usage
+
+
+class StubLLMBackend(LLMBackend):
+    """
+    Deterministic offline stand-in for load and latency testing.
+
+    Latency is log-normal around `latency_ms` (spread `latency_sigma`);
+    a `stall_rate` fraction of calls take `stall_ms` instead, to exercise
+    agent deadlines. An `error_rate` fraction raise, mid-stream for
+    streaming calls. Streams emit `stream_chunks` pieces, the first after
+    `first_chunk_fraction` of the total latency.
+
+    Output text is a pure function of the prompt, so cache behaviour
+    matches real traffic; timing and failures come from a seeded RNG.
+    """
+
+    name = "stub"
+
+    JSON_TEMPLATES = [
+        ("Application Update", "Thank you for applying. We have reviewed your details carefully and "
+                               "shared what this decision means for you below."),
+        ("Review Status", "We appreciate your patience. Your application has been assessed and the "
+                          "key factors behind the outcome are summarised below."),
+        ("Here's Where You Stand", "We know loan decisions matter. Based on the figures you shared, "
+                                   "here is a clear picture of your application."),
+    ]
+    TEXT_TEMPLATES = [
+        "Looking at your monthly income and existing EMI, the main pressure on this application is how "
+        "much of your income is already committed. Reducing current obligations, choosing a longer tenure "
+        "or a smaller amount, and keeping repayments on time would all strengthen a future application.",
+        "Your figures show a repayment burden that is high relative to income. Clearing a smaller loan "
+        "first, avoiding new credit for a few months and building a steady repayment record are practical "
+        "steps that tend to improve eligibility over time.",
+    ]
+
+    def __init__(self, latency_ms=800.0, latency_sigma=0.35, error_rate=0.0, stall_rate=0.0,
+                 stall_ms=30000.0, stream_chunks=8, first_chunk_fraction=0.3, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.stream_chunks = max(1, stream_chunks)
+        self.first_chunk_fraction = first_chunk_fraction
+        self._rng = random.Random(seed)
+
+    # Behaviour -------------------------------------------------
+    def _latency(self):
+        if self._rng.random() < self.stall_rate:
+            return self.stall_ms / 1000
+        return self._rng.lognormvariate(0.0, self.latency_sigma) * self.latency_ms / 1000
+
+    def _fails(self):
+        return self._rng.random() < self.error_rate
+
+    def _text(self, prompt, json_mode):
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        if json_mode:
+            title, message = self.JSON_TEMPLATES[digest % len(self.JSON_TEMPLATES)]
+            decision = re.search(r"Loan Decision:\s*(\w+)", prompt)
+            if decision:
+                message = f"Your loan decision is {decision.group(1)}. {message}"
+            response = {"title": title, "message": message}
+            # Fused advisory prompts ask for the advice as a third field
+            if '"advice"' in prompt:
+                response["advice"] = self.TEXT_TEMPLATES[digest % len(self.TEXT_TEMPLATES)]
+            return json.dumps(response)
+        return self.TEXT_TEMPLATES[digest % len(self.TEXT_TEMPLATES)]
+
+    @staticmethod
+    def _usage(prompt, text):
+        # Roughly four characters per token
+        return SimpleNamespace(
+            prompt_token_count=max(1, len(prompt) // 4),
+            candidates_token_count=max(1, len(text) // 4)
+        )
+
+    def _response(self, prompt, json_mode):
+        text = self._text(prompt, json_mode)
+        return SimpleNamespace(text=text, usage_metadata=self._usage(prompt, text))
+
+    # Interface -------------------------------------------------
+    def generate(self, prompt, json_mode=False, timeout=None):
+        latency = self._latency()
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("stub generation timed out")
+        time.sleep(latency)
+        if self._fails():
+            raise StubLLMError("stub generation failed")
+        return self._response(prompt, json_mode)
+
+    async def generate_async(self, prompt, json_mode=False):
+        await asyncio.sleep(self._latency())
+        if self._fails():
+            raise StubLLMError("stub generation failed")
+        return self._response(prompt, json_mode)
+
+    async def stream_async(self, prompt, json_mode=False):
+        text = self._text(prompt, json_mode)
+        size = -(-len(text) // self.stream_chunks)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+
+        total = self._latency()
+        first = total * self.first_chunk_fraction
+        rest = (total - first) / max(1, len(chunks) - 1)
+        delays = [first] + [rest] * (len(chunks) - 1)
+
+        fail_after = self._rng.randrange(len(chunks)) if self._fails() else None
+        return _StubStream(chunks, delays, fail_after, self._usage(prompt, text))
+
+
+def create_llm_backend():
+    """
+    Builds the backend selected by LLM_BACKEND (gemini | stub).
+    The stub is configured with LLM_STUB_LATENCY_MS, LLM_STUB_LATENCY_SIGMA,
+    LLM_STUB_ERROR_RATE, LLM_STUB_STALL_RATE, LLM_STUB_STALL_MS,
+    LLM_STUB_STREAM_CHUNKS and LLM_STUB_SEED.
+    """
+    backend = os.getenv("LLM_BACKEND", "gemini").lower()
+    if backend == "stub":
+        seed = os.getenv("LLM_STUB_SEED")
+        return StubLLMBackend(
+            latency_ms=float(os.getenv("LLM_STUB_LATENCY_MS", "800")),
+            latency_sigma=float(os.getenv("LLM_STUB_LATENCY_SIGMA", "0.35")),
+            error_rate=float(os.getenv("LLM_STUB_ERROR_RATE", "0")),
+            stall_rate=float(os.getenv("LLM_STUB_STALL_RATE", "0")),
+            stall_ms=float(os.getenv("LLM_STUB_STALL_MS", "30000")),
+            stream_chunks=int(os.getenv("LLM_STUB_STREAM_CHUNKS", "8")),
+            seed=int(seed) if seed is not None else None
+        )
+    return GeminiBackend()
+
+
+registry.register("llm_backend", create_llm_backend, fork_safe=False)
+
+
+def llm_backend() -> LLMBackend:
+    """
+    Shared LLM backend, created on first use.
+    """
+    return registry.get("llm_backend")
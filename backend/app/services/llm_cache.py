@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+def prompt_fingerprint(*parts) -> str:
+    """
+    Stable cache key for an LLM prompt.
+    Whitespace is collapsed so cosmetic prompt edits do not split the cache.
+    """
+    normalized = "\x1f".join(re.sub(r"\s+", " ", str(p)).strip() for p in parts)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def bucket(value, step) -> int:
+    """
+    Rounds a rupee figure to the nearest multiple of step,
+    so near-identical applications share a cache entry.
+    """
+    return int(round(value / step) * step)
+
+
+class LLMCache(ABC):
+    """
+    Cache for agent LLM outputs with TTL and LRU eviction.
+
+    Each key holds up to `variants` distinct responses. Until a key has
+    collected that many, lookups report a miss so the caller generates a
+    fresh response; afterwards a random variant is served, so users do
+    not all see identical wording.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_entries=1024, variants=1):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.variants = max(1, variants)
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        values = self._load(key)
+        with self._stats_lock:
+            if values is not None and len(values) >= self.variants:
+                self.hits += 1
+                return random.choice(values)
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._store(key, value)
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": self._size(),
+                "variants": self.variants,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+    # Backend hooks
+    @abstractmethod
+    def _load(self, key):
+        ...
+
+    @abstractmethod
+    def _store(self, key, value):
+        ...
+
+    @abstractmethod
+    def _size(self):
+        ...
+
+
+class NullLLMCache(LLMCache):
+    """
+    Disabled cache: every lookup is a miss and nothing is stored.
+    """
+
+    def _load(self, key):
+        return None
+
+    def _store(self, key, value):
+        pass
+
+    def _size(self):
+        return 0
+
+
+class InMemoryLLMCache(LLMCache):
+    """
+    In-process LRU cache. Contents are lost on restart.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._entries = OrderedDict()  # key -> (expires_at, [values])
+        self._lock = threading.Lock()
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return list(values)
+
+    def _store(self, key, value):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                entry = (time.time() + self.ttl_seconds, [])
+            values = entry[1]
+            if len(values) < self.variants:
+                values.append(value)
+            self._entries[key] = entry
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _size(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteLLMCache(LLMCache):
+    """
+    SQLite-backed cache that persists across restarts.
+    Values are stored as JSON, one row per variant.
+
+    Hits do not write: last_access times are collected in memory and
+    written in one transaction with the next store, or once
+    ACCESS_FLUSH_SIZE keys or ACCESS_FLUSH_SECONDS have accumulated.
+    """
+
+    ACCESS_FLUSH_SIZE = 256
+    ACCESS_FLUSH_SECONDS = 30.0
+
+    def __init__(self, path="./llm_cache.db", **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn_pid = None
+        self._connection = None
+        self._accessed = {}  # key -> last_access not yet written
+        self._accessed_since = time.time()
+
+    @property
+    def _conn(self):
+        # Opened lazily, and reopened after a fork: sqlite3
+        # connections must not be shared across processes
+        if self._connection is None or self._conn_pid != os.getpid():
+            self._connection = self._connect()
+            self._conn_pid = os.getpid()
+        return self._connection
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT NOT NULL,
+                variant INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (key, variant)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)"
+        )
+        conn.commit()
+        return conn
+
+    def _load(self, key):
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at >= ? ORDER BY variant",
+                (key, now)
+            ).fetchall()
+            if not rows:
+                return None
+            self._accessed[key] = now
+            if (len(self._accessed) >= self.ACCESS_FLUSH_SIZE
+                    or now - self._accessed_since >= self.ACCESS_FLUSH_SECONDS):
+                self._write_accessed()
+                self._conn.commit()
+        return [json.loads(row[0]) for row in rows]
+
+    def _write_accessed(self):
+        # Caller holds self._lock and commits
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                [(at, key) for key, at in self._accessed.items()]
+            )
+            self._accessed.clear()
+        self._accessed_since = time.time()
+
+    def _store(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key = ? AND expires_at < ?", (key, now)
+            )
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()[0]
+            if count < self.variants:
+                self._conn.execute(
+                    "INSERT INTO llm_cache (key, variant, value, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, count, json.dumps(value), now + self.ttl_seconds, now)
+                )
+
+            # LRU eviction over distinct keys, by up-to-date access times
+            self._write_accessed()
+            overflow = self._conn.execute(
+                "SELECT COUNT(DISTINCT key) FROM llm_cache"
+            ).fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache GROUP BY key
+                        ORDER BY MAX(last_access) LIMIT ?
+                    )
+                    """,
+                    (overflow,)
+                )
+            self._conn.commit()
+
+    def _size(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(DISTINCT key) FROM llm_cache"
+            ).fetchone()[0]
+
+
+def create_llm_cache():
+    """
+    Builds the cache configured by environment variables:
+    LLM_CACHE_BACKEND (memory | sqlite | none), LLM_CACHE_TTL,
+    LLM_CACHE_MAX_ENTRIES, LLM_CACHE_VARIANTS, LLM_CACHE_PATH.
+    """
+    backend = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+    options = {
+        "ttl_seconds": float(os.getenv("LLM_CACHE_TTL", "86400")),
+        "max_entries": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048")),
+        "variants": int(os.getenv("LLM_CACHE_VARIANTS", "1"))
+    }
+
+    if backend == "sqlite":
+        return SQLiteLLMCache(path=os.getenv("LLM_CACHE_PATH", "./llm_cache.db"), **options)
+    if backend == "none":
+        return NullLLMCache(**options)
+    return InMemoryLLMCache(**options)
+
+
+llm_cache = create_llm_cache()
@@ -0,0 +1,414 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from app.services.llm_backend import llm_backend
+from app.services.metrics import metrics
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling the LLM while the breaker is open.
+    """
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+def failure_outcome(error):
+    """
+    Metrics outcome for an LLM call that ended in the agent's fallback.
+    """
+    return "short_circuit" if isinstance(error, CircuitOpenError) else "fallback"
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open,
+    calls are rejected immediately; after `reset_timeout` seconds one
+    probe call is let through (half-open) and its result closes or
+    re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def rejects(self):
+        """
+        Cheap pre-check: True while open and not yet due for a probe.
+        """
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe_started = None
+            # One probe at a time; a probe that never reported back
+            # (e.g. cancelled) is replaced after reset_timeout
+            if self.state == HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= self.reset_timeout
+            ):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+
+
+class _SharedSlots:
+    """
+    One concurrency limit shared by threads and event loops.
+
+    A freed slot is handed straight to the longest-waiting caller,
+    sync or async, so neither kind can starve the other. Async waiters
+    are woken on their own loop.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+        self._waiters = deque()  # threading.Event or (loop, future)
+
+    def _try_take(self):
+        # Caller holds self._lock
+        if self.used < self.limit and not self._waiters:
+            self.used += 1
+            return True
+        return False
+
+    def _withdraw(self, waiter):
+        """
+        Removes a waiter that gave up. False if a slot was already
+        handed to it, which it then owns.
+        """
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+                return True
+            except ValueError:
+                return False
+
+    def acquire(self, timeout):
+        with self._lock:
+            if self._try_take():
+                return True
+            event = threading.Event()
+            self._waiters.append(event)
+        if event.wait(timeout):
+            return True
+        return not self._withdraw(event)
+
+    async def acquire_async(self, timeout):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_take():
+                return True
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return not self._withdraw(waiter)
+        except BaseException:
+            # Cancelled while waiting: give back a slot handed over meanwhile
+            if not self._withdraw(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(_wake, future)
+                    return
+                except RuntimeError:
+                    continue  # its loop is closed; try the next waiter
+            self.used -= 1
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class _GatewayStream:
+    """
+    Async iterable over a backend stream that holds a concurrency slot
+    until the stream is exhausted or abandoned.
+    """
+
+    def __init__(self, gateway, prompt, json_mode):
+        self._gateway = gateway
+        self._prompt = prompt
+        self._json_mode = json_mode
+        self.usage_metadata = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        gateway = self._gateway
+        gateway._check_breaker()
+        deadline = time.monotonic() + gateway.deadline
+        await gateway._acquire_async(deadline)
+        try:
+            stream, first = await gateway._call_async(
+                lambda: gateway._first_chunk(self._prompt, self._json_mode), deadline
+            )
+            try:
+                if first is not None:
+                    yield first
+                async for chunk in stream:
+                    yield chunk
+            except Exception:
+                gateway.breaker.record_failure()
+                raise
+            self.usage_metadata = getattr(stream, "usage_metadata", None)
+        finally:
+            gateway._release_async()
+
+
+class LLMGateway:
+    """
+    Shared entry point for every LLM call.
+
+    - At most `max_concurrency` calls run at once per process, sync and
+      async callers together; callers wait for a slot (counted as queue
+      depth) within their deadline.
+    - Each call has an overall `deadline` in seconds covering queueing,
+      attempts and backoff.
+    - Failed attempts are retried up to `retries` times with full-jitter
+      exponential backoff while the deadline allows. Streams are only
+      retried before their first chunk.
+    - A circuit breaker short-circuits calls with CircuitOpenError, so
+      agents go straight to their deterministic fallback text.
+    """
+
+    def __init__(self, max_concurrency=32, deadline=7.5, retries=2, backoff_base=0.2,
+                 backoff_max=2.0, breaker=None):
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self._slots = _SharedSlots(max_concurrency)
+        self._count_lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.retried = 0
+
+    # -------------------------------------------------
+    # PUBLIC API (same shape as LLMBackend)
+    # -------------------------------------------------
+    def generate(self, prompt, json_mode=False):
+        self._check_breaker()
+        deadline = time.monotonic() + self.deadline
+        self._acquire_sync(deadline)
+        try:
+            return self._call_sync(
+                lambda timeout: llm_backend().generate(prompt, json_mode=json_mode, timeout=timeout),
+                deadline
+            )
+        finally:
+            self._release_sync()
+
+    async def generate_async(self, prompt, json_mode=False):
+        self._check_breaker()
+        deadline = time.monotonic() + self.deadline
+        await self._acquire_async(deadline)
+        try:
+            return await self._call_async(
+                lambda: llm_backend().generate_async(prompt, json_mode=json_mode), deadline
+            )
+        finally:
+            self._release_async()
+
+    async def stream_async(self, prompt, json_mode=False):
+        self._check_breaker()
+        return _GatewayStream(self, prompt, json_mode)
+
+    def stats(self):
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "consecutive_failures": self.breaker.failures,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "retries": self.retried
+        }
+
+    # -------------------------------------------------
+    # ATTEMPTS
+    # -------------------------------------------------
+    def _check_breaker(self):
+        # Fail fast, before waiting for a concurrency slot
+        if self.breaker.rejects():
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _call_sync(self, call, deadline):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM circuit breaker is open")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMDeadlineExceeded("LLM deadline exceeded")
+            try:
+                result = call(remaining)
+                self.breaker.record_success()
+                return result
+            except Exception:
+                self.breaker.record_failure()
+                pause = self._backoff(attempt)
+                if attempt >= self.retries or time.monotonic() + pause >= deadline:
+                    raise
+            attempt += 1
+            self.retried += 1
+            time.sleep(pause)
+
+    async def _call_async(self, call, deadline):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM circuit breaker is open")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMDeadlineExceeded("LLM deadline exceeded")
+            try:
+                result = await asyncio.wait_for(call(), remaining)
+                self.breaker.record_success()
+                return result
+            except Exception:
+                self.breaker.record_failure()
+                pause = self._backoff(attempt)
+                if attempt >= self.retries or time.monotonic() + pause >= deadline:
+                    raise
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(pause)
+
+    @staticmethod
+    async def _first_chunk(prompt, json_mode):
+        # Opening a stream and receiving its first chunk is the
+        # retryable part; later failures surface mid-response
+        stream = await llm_backend().stream_async(prompt, json_mode=json_mode)
+        iterator = stream.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return _Resumed(stream, iterator), first
+
+    # -------------------------------------------------
+    # CONCURRENCY SLOTS
+    # -------------------------------------------------
+    def _count(self, field, delta):
+        with self._count_lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def _acquire_sync(self, deadline):
+        self._count("waiting", 1)
+        try:
+            if not self._slots.acquire(max(0.0, deadline - time.monotonic())):
+                raise LLMDeadlineExceeded("Timed out waiting for an LLM slot")
+        finally:
+            self._count("waiting", -1)
+        self._count("in_flight", 1)
+
+    def _release_sync(self):
+        self._count("in_flight", -1)
+        self._slots.release()
+
+    async def _acquire_async(self, deadline):
+        self._count("waiting", 1)
+        try:
+            if not await self._slots.acquire_async(max(0.0, deadline - time.monotonic())):
+                raise LLMDeadlineExceeded("Timed out waiting for an LLM slot")
+        finally:
+            self._count("waiting", -1)
+        self._count("in_flight", 1)
+
+    def _release_async(self):
+        self._count("in_flight", -1)
+        self._slots.release()
+
+
+class _Resumed:
+    """
+    A backend stream whose first chunk has already been consumed.
+    """
+
+    def __init__(self, stream, iterator):
+        self._stream = stream
+        self._iterator = iterator
+
+    def __aiter__(self):
+        return self._iterator
+
+    @property
+    def usage_metadata(self):
+        return getattr(self._stream, "usage_metadata", None)
+
+
+llm_gateway = LLMGateway(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+    deadline=float(os.getenv("LLM_DEADLINE", "7.5")),
+    retries=int(os.getenv("LLM_RETRIES", "2")),
+    backoff_base=float(os.getenv("LLM_RETRY_BACKOFF", "0.2")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30"))
+    )
+)
+
+_BREAKER_STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+metrics.gauge("llm_breaker_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)",
+              lambda: _BREAKER_STATES[llm_gateway.breaker.state])
+metrics.gauge("llm_gateway_queue_depth", "LLM calls waiting for a concurrency slot",
+              lambda: llm_gateway.waiting)
+metrics.gauge("llm_gateway_in_flight", "LLM calls currently running", lambda: llm_gateway.in_flight)
+metrics.gauge("llm_gateway_retries", "LLM attempts retried since start", lambda: llm_gateway.retried)
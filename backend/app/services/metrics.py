@@ -0,0 +1,264 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _label_text(labelnames, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge read from a callback at scrape time. With labelnames the
+    callback returns {label values tuple: value}.
+    """
+
+    def __init__(self, name, help_text, read, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception as e:
+            print(f"Metrics Error ({self.name}): {e}")
+            return []
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        if not self.labelnames:
+            return lines + [f"{self.name} {_number(value)}"]
+        for key, series_value in sorted(value.items()):
+            lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_number(series_value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _label_text(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _label_text(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_number(series[-2])}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text exposition format.
+
+    Values are per process: with several pre-forked workers, each
+    /metrics scrape reports the worker that served it.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, read, labelnames=()):
+        return self._add(Gauge(name, help_text, read, labelnames))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "loan_stage_seconds", "Time spent in each stage of a loan application", ("stage",)
+)
+LLM_REQUESTS = metrics.counter(
+    "llm_requests_total", "LLM agent calls by outcome (success, partial, cache_hit, fallback, short_circuit, timeout)",
+    ("agent", "outcome")
+)
+LLM_TOKENS = metrics.histogram(
+    "llm_tokens", "Tokens per LLM call", ("agent", "kind"), buckets=TOKEN_BUCKETS
+)
+DB_WRITE_SECONDS = metrics.histogram(
+    "db_write_seconds", "Audit/application write latency per commit", ("path",)
+)
+DB_ROWS_WRITTEN = metrics.counter(
+    "db_rows_written_total", "Audit/application rows by write outcome", ("outcome",)
+)
+APPLICATION_LLM_CALLS = metrics.histogram(
+    "loan_application_llm_calls", "LLM calls made per loan application", ("mode",),
+    buckets=(0, 1, 2, 3, 4)
+)
+APPLICATION_LLM_TOKENS = metrics.histogram(
+    "loan_application_llm_tokens", "LLM tokens per loan application", ("mode", "kind"),
+    buckets=TOKEN_BUCKETS
+)
+APPLICATION_SECONDS = metrics.histogram(
+    "loan_application_seconds", "Loan application latency up to the final audit write", ("mode",)
+)
+REQUEST_ERRORS = metrics.counter(
+    "loan_request_errors_total", "Loan applications that raised", ("flow",)
+)
+
+
+# -------------------------------------------------
+# PER-REQUEST TIMING
+# -------------------------------------------------
+_current_timer = contextvars.ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """
+    Collects the stage timings of one loan application. Stages timed
+    while the timer is active (see timed()) are added to its breakdown
+    as well as to the loan_stage_seconds histogram. LLM responses seen
+    while it is active are tallied in `usage`.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.usage = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_usage(self, prompt_tokens, completion_tokens):
+        self.usage["llm_calls"] += 1
+        self.usage["prompt_tokens"] += prompt_tokens
+        self.usage["completion_tokens"] += completion_tokens
+
+    def record_application(self, mode):
+        """
+        Per-application LLM calls, tokens and latency, labelled with the
+        advisory mode, so split and fused runs can be compared.
+        """
+        APPLICATION_LLM_CALLS.observe(self.usage["llm_calls"], mode=mode)
+        APPLICATION_LLM_TOKENS.observe(self.usage["prompt_tokens"], mode=mode, kind="prompt")
+        APPLICATION_LLM_TOKENS.observe(self.usage["completion_tokens"], mode=mode, kind="completion")
+        APPLICATION_SECONDS.observe(time.perf_counter() - self.started, mode=mode)
+
+    @contextmanager
+    def activate(self):
+        token = _current_timer.set(self)
+        try:
+            yield self
+        finally:
+            _current_timer.reset(token)
+
+    def breakdown(self):
+        """
+        Stage timings in milliseconds, plus the elapsed total so far.
+        """
+        timings = {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 3)
+        return timings
+
+
+@contextmanager
+def timed(stage, timer=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timer = timer or _current_timer.get()
+        if timer is not None:
+            timer.add(stage, elapsed)
+
+
+def observe_llm_usage(agent, response):
+    """
+    Records prompt/completion token counts from a Gemini response,
+    when the response carries usage metadata, and adds them to the
+    active RequestTimer.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    counts = {}
+    for kind, field in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+        counts[kind] = getattr(usage, field, None) or 0
+        if counts[kind]:
+            LLM_TOKENS.observe(counts[kind], agent=agent, kind=kind)
+
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add_usage(counts["prompt"], counts["completion"])
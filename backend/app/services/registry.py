@@ -0,0 +1,66 @@
+import threading
+import time
+
+_MISSING = object()
+
+
+class ResourceRegistry:
+    """
+    Lazily initialized, process-wide shared resources
+    (risk model, compiled scorer, LLM clients).
+
+    Each resource is built by its factory on first use, exactly once,
+    and the load time is recorded. Resources marked fork_safe can be
+    preloaded in a parent process so forked workers share them
+    copy-on-write; the rest (network clients) are built per worker.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._fork_safe = {}
+        self._instances = {}
+        self._timings = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory, fork_safe=True):
+        self._factories[name] = factory
+        self._fork_safe[name] = fork_safe
+
+    def get(self, name):
+        instance = self._instances.get(name, _MISSING)
+        if instance is not _MISSING:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name, _MISSING)
+            if instance is _MISSING:
+                start = time.perf_counter()
+                instance = self._factories[name]()
+                self._timings[name] = time.perf_counter() - start
+                self._instances[name] = instance
+            return instance
+
+    def preload(self, fork_safe_only=False):
+        """
+        Builds every registered resource now instead of on first request.
+        """
+        for name in list(self._factories):
+            if fork_safe_only and not self._fork_safe[name]:
+                continue
+            self.get(name)
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def record_timing(self, name, seconds):
+        self._timings[name] = seconds
+
+    def report(self):
+        return {
+            "loaded": sorted(self._instances),
+            "pending": sorted(set(self._factories) - set(self._instances)),
+            "timings_seconds": {k: round(v, 4) for k, v in self._timings.items()}
+        }
+
+
+registry = ResourceRegistry()
@@ -0,0 +1,56 @@
+import json
+import re
+
+
+def sse_event(event: str, data) -> str:
+    """
+    Formats one Server-Sent Events frame.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class JsonFieldStream:
+    """
+    Extracts string fields from a JSON object while it is still being
+    generated, so their text can be forwarded as it arrives.
+
+    feed() takes the next chunk of raw model output and returns
+    (field, new_text) pairs for every field whose decoded value grew.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.text = ""
+        self._emitted = {field: "" for field in fields}
+        self._patterns = {
+            field: re.compile(r'"%s"\s*:\s*"((?:[^"\\]|\\.)*)' % re.escape(field))
+            for field in fields
+        }
+
+    def feed(self, chunk):
+        self.text += chunk
+        deltas = []
+        for field in self.fields:
+            match = self._patterns[field].search(self.text)
+            if match is None:
+                continue
+            value = _decode_partial(match.group(1))
+            emitted = self._emitted[field]
+            if len(value) > len(emitted) and value.startswith(emitted):
+                deltas.append((field, value[len(emitted):]))
+                self._emitted[field] = value
+        return deltas
+
+
+def _decode_partial(raw):
+    # A chunk can end inside an escape sequence (e.g. "\u00"); decode
+    # up to the last complete character instead
+    while raw:
+        try:
+            return json.loads(f'"{raw}"')
+        except ValueError:
+            cut = raw.rfind("\\")
+            if cut < 0:
+                return ""
+            raw = raw[:cut]
+    return ""
@@ -0,0 +1,65 @@
+import os
+import sys
+
+# Run from anywhere: the app package lives in backend/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Offline and self-contained: no Gemini calls, no files in the working tree
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("LLM_CACHE_BACKEND", "memory")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("MODEL_STATE_PATH", "")
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def database():
+    from app.db import engine, upgrade_schema
+
+    upgrade_schema(engine)
+    return engine
+
+
+@pytest.fixture
+def eligibility_rows(database):
+    """
+    Returns a function counting persisted eligibility decisions once
+    the background audit writer has written everything submitted.
+    """
+    from app.db import SessionLocal
+    from app.models.agent_event import AgentEvent
+    from app.services.agent_logger import audit_writer
+
+    def count():
+        # Joins the writer thread after its final flush; the next submit restarts it
+        audit_writer.shutdown()
+        db = SessionLocal()
+        try:
+            return db.query(AgentEvent).filter(AgentEvent.event_type == "eligibility_decision").count()
+        finally:
+            db.close()
+
+    return count
+
+
+@pytest.fixture
+def session_events(database):
+    """
+    Returns a function listing a session's persisted audit events as
+    {event_type: output_snapshot}, after the audit writer has drained.
+    """
+    from app.db import SessionLocal
+    from app.models.agent_event import AgentEvent
+    from app.services.agent_logger import audit_writer
+
+    def events(session_id):
+        audit_writer.shutdown()
+        db = SessionLocal()
+        try:
+            rows = db.query(AgentEvent).filter(AgentEvent.session_id == session_id).all()
+            return {row.event_type: row.output_snapshot for row in rows}
+        finally:
+            db.close()
+
+    return events
@@ -0,0 +1,48 @@
+import uuid
+from datetime import datetime, timezone
+
+from app.db import SessionLocal
+from app.models.agent_event import AgentEvent
+from app.services.analytics import DashboardAggregator
+
+
+def _write_decision(decision):
+    db = SessionLocal()
+    try:
+        db.add(AgentEvent(
+            event_id=str(uuid.uuid4()),
+            session_id=str(uuid.uuid4()),
+            agent_name="EligibilityAgent",
+            event_type="eligibility_decision",
+            output_snapshot={"decision": decision, "risk_probability": 0.2, "eligibility_score": 80},
+            timestamp=datetime.now(timezone.utc)
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_snapshot_includes_decisions_recorded_by_other_workers(database):
+    worker = DashboardAggregator(refresh_interval=0)
+    worker.rebuild()
+    before = worker.snapshot()["summary"]
+
+    # Handled and persisted by another worker process
+    _write_decision("rejected")
+    other = DashboardAggregator()
+    other.rebuild()
+    other.checkpoint()
+
+    after = worker.snapshot()["summary"]
+    assert after["rejected"] == before["rejected"] + 1
+    assert after["total"] == before["total"] + 1
+
+
+def test_snapshot_serves_local_state_until_stale(database):
+    worker = DashboardAggregator(refresh_interval=3600)
+    worker.rebuild()
+    before = worker.snapshot()["summary"]
+
+    _write_decision("approved")
+
+    assert worker.snapshot()["summary"] == before
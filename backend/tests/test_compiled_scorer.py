@@ -0,0 +1,81 @@
+"""
+The compiled scorer must match the sklearn pipeline it was built from,
+on the training data and on API-shaped inputs, and its row and batch
+paths must agree exactly.
+"""
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.bench_scorer import DATA_PATH, MODEL_PATH, TOLERANCE
+from app.ml.compiled_scorer import CompiledRiskScorer
+from app.ml.feature_builder import (
+    build_feature_columns, build_feature_dict, build_ml_features_batch
+)
+from app.schemas.loan_input import LoanInput
+
+SAMPLE_ROWS = 2000
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return joblib.load(MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def scorer(pipeline):
+    scorer = CompiledRiskScorer.from_pipeline(pipeline)
+    assert scorer is not None, "risk_model.pkl no longer compiles"
+    return scorer
+
+
+@pytest.fixture(scope="module")
+def training_sample():
+    df = pd.read_csv(DATA_PATH).drop(columns=["loan_status"])
+    return df.sample(n=min(SAMPLE_ROWS, len(df)), random_state=7).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def api_inputs():
+    rng = np.random.default_rng(7)
+    return (
+        rng.integers(5000, 500000, SAMPLE_ROWS),
+        rng.integers(1000, 10000000, SAMPLE_ROWS)
+    )
+
+
+def test_row_matches_pipeline_on_training_rows(pipeline, scorer, training_sample):
+    expected = pipeline.predict_proba(training_sample)[:, 1]
+    actual = np.array([scorer.predict_proba_row(r) for r in training_sample.to_dict("records")])
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE)
+
+
+def test_batch_matches_pipeline_on_training_rows(pipeline, scorer, training_sample):
+    expected = pipeline.predict_proba(training_sample)[:, 1]
+    columns = {col: training_sample[col].to_numpy() for col in training_sample.columns}
+    actual = scorer.predict_proba_columns(columns, len(training_sample))
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE)
+
+
+def test_batch_matches_pipeline_on_api_inputs(pipeline, scorer, api_inputs):
+    monthly_income, loan_amount = api_inputs
+    expected = pipeline.predict_proba(build_ml_features_batch(monthly_income, loan_amount))[:, 1]
+    actual = scorer.predict_proba_columns(
+        build_feature_columns(monthly_income, loan_amount), len(loan_amount)
+    )
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE)
+
+
+def test_row_and_batch_are_bit_identical(scorer, api_inputs):
+    monthly_income, loan_amount = api_inputs
+    batch = scorer.predict_proba_columns(
+        build_feature_columns(monthly_income, loan_amount), len(loan_amount)
+    )
+    rows = [
+        scorer.predict_proba_row(build_feature_dict(LoanInput(
+            monthly_income=int(income), existing_emi=0, loan_amount=int(amount), tenure_months=12
+        )))
+        for income, amount in zip(monthly_income, loan_amount)
+    ]
+    assert rows == batch.tolist()
@@ -0,0 +1,23 @@
+import threading
+
+from sqlalchemy import text
+
+from app.db import create_db_engine
+
+
+def test_in_memory_database_is_shared_across_threads():
+    engine = create_db_engine("sqlite:///:memory:")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY)"))
+
+    # Written from a background thread, as the audit writer and job workers do
+    def write():
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO events (id) VALUES (1)"))
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    thread.join()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM events")).scalar() == 1
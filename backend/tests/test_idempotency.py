@@ -0,0 +1,59 @@
+import asyncio
+
+from app.schemas.loan_input import LoanInput
+from app.services.idempotency import IdempotencyStore
+
+APPLICATION = LoanInput(monthly_income=80000, existing_emi=5000, loan_amount=400000, tenure_months=36)
+
+
+def _submit(store, client, idempotency_key=None):
+    calls = []
+
+    async def compute():
+        calls.append(client)
+        return {"served_to": client}
+
+    key, fingerprint, ttl = store.key_for("apply-loan", APPLICATION, idempotency_key, client)
+    response, replayed = asyncio.run(store.run(key, fingerprint, ttl, compute))
+    return response, replayed, calls
+
+
+def test_identical_inputs_from_other_clients_are_not_replayed():
+    store = IdempotencyStore()
+    _submit(store, "10.0.0.1|browser")
+
+    response, replayed, calls = _submit(store, "10.0.0.2|browser")
+
+    assert not replayed
+    assert response == {"served_to": "10.0.0.2|browser"}
+    assert calls == ["10.0.0.2|browser"]
+
+
+def test_identical_inputs_from_the_same_client_are_replayed():
+    store = IdempotencyStore()
+    _submit(store, "10.0.0.1|browser")
+
+    response, replayed, calls = _submit(store, "10.0.0.1|browser")
+
+    assert replayed
+    assert calls == []
+
+
+def test_requests_without_key_or_client_are_not_deduplicated():
+    store = IdempotencyStore()
+    _submit(store, None)
+
+    _, replayed, calls = _submit(store, None)
+
+    assert not replayed
+    assert calls == [None]
+
+
+def test_explicit_key_deduplicates():
+    store = IdempotencyStore(window_seconds=0)
+    _submit(store, "10.0.0.1|browser", idempotency_key="abc")
+
+    response, replayed, _ = _submit(store, "10.0.0.1|browser", idempotency_key="abc")
+
+    assert replayed
+    assert response == {"served_to": "10.0.0.1|browser"}
@@ -0,0 +1,61 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from app.db import SessionLocal
+from app.models.application_job import ApplicationJob
+from app.services.job_queue import JobQueue, LANES, _utcnow
+
+
+@pytest.fixture
+def queue(database):
+    # Workers are not started; the tests drive claims by hand
+    return JobQueue(max_attempts=2)
+
+
+def _enqueue(queue):
+    session_id = str(uuid.uuid4())
+    queue.enqueue(session_id, {"eligibility": {}})
+    return session_id
+
+
+def _expire_lease(session_id):
+    db = SessionLocal()
+    try:
+        db.query(ApplicationJob).filter(ApplicationJob.session_id == session_id).update(
+            {"lease_expires_at": _utcnow() - timedelta(seconds=1)}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_stale_worker_cannot_finish_a_reclaimed_job(queue):
+    session_id = _enqueue(queue)
+    first = queue._claim(list(LANES.values()))
+    _expire_lease(session_id)
+    second = queue._claim(list(LANES.values()))
+    assert (first["session_id"], second["session_id"]) == (session_id, session_id)
+
+    # The first worker was only slow, and reports after losing its lease
+    assert not queue._finish(first, "failed", "failed", error="timed out")
+
+    state = queue.get(session_id)
+    assert (state["status"], state["attempts"], state["error"]) == ("enriching", 2, None)
+
+    assert queue._finish(second, "done", "completed", result={"ok": True})
+    assert queue.get(session_id)["status"] == "completed"
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(queue):
+    session_id = _enqueue(queue)
+    for _ in range(queue.max_attempts):
+        assert queue._claim(list(LANES.values()))["session_id"] == session_id
+        _expire_lease(session_id)
+
+    assert queue._claim(list(LANES.values())) is None
+
+    state = queue.get(session_id)
+    assert (state["status"], state["attempts"]) == ("failed", queue.max_attempts)
+    assert state["error"]
@@ -0,0 +1,17 @@
+import pytest
+
+from app.services.llm_backend import LLMBackend
+
+
+def test_backend_missing_a_method_fails_at_construction():
+    class NoStreaming(LLMBackend):
+        name = "incomplete"
+
+        def generate(self, prompt, json_mode=False, timeout=None):
+            return None
+
+        async def generate_async(self, prompt, json_mode=False):
+            return None
+
+    with pytest.raises(TypeError, match="stream_async"):
+        NoStreaming()
@@ -0,0 +1,22 @@
+import pytest
+
+from app.services.llm_cache import InMemoryLLMCache, LLMCache
+
+
+def test_cache_missing_a_hook_fails_at_construction():
+    class NoSize(LLMCache):
+        def _load(self, key):
+            return None
+
+        def _store(self, key, value):
+            pass
+
+    with pytest.raises(TypeError, match="_size"):
+        NoSize()
+
+
+def test_in_memory_cache_round_trip():
+    cache = InMemoryLLMCache(ttl_seconds=60, max_entries=2)
+    assert cache.get("a") is None
+    cache.put("a", {"title": "Hi"})
+    assert cache.get("a") == {"title": "Hi"}
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.agents import orchestrator_agent
+from app.agents.empathy_agent import EmpathyAgent
+from app.agents.orchestrator_agent import OrchestratorAgent
+from app.schemas.loan_input import LoanInput
+
+APPLICATION = LoanInput(monthly_income=80000, existing_emi=5000, loan_amount=400000, tenure_months=36)
+
+
+@pytest.fixture(autouse=True)
+def _error_log_in_tmp(tmp_path, monkeypatch):
+    # Failed requests append to ./error.log
+    monkeypatch.chdir(tmp_path)
+
+
+async def _failing_llm(*args, **kwargs):
+    raise RuntimeError("LLM stage failed")
+
+
+def test_async_path_records_eligibility_before_llm_stages(monkeypatch, eligibility_rows):
+    before = eligibility_rows()
+    monkeypatch.setattr(EmpathyAgent, "generate_response_async", _failing_llm)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(OrchestratorAgent.process_loan_application_async(APPLICATION))
+
+    assert eligibility_rows() == before + 1
+
+
+def test_async_path_records_eligibility_once(eligibility_rows):
+    before = eligibility_rows()
+    response = asyncio.run(OrchestratorAgent.process_loan_application_async(APPLICATION))
+
+    assert response["status"] == "approved"
+    assert eligibility_rows() == before + 1
+
+
+
+async def _stream_until(closed_after):
+    stream = OrchestratorAgent.stream_loan_application(APPLICATION)
+    async for name, data in stream:
+        if name == "eligibility":
+            session_id = data["session_id"]
+        if name == closed_after:
+            break
+    # What the server does when the client goes away
+    await stream.aclose()
+    await asyncio.gather(*orchestrator_agent._PENDING_AUDITS)
+    return session_id
+
+
+def test_stream_records_eligibility_before_first_event(eligibility_rows):
+    before = eligibility_rows()
+
+    async def count_at_first_event():
+        stream = OrchestratorAgent.stream_loan_application(APPLICATION)
+        await stream.__anext__()
+        count = eligibility_rows()
+        await stream.aclose()
+        await asyncio.gather(*orchestrator_agent._PENDING_AUDITS)
+        return count
+
+    assert asyncio.run(count_at_first_event()) == before + 1
+
+
+def test_stream_disconnect_persists_audit_trail(session_events):
+    session_id = asyncio.run(_stream_until("eligibility"))
+
+    events = session_events(session_id)
+    assert set(events) == {"eligibility_decision", "user_explanation", "final_response"}
+    assert events["final_response"]["client_disconnected"] is True
+
+
+def test_stream_completion_persists_audit_trail_once(session_events):
+    session_id = asyncio.run(_stream_until("done"))
+
+    events = session_events(session_id)
+    assert set(events) == {"eligibility_decision", "user_explanation", "final_response"}
+    assert "client_disconnected" not in events["final_response"]
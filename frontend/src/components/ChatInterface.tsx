@@ -61,7 +61,7 @@ export const ChatInterface = () => {
     setIsLoading(true);
 
     try {
-      const response = await fetch('/chat/apply-loan', {
+      const response = await fetch('/chat/apply-loan/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -74,29 +74,75 @@ export const ChatInterface = () => {
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errorText = await response.text();
         throw new Error(`Server error (${response.status}): ${errorText}`);
       }
 
-      const responseData = await response.json();
+      // The decision arrives first; title, message and advice then
+      // fill in as the server streams them (Server-Sent Events)
+      const resultId = Date.now().toString();
+      let result: LoanResult | null = null;
 
-      const result: LoanResult = {
-        status: responseData.status,
-        title: responseData.title,
-        message: responseData.message,
-        advice: responseData.personalized_improvement_advice,
+      const updateResult = (changes: Partial<LoanResult>) => {
+        if (!result) return;
+        result = { ...result, ...changes };
+        const updated = result;
+        setMessages((prev) => prev.map((m) => (m.id === resultId ? { ...m, result: updated } : m)));
       };
 
-      const resultMessage: Message = {
-        id: Date.now().toString(),
-        type: 'result',
-        content: '',
-        timestamp: new Date(),
-        result,
+      const handleEvent = (event: string, payload: any) => {
+        if (event === 'eligibility') {
+          result = { status: payload.status, title: '', message: '' };
+          const resultMessage: Message = {
+            id: resultId,
+            type: 'result',
+            content: '',
+            timestamp: new Date(),
+            result,
+          };
+          setMessages((prev) => [...prev, resultMessage]);
+        } else if (event === 'empathy_delta' && result) {
+          const field = payload.field as 'title' | 'message';
+          updateResult({ [field]: result[field] + payload.delta } as Partial<LoanResult>);
+        } else if (event === 'advice_delta' && result) {
+          updateResult({ advice: (result.advice || '') + payload.delta });
+        } else if (event === 'empathy') {
+          updateResult({ title: payload.title, message: payload.message });
+        } else if (event === 'advice') {
+          updateResult({ advice: payload.advice });
+        }
       };
 
-      setMessages((prev) => [...prev, resultMessage]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let finished = false;
+
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const frame = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let event = 'message';
+          let payload = '';
+          for (const line of frame.split('\n')) {
+            if (line.startsWith('event:')) event = line.slice(6).trim();
+            else if (line.startsWith('data:')) payload += line.slice(5).trim();
+          }
+          if (event === 'done') finished = true;
+          handleEvent(event, JSON.parse(payload));
+        }
+      }
+
+      if (!result) {
+        throw new Error('Incomplete response from server');
+      }
       setCurrentStep('done');
     } catch (error) {
       console.error('Loan Processing Error:', error);
@@ -11,11 +11,13 @@ interface DashboardStats {
         rejected: number;
         conditional: number;
     };
-    recent_events: Array<{
-        timestamp: string;
-        decision: string;
-        risk_probability: number;
-        eligibility_score: number;
+    volume: Record<'minute' | 'hour' | 'day', Array<{
+        start: string;
+        count: number;
+    }>>;
+    histograms: Record<'risk_probability' | 'eligibility_score', {
+        edges: number[];
+        counts: number[];
     }>;
 }
 
@@ -69,11 +71,12 @@ export const Dashboard = () => {
 
     const COLORS = ['#10b981', '#ef4444', '#f59e0b'];
 
-    const riskData = stats.recent_events.map((e, i) => ({
-        name: `App ${i + 1}`,
-        risk: (e.risk_probability * 100).toFixed(1),
-        score: e.eligibility_score,
-    })).slice(0, 20); // Show last 20 for cleaner chart
+    const { risk_probability: riskHist, eligibility_score: scoreHist } = stats.histograms;
+    const riskData = riskHist.counts.map((count, i) => ({
+        name: `${Math.round(riskHist.edges[i] * 100)}-${Math.round(riskHist.edges[i + 1] * 100)}`,
+        risk: count,
+        score: scoreHist.counts[i] ?? 0,
+    }));
 
     return (
         <div className="min-h-screen bg-gray-900 text-white font-sans">
@@ -177,19 +180,19 @@ export const Dashboard = () => {
                     >
                         <h3 className="text-xl font-semibold mb-6 flex items-center gap-2">
                             <span className="w-1 h-6 bg-pink-500 rounded-full"></span>
-                            Recent Risk Profiles
+                            Risk Profile Distribution
                         </h3>
                         <div className="h-80">
                             <ResponsiveContainer width="100%" height="100%">
                                 <BarChart data={riskData}>
-                                    <XAxis dataKey="name" hide />
+                                    <XAxis dataKey="name" stroke="#4b5563" />
                                     <YAxis stroke="#4b5563" />
                                     <Tooltip
                                         cursor={{ fill: '#374151' }}
                                         contentStyle={{ backgroundColor: '#1f2937', borderColor: '#374151', borderRadius: '12px', color: '#fff' }}
                                     />
-                                    <Bar dataKey="risk" name="Risk %" fill="#8884d8" radius={[4, 4, 0, 0]} />
-                                    <Bar dataKey="score" name="Score" fill="#ec4899" radius={[4, 4, 0, 0]} />
+                                    <Bar dataKey="risk" name="Risk % bin" fill="#8884d8" radius={[4, 4, 0, 0]} />
+                                    <Bar dataKey="score" name="Score bin" fill="#ec4899" radius={[4, 4, 0, 0]} />
                                 </BarChart>
                             </ResponsiveContainer>
                         </div>